@@ -1,9 +1,27 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g
 import joblib
+import numpy as np
 import pandas as pd
 import os
+import io
+import time
+import threading
 import logging
 import json
+import hmac
+import hashlib
+from inference import compile_preprocessor, check_parity, check_batch_parity, build_parity_matrix, records_frame
+from tree_compiler import compile_tree_model, load_flat_ensemble, check_backend_parity
+from batching import MicroBatcher
+from prediction_cache import PredictionCache, artifact_version, file_signature, canonical_features_key
+from explainability import PredictionExplainer, load_explainer_background
+from data_processing import load_cleaning_stats, apply_cleaning_stats, clean_record
+from derived_features import FeatureEngine, DEFAULT_FEATURE_DEFINITIONS
+from artifact_bundle import ArtifactBundle, resolve_bundle_path, MANIFEST_FILE
+from model_registry import ModelRegistry, ModelVersion
+from prediction_log import PredictionLogger
+from drift_monitoring import DriftMonitor, load_drift_reference, SCORE_FEATURE
+from metrics import MetricsRegistry, SCORE_BUCKETS, CONTENT_TYPE as METRICS_CONTENT_TYPE
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -16,135 +34,1362 @@ app = Flask(__name__)
 MODEL_PATH = os.environ.get('MODEL_PATH', './models/trained_models/best_model.joblib')
 PREPROCESSOR_PATH = os.environ.get('PREPROCESSOR_PATH', './models/trained_models/preprocessor.joblib')
 CONFIG_PATH = os.environ.get('CONFIG_PATH', './models/trained_models/config.json')
+# Bundle versionado (src/artifact_bundle.py); quando definido, substitui os três caminhos acima
+MODEL_BUNDLE_PATH = os.environ.get('MODEL_BUNDLE_PATH')
+# Estatísticas de limpeza do treinamento (fit_cleaning_stats), reaplicadas a cada solicitante (opcional)
+CLEANING_STATS_PATH = os.environ.get('CLEANING_STATS_PATH')
 
-try:
-    model = joblib.load(MODEL_PATH)
-    preprocessor = joblib.load(PREPROCESSOR_PATH)
+# Configurações do endpoint de predição em lote
+BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', 10000))
+BATCH_MAX_ROWS = int(os.environ.get('BATCH_MAX_ROWS', 1000000))
+
+# Modo de inferência para predições individuais: 'compiled' (sem pandas) ou 'sklearn'
+INFERENCE_MODE = os.environ.get('INFERENCE_MODE', 'compiled')
+
+# Backend do modelo: 'native' (predict_proba original) ou 'flat' (ensemble de árvores achatado)
+MODEL_BACKEND = os.environ.get('MODEL_BACKEND', 'native')
+FLAT_MODEL_PATH = os.environ.get('FLAT_MODEL_PATH')
+
+# Micro-batching: agrupa predições individuais concorrentes em um único lote vetorizado
+MICRO_BATCHING = os.environ.get('MICRO_BATCHING', '0') == '1'
+MICRO_BATCH_MAX_SIZE = int(os.environ.get('MICRO_BATCH_MAX_SIZE', 64))
+MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS', 2))
+MICRO_BATCH_TIMEOUT = float(os.environ.get('MICRO_BATCH_TIMEOUT', 5))
+
+# Cache de predições (PREDICTION_CACHE_SIZE=0 desativa)
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 10000))
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', 3600))
+
+# Explicações: amostra de referência (dados brutos), fatores de risco destacados e limite do lote
+EXPLAINER_BACKGROUND_PATH = os.environ.get('EXPLAINER_BACKGROUND_PATH', './models/trained_models/explainer_background.csv')
+EXPLAIN_TOP_K = int(os.environ.get('EXPLAIN_TOP_K', 3))
+EXPLAIN_BATCH_MAX_ROWS = int(os.environ.get('EXPLAIN_BATCH_MAX_ROWS', 1000))
+
+# Intervalo (s) para verificar se os artefatos mudaram em disco e recarregá-los (0 desativa)
+ARTIFACT_CHECK_INTERVAL = float(os.environ.get('ARTIFACT_CHECK_INTERVAL', 0))
+
+# Log estruturado de predições (desativado sem PREDICTION_LOG_DIR); 'auto' usa Parquet se o pyarrow estiver instalado
+PREDICTION_LOG_DIR = os.environ.get('PREDICTION_LOG_DIR')
+PREDICTION_LOG_FORMAT = os.environ.get('PREDICTION_LOG_FORMAT', 'auto')
+PREDICTION_LOG_BATCH_SIZE = int(os.environ.get('PREDICTION_LOG_BATCH_SIZE', 1000))
+PREDICTION_LOG_FLUSH_INTERVAL = float(os.environ.get('PREDICTION_LOG_FLUSH_INTERVAL', 1))
+PREDICTION_LOG_MAX_FILE_ROWS = int(os.environ.get('PREDICTION_LOG_MAX_FILE_ROWS', 100000))
+PREDICTION_LOG_MAX_FILE_SECONDS = float(os.environ.get('PREDICTION_LOG_MAX_FILE_SECONDS', 3600))
+PREDICTION_LOG_MAX_FILES = int(os.environ.get('PREDICTION_LOG_MAX_FILES', 0))
+
+# Monitoramento de drift: referência salva no treinamento (sem ela o monitor fica desativado) e janela recente
+DRIFT_REFERENCE_PATH = os.environ.get('DRIFT_REFERENCE_PATH', './models/trained_models/drift_reference.json')
+DRIFT_MONITORING = os.environ.get('DRIFT_MONITORING', '1') == '1'
+DRIFT_WINDOW_SECONDS = float(os.environ.get('DRIFT_WINDOW_SECONDS', 3600))
+DRIFT_WINDOW_BUCKETS = int(os.environ.get('DRIFT_WINDOW_BUCKETS', 12))
+DRIFT_FLUSH_INTERVAL = float(os.environ.get('DRIFT_FLUSH_INTERVAL', 1))
+
+# Registro de versões: versões residentes, threads da pontuação em shadow e token dos endpoints /models/*
+MODEL_REGISTRY_MAX_VERSIONS = int(os.environ.get('MODEL_REGISTRY_MAX_VERSIONS', 3))
+MODEL_SHADOW_WORKERS = int(os.environ.get('MODEL_SHADOW_WORKERS', 1))
+MODEL_ADMIN_TOKEN = os.environ.get('MODEL_ADMIN_TOKEN')
+
+# Métricas expostas em /metrics (shards por thread, sem lock no caminho da requisição)
+metrics = MetricsRegistry()
+REQUESTS = metrics.counter('credit_api_requests_total', 'Requisições por endpoint e código HTTP',
+                           ('endpoint', 'status'))
+REQUEST_DURATION = metrics.histogram('credit_api_request_duration_seconds', 'Duração das requisições por endpoint',
+                                     labelnames=('endpoint',))
+STAGE_DURATION = metrics.histogram('credit_api_stage_duration_seconds',
+                                   'Duração das etapas das predições individuais (parse, validate, transform, predict, serialize)',
+                                   labelnames=('stage',))
+PREDICTIONS = metrics.counter('credit_api_predictions_total', 'Predições por versão do modelo e categoria de risco',
+                              ('model_version', 'risk_category'))
+RISK_SCORES = metrics.histogram('credit_api_risk_score', 'Distribuição das probabilidades de alto risco',
+                                SCORE_BUCKETS, ('model_version',))
+
+prediction_cache = None
+if PREDICTION_CACHE_SIZE > 0:
+    prediction_cache = PredictionCache(max_size=PREDICTION_CACHE_SIZE, ttl_seconds=PREDICTION_CACHE_TTL)
+
+prediction_logger = None
+if PREDICTION_LOG_DIR:
+    prediction_logger = PredictionLogger(PREDICTION_LOG_DIR, file_format=PREDICTION_LOG_FORMAT,
+                                         batch_size=PREDICTION_LOG_BATCH_SIZE,
+                                         flush_interval=PREDICTION_LOG_FLUSH_INTERVAL,
+                                         max_file_rows=PREDICTION_LOG_MAX_FILE_ROWS,
+                                         max_file_seconds=PREDICTION_LOG_MAX_FILE_SECONDS,
+                                         max_files=PREDICTION_LOG_MAX_FILES)
+    logger.info(f"Log de predições em {PREDICTION_LOG_DIR} ({prediction_logger.file_format})")
+
+artifact_signature = None
+_last_artifact_check = time.monotonic()
+_reload_lock = threading.Lock()
+_explainer_lock = threading.Lock()
+
+def _compile_fast_paths(model, preprocessor, model_bundle=None, flat_model_path=None):
+    """
+    Prepara o preprocessador compilado e o backend de predição para o modelo carregado
     
-    with open(CONFIG_PATH, 'r') as f:
-        config = json.load(f)
+    Com um bundle que contém o ensemble achatado, ele é aberto em memory-map e
+    usado sem carregar o modelo nativo (a paridade foi verificada ao criar o bundle).
     
-    feature_names = config.get('feature_names', [])
-    threshold = config.get('threshold', 0.5)
-    risk_categories = config.get('risk_categories', ['Baixo Risco', 'Alto Risco'])
+    Returns:
+        tuple: Preprocessador compilado (ou None) e objeto usado para predict_proba
+    """
+    # Compila o preprocessador para o caminho rápido de predições individuais
+    compiled = None
+    if INFERENCE_MODE == 'compiled':
+        try:
+            compiled = compile_preprocessor(preprocessor)
+            if check_parity(compiled, preprocessor, model):
+                logger.warning("Modo compilado desativado por divergência com o sklearn")
+                compiled = None
+            elif check_batch_parity(compiled, preprocessor, model):
+                logger.warning("Modo compilado desativado: a pontuação em lote diverge da pontuação individual")
+                compiled = None
+        except Exception as e:
+            logger.warning(f"Modo compilado indisponível, usando o caminho sklearn: {str(e)}")
+            compiled = None
     
-    logger.info(f"Modelo carregado de {MODEL_PATH}")
-    logger.info(f"Preprocessador carregado de {PREPROCESSOR_PATH}")
-    logger.info(f"Configuração carregada de {CONFIG_PATH}")
+    # Seleciona o backend usado para pontuar
+    scoring_model = model
+    if MODEL_BACKEND == 'flat' and not flat_model_path and model_bundle is not None and model_bundle.has('flat_model'):
+        scoring_model = model_bundle.flat_model
+        logger.info(f"Usando o backend de árvores achatado do bundle {model_bundle.version}")
+    elif MODEL_BACKEND == 'flat':
+        try:
+            # Arrays em memory-map são compartilhados entre processos via page cache
+            if flat_model_path:
+                flat_model = load_flat_ensemble(flat_model_path, mmap_mode='r')
+            else:
+                flat_model = compile_tree_model(model)
+            if compiled is not None:
+                X_check = build_parity_matrix(compiled)
+            else:
+                X_check = None
+                logger.warning("Paridade do backend achatado não verificada: preprocessador não compilado")
+            if X_check is not None and not np.isfinite(check_backend_parity(flat_model, model, X_check)):
+                logger.warning("Backend achatado desativado por divergência com o modelo original")
+            else:
+                scoring_model = flat_model
+                logger.info("Usando o backend de árvores achatado")
+        except Exception as e:
+            logger.warning(f"Backend achatado indisponível, usando o modelo original: {str(e)}")
     
-except Exception as e:
-    logger.error(f"Erro ao carregar o modelo ou configurações: {str(e)}")
-    model = None
-    preprocessor = None
-    config = None
-    feature_names = []
-    threshold = 0.5
-    risk_categories = ['Baixo Risco', 'Alto Risco']
+    return compiled, scoring_model
 
-@app.route('/health', methods=['GET'])
-def health_check():
+def _build_explainer(model, preprocessor, background=None, background_path=None):
     """
-    Endpoint para verificar a saúde da API
+    Constrói o explicador no carregamento do modelo (ou None se indisponível)
     """
-    if model is not None and preprocessor is not None:
-        return jsonify({
+    try:
+        if background is None:
+            background = load_explainer_background(background_path)
+        return PredictionExplainer(model, preprocessor, background=background)
+    except Exception as e:
+        logger.warning(f"Explicações indisponíveis para o modelo carregado: {str(e)}")
+        return None
+
+def _build_feature_engine(config, feature_names):
+    """
+    Seleciona as features derivadas calculadas pela API
+    
+    Usa as definições de 'derived_features' da configuração ou, na ausência
+    delas, as definições padrão cujas features o modelo espera.
+    
+    Returns:
+        tuple: FeatureEngine (ou None) e lista de features enviadas pelo cliente
+    """
+    if 'derived_features' in config:
+        engine = FeatureEngine.from_config(config['derived_features'])
+    else:
+        engine = FeatureEngine([definition for definition in DEFAULT_FEATURE_DEFINITIONS
+                                if definition.name in feature_names])
+    if not engine.definitions:
+        return None, list(feature_names)
+    
+    mismatches = engine.check_parity()
+    if mismatches:
+        logger.error(f"Features derivadas divergem entre os caminhos vetorizado e por registro: {mismatches[:10]}")
+    
+    # O cliente envia as features de entrada; as derivadas são calculadas pela API
+    input_features = [feature for feature in feature_names if feature not in engine.names]
+    input_features += [feature for feature in engine.inputs if feature not in input_features]
+    logger.info(f"Features derivadas calculadas na API: {engine.names}")
+    return engine, input_features
+
+def _default_source():
+    """
+    Origem dos artefatos definida pelas variáveis de ambiente
+    """
+    if MODEL_BUNDLE_PATH:
+        return {'bundle': MODEL_BUNDLE_PATH, 'cleaning_stats': CLEANING_STATS_PATH,
+                'explainer_background': EXPLAINER_BACKGROUND_PATH, 'drift_reference': DRIFT_REFERENCE_PATH}
+    return {'model': MODEL_PATH, 'preprocessor': PREPROCESSOR_PATH, 'config': CONFIG_PATH,
+            'cleaning_stats': CLEANING_STATS_PATH, 'flat_model': FLAT_MODEL_PATH,
+            'explainer_background': EXPLAINER_BACKGROUND_PATH, 'drift_reference': DRIFT_REFERENCE_PATH}
+
+def _artifact_paths(source=None):
+    source = source or _default_source()
+    if source.get('bundle'):
+        # O manifest identifica a versão; publicar um bundle novo muda LATEST e, com ele, o manifest
+        try:
+            return [os.path.join(resolve_bundle_path(source['bundle']), MANIFEST_FILE)]
+        except FileNotFoundError:
+            return [source['bundle']]
+    paths = [source['model'], source['preprocessor'], source['config']]
+    if source.get('cleaning_stats'):
+        paths.append(source['cleaning_stats'])
+    return paths
+
+def build_model_version(source=None):
+    """
+    Carrega os artefatos de uma versão e prepara seus caminhos de pontuação
+    
+    Args:
+        source (dict): {'bundle': caminho} ou {'model': ..., 'preprocessor': ...,
+            'config': ...}, com 'cleaning_stats', 'flat_model',
+            'explainer_background' e 'drift_reference' opcionais (padrão:
+            variáveis de ambiente)
+    
+    Returns:
+        ModelVersion: Versão pronta para receber tráfego
+    """
+    source = dict(source or _default_source())
+    new_bundle = None
+    if source.get('bundle'):
+        new_bundle = ArtifactBundle(source['bundle'], mmap_mode='r')
+        new_config = new_bundle.config
+        new_preprocessor = new_bundle.preprocessor
+        # Com o ensemble achatado no bundle, o modelo nativo só é carregado se uma explicação for pedida
+        lazy_model = MODEL_BACKEND == 'flat' and not source.get('flat_model') and new_bundle.has('flat_model')
+        new_model = None if lazy_model else new_bundle.model
+        new_cleaning_stats = new_bundle.cleaning_stats
+        if source.get('cleaning_stats') and new_cleaning_stats is None:
+            new_cleaning_stats = load_cleaning_stats(source['cleaning_stats'])
+        name = new_bundle.version
+        # O nome do bundle é escolhido por quem o publica; o conteúdo é identificado pelos checksums
+        fingerprint = hashlib.sha256(json.dumps(new_bundle.manifest['files'], sort_keys=True).encode()).hexdigest()
+        logger.info(f"Bundle {new_bundle.version} carregado de {new_bundle.path}")
+    else:
+        new_model = joblib.load(source['model'])
+        new_preprocessor = joblib.load(source['preprocessor'])
+        
+        with open(source['config'], 'r') as f:
+            new_config = json.load(f)
+        new_cleaning_stats = load_cleaning_stats(source['cleaning_stats']) if source.get('cleaning_stats') else None
+        name = artifact_version(_artifact_paths(source), new_config.get('model_version'))
+        fingerprint = name
+        
+        logger.info(f"Modelo carregado de {source['model']}")
+        logger.info(f"Preprocessador carregado de {source['preprocessor']}")
+        logger.info(f"Configuração carregada de {source['config']}")
+    
+    feature_names = new_config.get('feature_names', [])
+    new_feature_engine, new_input_features = _build_feature_engine(new_config, feature_names)
+    new_compiled, new_predictor = _compile_fast_paths(new_model, new_preprocessor, new_bundle,
+                                                      source.get('flat_model'))
+    new_explainer = None
+    if new_model is not None:
+        background = new_bundle.explainer_background if new_bundle is not None else None
+        new_explainer = _build_explainer(new_model, new_preprocessor, background, source.get('explainer_background'))
+    new_drift_monitor = _build_drift_monitor(new_bundle, source.get('drift_reference'), new_feature_engine)
+    
+    return ModelVersion(
+        name,
+        source=source,
+        fingerprint=fingerprint,
+        model=new_model,
+        preprocessor=new_preprocessor,
+        config=new_config,
+        feature_names=feature_names,
+        input_features=new_input_features,
+        feature_engine=new_feature_engine,
+        threshold=new_config.get('threshold', 0.5),
+        risk_categories=new_config.get('risk_categories', ['Baixo Risco', 'Alto Risco']),
+        compiled_preprocessor=new_compiled,
+        predictor=new_predictor,
+        explainer=new_explainer,
+        explainer_pending=new_model is None,
+        cleaning_stats=new_cleaning_stats,
+        drift_monitor=new_drift_monitor,
+        bundle=new_bundle
+    )
+
+def _build_drift_monitor(model_bundle, reference_path, feature_engine):
+    """
+    Cria o monitor de drift da versão a partir da referência do bundle ou do arquivo (None sem referência)
+    """
+    if not DRIFT_MONITORING:
+        return None
+    reference = model_bundle.drift_reference if model_bundle is not None else None
+    try:
+        if reference is None:
+            reference = load_drift_reference(reference_path)
+    except Exception as e:
+        logger.warning(f"Referência de drift inválida em {reference_path}: {str(e)}")
+        return None
+    if reference is None:
+        logger.info("Monitoramento de drift desativado: referência não encontrada")
+        return None
+    logger.info(f"Monitoramento de drift ativo para {len(reference['features'])} features")
+    return DriftMonitor(reference, feature_engine=feature_engine, window_seconds=DRIFT_WINDOW_SECONDS,
+                        window_buckets=DRIFT_WINDOW_BUCKETS, flush_interval=DRIFT_FLUSH_INTERVAL)
+
+def _publish_globals(version):
+    """
+    Espelha a versão ativa nos globais do módulo (compatibilidade com quem lê api.model etc.)
+    
+    Os endpoints não usam esses globais: cada requisição obtém a sua versão do registro.
+    """
+    global model, preprocessor, config, feature_names, input_features, feature_engine, threshold, risk_categories
+    global compiled_preprocessor, predictor, explainer, cleaning_stats, model_version, bundle
+    
+    model = getattr(version, 'model', None)
+    preprocessor = getattr(version, 'preprocessor', None)
+    config = getattr(version, 'config', None)
+    feature_names = getattr(version, 'feature_names', [])
+    input_features = getattr(version, 'input_features', [])
+    feature_engine = getattr(version, 'feature_engine', None)
+    threshold = getattr(version, 'threshold', 0.5)
+    risk_categories = getattr(version, 'risk_categories', ['Baixo Risco', 'Alto Risco'])
+    compiled_preprocessor = getattr(version, 'compiled_preprocessor', None)
+    predictor = getattr(version, 'predictor', None)
+    explainer = getattr(version, 'explainer', None)
+    cleaning_stats = getattr(version, 'cleaning_stats', None)
+    bundle = getattr(version, 'bundle', None)
+    model_version = getattr(version, 'name', None)
+    if prediction_cache is not None:
+        prediction_cache.set_version(model_version)
+    logger.info(f"Versão dos artefatos: {model_version}")
+
+def _forget_version(name):
+    """
+    Invalida as predições em cache de uma versão descarregada ou substituída no registro
+    """
+    if prediction_cache is not None:
+        prediction_cache.invalidate_version(name)
+
+registry = ModelRegistry(max_versions=MODEL_REGISTRY_MAX_VERSIONS, shadow_workers=MODEL_SHADOW_WORKERS,
+                         on_activate=_publish_globals, on_remove=_forget_version)
+_publish_globals(None)
+
+def load_artifacts():
+    """
+    Carrega (ou recarrega) o modelo, o preprocessador e as configurações
+    
+    A nova versão é preparada por completo e só então se torna a ativa no
+    registro; requisições em andamento terminam com a versão anterior. Se o
+    carregamento falhar, a versão ativa (se houver) continua atendendo.
+    
+    Returns:
+        bool: True se os artefatos foram carregados com sucesso
+    """
+    global artifact_signature
+    
+    artifact_signature = file_signature(_artifact_paths())
+    try:
+        registry.register(build_model_version(), activate=True)
+    except Exception as e:
+        logger.error(f"Erro ao carregar o modelo ou configurações: {str(e)}")
+        return False
+    return True
+
+def reload_if_artifacts_changed():
+    """
+    Carrega em segundo plano uma nova versão se os arquivos mudaram em disco
+    
+    A verificação (mtime e tamanho) é feita no máximo a cada ARTIFACT_CHECK_INTERVAL
+    segundos. A requisição que detecta a mudança não espera o carregamento: a
+    versão atual continua atendendo até a nova ser ativada, o que muda a versão
+    do modelo e, com isso, invalida o cache.
+    
+    Returns:
+        bool: True se um carregamento foi iniciado
+    """
+    global _last_artifact_check, artifact_signature
+    
+    now = time.monotonic()
+    if now - _last_artifact_check < ARTIFACT_CHECK_INTERVAL:
+        return False
+    _last_artifact_check = now
+    
+    signature = file_signature(_artifact_paths())
+    if signature == artifact_signature:
+        return False
+    if not _reload_lock.acquire(blocking=False):
+        return False
+    try:
+        artifact_signature = signature
+        logger.info("Artefatos alterados em disco, carregando a nova versão em segundo plano")
+        registry.load_async(build_model_version, activate=True, description='recarga automática')
+        return True
+    finally:
+        _reload_lock.release()
+
+load_artifacts()
+
+def get_explainer(version):
+    """
+    Retorna o explicador da versão, construindo-o no primeiro uso quando o
+    modelo nativo do bundle ainda não foi carregado
+    """
+    if version.explainer_pending:
+        with _explainer_lock:
+            if version.explainer_pending:
+                version.model = version.bundle.model
+                version.explainer = _build_explainer(version.model, version.preprocessor,
+                                                     version.bundle.explainer_background,
+                                                     version.source.get('explainer_background'))
+                version.explainer_pending = False
+    return version.explainer
+
+def score_frame(input_df, version=None):
+    """
+    Aplica o preprocessador e o modelo a um DataFrame de solicitantes
+    
+    Args:
+        input_df (pd.DataFrame): Dados dos solicitantes
+        version (ModelVersion): Versão usada (padrão: a ativa)
+    
+    Returns:
+        np.array: Probabilidades de alto risco para cada linha
+    """
+    version = version or registry.active
+    if version.cleaning_stats is not None:
+        input_df = apply_cleaning_stats(input_df, version.cleaning_stats)
+    if version.feature_engine is not None:
+        input_df = version.feature_engine.transform_frame(input_df, copy=version.cleaning_stats is None)
+    X = version.preprocessor.transform(input_df)
+    return version.predictor.predict_proba(X)[:, 1]
+
+def score_record(data, version=None, observe=True):
+    """
+    Pontua um único solicitante, usando o preprocessador compilado quando disponível
+    
+    Args:
+        data (dict): Dados do solicitante (as features derivadas são escritas nele)
+        version (ModelVersion): Versão usada (padrão: a ativa)
+        observe (bool): Registra a duração das etapas em /metrics (falso na pontuação em shadow)
+    
+    Returns:
+        float: Probabilidade de alto risco
+    """
+    version = version or registry.active
+    start = time.perf_counter()
+    if version.cleaning_stats is not None:
+        data = clean_record(data, version.cleaning_stats)
+    if version.feature_engine is not None:
+        version.feature_engine.transform_record(data)
+    if version.compiled_preprocessor is not None:
+        X = version.compiled_preprocessor.transform_record(data)
+    else:
+        X = version.preprocessor.transform(pd.DataFrame([data]))
+    transformed = time.perf_counter()
+    risk_prob = version.predictor.predict_proba(X)[0, 1]
+    if observe:
+        STAGE_DURATION.observe(transformed - start, 'transform')
+        STAGE_DURATION.observe(time.perf_counter() - transformed, 'predict')
+    return risk_prob
+
+def score_shadow_record(data, version):
+    """
+    Pontua um solicitante em uma versão em shadow, fora das métricas de etapas
+    """
+    return score_record(data, version, observe=False)
+
+def score_records(records, version=None):
+    """
+    Pontua uma lista de solicitantes com um único predict_proba
+    
+    Args:
+        records (list): Lista de dicts com os dados dos solicitantes
+        version (ModelVersion): Versão usada (padrão: a ativa)
+    
+    Returns:
+        np.array: Probabilidades de alto risco para cada registro
+    """
+    version = version or registry.active
+    start = time.perf_counter()
+    X = transform_records(records, version)
+    transformed = time.perf_counter()
+    probs = version.predictor.predict_proba(X)[:, 1]
+    STAGE_DURATION.observe(transformed - start, 'transform')
+    STAGE_DURATION.observe(time.perf_counter() - transformed, 'predict')
+    return probs
+
+def score_routed_records(items):
+    """
+    Pontua itens (versão, registro) do micro-batcher, com um predict_proba por versão
+    """
+    probs = np.empty(len(items))
+    groups = {}
+    for position, (version, _) in enumerate(items):
+        groups.setdefault(version.name, (version, []))[1].append(position)
+    for version, positions in groups.values():
+        probs[positions] = score_records([items[position][1] for position in positions], version)
+    return probs
+
+def transform_records(records, version=None):
+    """
+    Pré-processa uma lista de solicitantes em uma nova matriz de features
+    
+    Args:
+        records (list): Lista de dicts com os dados dos solicitantes
+        version (ModelVersion): Versão usada (padrão: a ativa)
+    
+    Returns:
+        np.array: Matriz pré-processada (uma linha por registro)
+    """
+    version = version or registry.active
+    if version.cleaning_stats is not None:
+        records = [clean_record(record, version.cleaning_stats) for record in records]
+    if version.feature_engine is not None:
+        for record in records:
+            version.feature_engine.transform_record(record)
+    if version.compiled_preprocessor is not None:
+        return version.compiled_preprocessor.transform_records(records)
+    return version.preprocessor.transform(records_frame(records))
+
+batcher = None
+if MICRO_BATCHING:
+    batcher = MicroBatcher(score_routed_records, max_batch_size=MICRO_BATCH_MAX_SIZE,
+                           max_wait_ms=MICRO_BATCH_MAX_WAIT_MS)
+    logger.info(f"Micro-batching ativado: lote máximo {MICRO_BATCH_MAX_SIZE}, espera máxima {MICRO_BATCH_MAX_WAIT_MS} ms")
+
+def risk_class(risk_prob, version):
+    """
+    Índice da categoria de risco (1 = alto risco) pelo threshold da versão
+    """
+    return 1 if risk_prob >= version.threshold else 0
+
+def build_prediction(risk_prob, version=None):
+    """
+    Monta o dicionário de resposta de uma predição
+    
+    Args:
+        risk_prob (float): Probabilidade de alto risco
+        version (ModelVersion): Versão que pontuou (padrão: a ativa)
+    
+    Returns:
+        dict: Probabilidade, categoria de risco e threshold aplicado
+    """
+    version = version or registry.active
+    return {
+        'risk_probability': float(risk_prob),
+        'risk_category': version.risk_categories[risk_class(risk_prob, version)],
+        'threshold': version.threshold
+    }
+
+def parse_batch_payload(version):
+    """
+    Converte o corpo da requisição de lote em um DataFrame
+    
+    Formatos aceitos:
+        - JSON com lista de solicitantes: [{...}, {...}] ou {"applicants": [{...}, {...}]}
+        - JSON colunar: {"columns": {"idade": [...], "renda": [...], ...}}
+        - CSV (Content-Type: text/csv) com cabeçalho
+    
+    Args:
+        version (ModelVersion): Versão cujas features são exigidas
+    
+    Returns:
+        tuple: DataFrame com as linhas válidas, índices originais dessas linhas
+            e dicionário {índice: mensagem} com os erros por linha
+    """
+    if request.mimetype == 'text/csv':
+        input_df = pd.read_csv(io.BytesIO(request.get_data()))
+        return _validate_columns(input_df, version)
+    
+    data = request.get_json()
+    if isinstance(data, dict) and 'columns' in data:
+        columns = data['columns']
+        if not isinstance(columns, dict):
+            raise ValueError("O campo 'columns' deve ser um objeto {feature: [valores]}")
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError('Todas as colunas devem ter o mesmo número de valores')
+        return _validate_columns(pd.DataFrame(columns), version)
+    
+    records = data.get('applicants') if isinstance(data, dict) else data
+    if not isinstance(records, list):
+        raise ValueError("Envie uma lista de solicitantes, {'applicants': [...]} ou {'columns': {...}}")
+    
+    # Valida cada linha uma única vez contra a lista de features esperadas
+    required = set(version.input_features)
+    valid_records, valid_index, errors = [], [], {}
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors[i] = 'Cada solicitante deve ser um objeto JSON'
+            continue
+        missing_features = required.difference(record)
+        if missing_features:
+            errors[i] = f'Features faltantes: {sorted(missing_features)}'
+            continue
+        valid_records.append(record)
+        valid_index.append(i)
+    
+    return records_frame(valid_records), valid_index, errors
+
+def _validate_columns(input_df, version):
+    """
+    Valida as colunas de um lote colunar uma única vez para todas as linhas
+    """
+    missing_features = [feature for feature in version.input_features if feature not in input_df.columns]
+    if missing_features:
+        raise ValueError(f'Features faltantes: {missing_features}')
+    return input_df, list(range(len(input_df))), {}
+
+def score_batch(input_df, version=None):
+    """
+    Pontua um lote em blocos de BATCH_CHUNK_SIZE linhas
+    
+    Cada bloco passa por um único transform/predict_proba. Se um bloco falhar,
+    as linhas dele são pontuadas individualmente para isolar as linhas inválidas.
+    
+    Args:
+        input_df (pd.DataFrame): Linhas válidas do lote
+        version (ModelVersion): Versão usada (padrão: a ativa)
+    
+    Returns:
+        tuple: Array de probabilidades (NaN nas linhas com erro) e dicionário
+            {posição: mensagem} com os erros de pontuação
+    """
+    version = version or registry.active
+    probs = np.full(len(input_df), np.nan)
+    errors = {}
+    for start in range(0, len(input_df), BATCH_CHUNK_SIZE):
+        chunk = input_df.iloc[start:start + BATCH_CHUNK_SIZE]
+        try:
+            probs[start:start + len(chunk)] = score_frame(chunk, version)
+        except Exception:
+            for offset in range(len(chunk)):
+                try:
+                    probs[start + offset] = score_frame(chunk.iloc[offset:offset + 1], version)[0]
+                except Exception as e:
+                    errors[start + offset] = str(e)
+    return probs, errors
+
+def health_payload():
+    """
+    Monta a resposta do health check
+    
+    Returns:
+        tuple: Corpo da resposta (dict) e código HTTP
+    """
+    version = registry.active
+    if version is not None and version.predictor is not None and version.preprocessor is not None:
+        return {
             'status': 'ok',
-            'message': 'API está funcionando corretamente'
-        }), 200
+            'message': 'API está funcionando corretamente',
+            'model_version': version.name
+        }, 200
     else:
-        return jsonify({
+        return {
             'status': 'error',
             'message': 'API não está funcionando corretamente: modelo ou preprocessador não carregados'
-        }), 500
+        }, 500
 
-@app.route('/predict', methods=['POST'])
-def predict():
+def predict_payload(data):
     """
-    Endpoint para realizar predições de risco de crédito
+    Realiza a predição de um solicitante a partir do JSON já decodificado
+    
+    Compartilhado entre a API Flask e a variante ASGI (src/asgi_api.py), para que
+    ambas tenham exatamente o mesmo contrato.
+    
+    Args:
+        data: Corpo JSON decodificado da requisição
+    
+    Returns:
+        tuple: Corpo da resposta (dict) e código HTTP
     """
+    version = None
+    start = time.perf_counter()
     try:
-        # Obtém os dados da requisição
-        data = request.get_json()
+        if ARTIFACT_CHECK_INTERVAL > 0:
+            reload_if_artifacts_changed()
         
         # Verifica se os dados foram fornecidos
         if not data:
-            return jsonify({
+            return {
                 'status': 'error',
                 'message': 'Nenhum dado foi fornecido'
-            }), 400
+            }, 400
+        
+        if not isinstance(data, dict):
+            return {
+                'status': 'error',
+                'message': 'Os dados devem ser um objeto JSON com as features do solicitante'
+            }, 400
         
-        # Converte os dados para DataFrame
-        input_df = pd.DataFrame([data])
+        # Uma única versão atende a requisição inteira, mesmo se outra for ativada no meio dela
+        version = registry.active
+        if registry.routing is not None:
+            version = registry.route(canonical_features_key(data, version.input_features))
         
         # Verifica se todas as features necessárias estão presentes
-        missing_features = [feature for feature in feature_names if feature not in input_df.columns]
+        missing_features = [feature for feature in version.input_features if feature not in data]
         if missing_features:
-            return jsonify({
+            return {
                 'status': 'error',
                 'message': f'Features faltantes: {missing_features}'
-            }), 400
+            }, 400
+        STAGE_DURATION.observe(time.perf_counter() - start, 'validate')
+        
+        # Cópia dos dados brutos para as versões em shadow (a pontuação escreve as features derivadas)
+        shadow_record = dict(data) if registry.shadow else None
+        
+        # Consulta o cache antes de pré-processar e pontuar
+        risk_prob = None
+        cache_hit = False
+        if prediction_cache is not None:
+            cache_key = prediction_cache.make_key(data, version.input_features, version.name)
+            risk_prob = prediction_cache.get(cache_key)
+            cache_hit = risk_prob is not None
         
-        # Pré-processamento dos dados
-        X = preprocessor.transform(input_df)
+        # Pré-processamento dos dados e predição
+        if risk_prob is None:
+            if batcher is not None:
+                risk_prob = batcher.submit((version, data)).result(timeout=MICRO_BATCH_TIMEOUT)
+            else:
+                risk_prob = score_record(data, version)
+            if prediction_cache is not None:
+                prediction_cache.put(cache_key, float(risk_prob))
+        prediction = build_prediction(risk_prob, version)
         
-        # Faz a predição
-        risk_prob = model.predict_proba(X)[0, 1]
-        risk_binary = 1 if risk_prob >= threshold else 0
-        risk_category = risk_categories[risk_binary]
+        latency_ms = (time.perf_counter() - start) * 1000
+        version.stats.record(latency_ms, cache_hit=cache_hit, high_risk=risk_class(risk_prob, version) == 1)
+        if prediction_logger is not None:
+            # Só as features de entrada; o hash e a conversão colunar ficam na thread de escrita
+            features = {feature: data[feature] for feature in version.input_features}
+            prediction_logger.log('/predict', version.name, features, risk_prob, prediction['risk_category'],
+                                  latency_ms, version.input_features)
+        if version.drift_monitor is not None:
+            # Só enfileira: os bins e as features derivadas são calculados na thread do monitor
+            version.drift_monitor.observe(data, risk_prob)
+        PREDICTIONS.inc(version.name, prediction['risk_category'])
+        RISK_SCORES.observe(prediction['risk_probability'], version.name)
+        if shadow_record is not None:
+            registry.submit_shadow(shadow_record, version, float(risk_prob), score_shadow_record, risk_class)
         
-        # Loga a predição
-        logger.info(f"Predição realizada: Prob={risk_prob:.4f}, Categoria={risk_category}")
+        # Loga a predição (só em DEBUG: formatar a mensagem a cada requisição pesa no caminho quente)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Predição realizada: Versão={version.name}, Prob={risk_prob:.4f}, Categoria={prediction['risk_category']}")
         
         # Retorna a resposta
-        return jsonify({
+        return {
             'status': 'success',
-            'prediction': {
-                'risk_probability': float(risk_prob),
-                'risk_category': risk_category,
-                'threshold': threshold
-            }
-        }), 200
+            'prediction': prediction,
+            'model_version': version.name
+        }, 200
         
     except Exception as e:
+        if version is not None:
+            version.stats.record((time.perf_counter() - start) * 1000, error=True)
         logger.error(f"Erro ao realizar predição: {str(e)}")
-        return jsonify({
+        return {
             'status': 'error',
             'message': f'Ocorreu um erro ao processar a requisição: {str(e)}'
-        }), 500
+        }, 500
 
-@app.route('/explain', methods=['POST'])
-def explain():
+def explain_records(records, version=None):
     """
-    Endpoint para explicar uma predição
+    Pontua e explica uma lista de solicitantes com uma única transformação
+    
+    Args:
+        records (list): Lista de dicts com os dados dos solicitantes
+        version (ModelVersion): Versão usada (padrão: a ativa)
+    
+    Returns:
+        list: Um dict por solicitante com a predição e a explicação
+    """
+    version = version or registry.active
+    X = transform_records(records, version)
+    probs = version.predictor.predict_proba(X)[:, 1]
+    explanations = get_explainer(version).explain(X, records=records, top_k=EXPLAIN_TOP_K)
+    results = []
+    for risk_prob, explanation in zip(probs, explanations):
+        results.append({'prediction': build_prediction(risk_prob, version), 'explanation': explanation})
+    return results
+
+def explain_payload(data):
+    """
+    Gera a explicação de uma predição a partir do JSON já decodificado
+    
+    Args:
+        data: Corpo JSON decodificado da requisição
+    
+    Returns:
+        tuple: Corpo da resposta (dict) e código HTTP
     """
     try:
-        # Obtém os dados da requisição
-        data = request.get_json()
-        
         # Verifica se os dados foram fornecidos
         if not data:
-            return jsonify({
+            return {
                 'status': 'error',
                 'message': 'Nenhum dado foi fornecido'
-            }), 400
+            }, 400
+        
+        if not isinstance(data, dict):
+            return {
+                'status': 'error',
+                'message': 'Os dados devem ser um objeto JSON com as features do solicitante'
+            }, 400
         
-        # Converte os dados para DataFrame
-        input_df = pd.DataFrame([data])
+        version = registry.active
+        if get_explainer(version) is None:
+            return {
+                'status': 'error',
+                'message': 'Explicações indisponíveis para o modelo carregado'
+            }, 500
         
         # Verifica se todas as features necessárias estão presentes
-        # (parte do código foi cortada, mas provavelmente usa SHAP ou LIME para gerar explicações)
+        missing_features = [feature for feature in version.input_features if feature not in data]
+        if missing_features:
+            return {
+                'status': 'error',
+                'message': f'Features faltantes: {missing_features}'
+            }, 400
+        
+        result = explain_records([data], version)[0]
+        
+        return {
+            'status': 'success',
+            'prediction': result['prediction'],
+            'explanation': result['explanation'],
+            'model_version': version.name
+        }, 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao gerar explicação: {str(e)}")
+        return {
+            'status': 'error',
+            'message': f'Ocorreu um erro ao processar a requisição: {str(e)}'
+        }, 500
+
+def explain_batch_payload(data):
+    """
+    Gera explicações para um lote de solicitantes a partir do JSON já decodificado
+    
+    Aceita [{...}, {...}] ou {"applicants": [{...}, {...}]}. As linhas válidas são
+    explicadas em uma única chamada ao explicador; linhas inválidas recebem erro
+    individual sem derrubar o lote.
+    
+    Args:
+        data: Corpo JSON decodificado da requisição
+    
+    Returns:
+        tuple: Corpo da resposta (dict) e código HTTP
+    """
+    try:
+        version = registry.active
+        if get_explainer(version) is None:
+            return {
+                'status': 'error',
+                'message': 'Explicações indisponíveis para o modelo carregado'
+            }, 500
+        
+        records = data.get('applicants') if isinstance(data, dict) else data
+        if not isinstance(records, list) or not records:
+            return {
+                'status': 'error',
+                'message': "Envie uma lista de solicitantes ou {'applicants': [...]}"
+            }, 400
+        if len(records) > EXPLAIN_BATCH_MAX_ROWS:
+            return {
+                'status': 'error',
+                'message': f'O lote excede o limite de {EXPLAIN_BATCH_MAX_ROWS} linhas'
+            }, 413
+        
+        required = set(version.input_features)
+        valid_records, valid_index, results = [], [], [None] * len(records)
+        for i, record in enumerate(records):
+            if not isinstance(record, dict):
+                results[i] = {'index': i, 'status': 'error', 'message': 'Cada solicitante deve ser um objeto JSON'}
+                continue
+            missing_features = required.difference(record)
+            if missing_features:
+                results[i] = {'index': i, 'status': 'error',
+                              'message': f'Features faltantes: {sorted(missing_features)}'}
+                continue
+            valid_records.append(record)
+            valid_index.append(i)
+        
+        if valid_records:
+            for i, result in zip(valid_index, explain_records(valid_records, version)):
+                results[i] = {'index': i, 'status': 'success', **result}
+        
+        failed = len(records) - len(valid_records)
+        return {
+            'status': 'success',
+            'model_version': version.name,
+            'summary': {
+                'total': len(records),
+                'succeeded': len(valid_records),
+                'failed': failed
+            },
+            'results': results
+        }, 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao gerar explicações em lote: {str(e)}")
+        return {
+            'status': 'error',
+            'message': f'Ocorreu um erro ao processar a requisição: {str(e)}'
+        }, 500
+
+def models_payload():
+    """
+    Monta a resposta com as versões residentes, o roteamento e as métricas por versão
+    
+    Returns:
+        tuple: Corpo da resposta (dict) e código HTTP
+    """
+    return {
+        'status': 'success',
+        'registry': registry.describe()
+    }, 200
+
+def drift_payload(version_name=None, window='recent', include_bins=False):
+    """
+    Monta a resposta com o PSI/KS das features e das probabilidades de uma versão
+    
+    Args:
+        version_name (str): Versão consultada (padrão: a ativa)
+        window (str): 'recent' (últimos DRIFT_WINDOW_SECONDS) ou 'total' (desde o carregamento)
+        include_bins (bool): Inclui as proporções por bin
+    
+    Returns:
+        tuple: Corpo da resposta (dict) e código HTTP
+    """
+    try:
+        version = registry.get(version_name) if version_name else registry.active
+    except KeyError as e:
+        return {
+            'status': 'error',
+            'message': str(e).strip("'")
+        }, 404
+    if version is None or version.drift_monitor is None:
+        return {
+            'status': 'error',
+            'message': 'Monitoramento de drift desativado (referência não encontrada em DRIFT_REFERENCE_PATH)'
+        }, 404
+    if window not in ('recent', 'total'):
+        return {
+            'status': 'error',
+            'message': "Parâmetro window inválido (use 'recent' ou 'total')"
+        }, 400
+    
+    return {
+        'status': 'success',
+        'model_version': version.name,
+        'drift': version.drift_monitor.report(window, include_bins),
+        'stats': version.drift_monitor.stats()
+    }, 200
+
+def _admin_error():
+    """
+    Verifica o token dos endpoints de administração do registro
+    
+    Returns:
+        tuple: Corpo e código HTTP do erro, ou None se autorizado
+    """
+    if not MODEL_ADMIN_TOKEN:
+        return {
+            'status': 'error',
+            'message': 'Administração de versões desativada (defina MODEL_ADMIN_TOKEN)'
+        }, 403
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode(), MODEL_ADMIN_TOKEN.encode()):
+        return {
+            'status': 'error',
+            'message': 'Token de administração inválido'
+        }, 401
+    return None
+
+def _registry_action(action):
+    """
+    Executa uma ação de administração do registro sobre o JSON da requisição
+    
+    Args:
+        action (callable): action(data) -> dict com o resultado
+    
+    Returns:
+        tuple: Resposta Flask e código HTTP
+    """
+    error = _admin_error()
+    if error is not None:
+        body, status = error
+        return jsonify(body), status
+    try:
+        data = request.get_json(silent=True) or {}
+        result = action(data)
+    except (KeyError, ValueError) as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e).strip("'")
+        }), 400
+    return jsonify(dict({'status': 'success'}, **result)), 200
+
+def _cache_metrics():
+    """
+    Contadores do cache de predições para /metrics
+    """
+    if prediction_cache is None:
+        return []
+    stats = prediction_cache.stats()
+    return [
+        ('credit_api_cache_hits_total', 'counter', 'Acertos do cache de predições', {(): stats['hits']}),
+        ('credit_api_cache_misses_total', 'counter', 'Falhas do cache de predições', {(): stats['misses']}),
+        ('credit_api_cache_entries', 'gauge', 'Entradas no cache de predições', {(): stats['size']})
+    ]
+
+def _prediction_log_metrics():
+    """
+    Contadores do log de predições para /metrics
+    """
+    if prediction_logger is None:
+        return []
+    stats = prediction_logger.stats()
+    return [
+        ('credit_api_prediction_log_written_total', 'counter', 'Predições gravadas no log', {(): stats['written']}),
+        ('credit_api_prediction_log_dropped_total', 'counter', 'Predições descartadas com a fila do log cheia',
+         {(): stats['dropped']}),
+        ('credit_api_prediction_log_queue_size', 'gauge', 'Itens aguardando gravação no log', {(): stats['queue_size']})
+    ]
+
+def _drift_metrics():
+    """
+    PSI da janela recente por versão e feature para /metrics
+    """
+    psi, dropped = {}, {}
+    for name in registry.names():
+        try:
+            monitor = getattr(registry.get(name), 'drift_monitor', None)
+        except KeyError:
+            continue
+        if monitor is None:
+            continue
+        report = monitor.report('recent')
+        distributions = dict(report['features'])
+        if report[SCORE_FEATURE] is not None:
+            distributions[SCORE_FEATURE] = report[SCORE_FEATURE]
+        for feature, entry in distributions.items():
+            if entry['psi'] is not None:
+                psi[(('model_version', name), ('feature', feature))] = entry['psi']
+        dropped[(('model_version', name),)] = monitor.dropped
+    if not dropped:
+        return []
+    return [
+        ('credit_api_feature_psi', 'gauge', 'PSI da janela recente em relação à referência do treinamento', psi),
+        ('credit_api_drift_dropped_total', 'counter', 'Observações descartadas com a fila do monitor de drift cheia',
+         dropped)
+    ]
+
+metrics.register_collector(_cache_metrics)
+metrics.register_collector(_prediction_log_metrics)
+metrics.register_collector(_drift_metrics)
+
+def record_request(endpoint, status, duration):
+    """
+    Registra uma requisição em /metrics (compartilhado com a variante ASGI)
+    """
+    REQUESTS.inc(endpoint, status)
+    REQUEST_DURATION.observe(duration, endpoint)
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _record_request_metrics(response):
+    start = g.get('request_start')
+    if start is not None:
+        # A regra da rota (e não o caminho) mantém limitada a cardinalidade dos labels
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        record_request(endpoint, response.status_code, time.perf_counter() - start)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Endpoint com as métricas no formato texto do Prometheus
+    """
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    """
+    Endpoint para verificar a saúde da API
+    """
+    body, status = health_payload()
+    return jsonify(body), status
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    """
+    Endpoint para realizar predições de risco de crédito
+    """
+    try:
+        # Obtém os dados da requisição
+        start = time.perf_counter()
+        data = request.get_json()
+        STAGE_DURATION.observe(time.perf_counter() - start, 'parse')
+    except Exception as e:
+        logger.error(f"Erro ao realizar predição: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Ocorreu um erro ao processar a requisição: {str(e)}'
+        }), 500
+    
+    body, status = predict_payload(data)
+    start = time.perf_counter()
+    response = jsonify(body)
+    STAGE_DURATION.observe(time.perf_counter() - start, 'serialize')
+    return response, status
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Endpoint para realizar predições de risco de crédito em lote
+    """
+    version = registry.active
+    if version is None or version.predictor is None or version.preprocessor is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Modelo ou preprocessador não carregados'
+        }), 500
+    
+    try:
+        input_df, row_index, errors = parse_batch_payload(version)
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Lote inválido: {str(e)}'
+        }), 400
+    
+    total = len(row_index) + len(errors)
+    if total == 0:
+        return jsonify({
+            'status': 'error',
+            'message': 'Nenhum dado foi fornecido'
+        }), 400
+    if total > BATCH_MAX_ROWS:
+        return jsonify({
+            'status': 'error',
+            'message': f'O lote excede o limite de {BATCH_MAX_ROWS} linhas'
+        }), 413
+    
+    try:
+        start = time.perf_counter()
+        probs, score_errors = score_batch(input_df, version)
+        for position, message in score_errors.items():
+            errors[row_index[position]] = f'Erro ao pontuar a linha: {message}'
+        
+        # Categorias calculadas de forma vetorizada para o lote inteiro
+        risk_binary = (probs >= version.threshold).astype(int)
+        results = [None] * total
+        for position, i in enumerate(row_index):
+            if position in score_errors:
+                continue
+            results[i] = {
+                'index': i,
+                'status': 'success',
+                'prediction': {
+                    'risk_probability': float(probs[position]),
+                    'risk_category': version.risk_categories[risk_binary[position]],
+                    'threshold': version.threshold
+                }
+            }
+        for i, message in errors.items():
+            results[i] = {'index': i, 'status': 'error', 'message': message}
+        
+        scored = ~np.isnan(probs)
+        for category, count in enumerate(np.bincount(risk_binary[scored], minlength=2).tolist()):
+            if count:
+                PREDICTIONS.inc(version.name, version.risk_categories[category], amount=count)
+        RISK_SCORES.observe_many(probs, version.name)
+        if prediction_logger is not None and len(input_df):
+            categories = np.asarray(version.risk_categories, dtype=object)[risk_binary]
+            prediction_logger.log_batch('/predict/batch', version.name, input_df, probs, categories,
+                                        (time.perf_counter() - start) * 1000, version.input_features)
+        if version.drift_monitor is not None and len(input_df):
+            version.drift_monitor.observe_frame(input_df, probs)
+        
+        logger.info(f"Predição em lote realizada: {total - len(errors)} linhas pontuadas, {len(errors)} com erro")
         
         return jsonify({
             'status': 'success',
-            'explanation': 'Explicação gerada com sucesso.'
+            'model_version': version.name,
+            'summary': {
+                'total': total,
+                'succeeded': total - len(errors),
+                'failed': len(errors)
+            },
+            'results': results
         }), 200
         
+    except Exception as e:
+        logger.error(f"Erro ao realizar predição em lote: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Ocorreu um erro ao processar a requisição: {str(e)}'
+        }), 500
+
+@app.route('/batcher/stats', methods=['GET'])
+def batcher_stats():
+    """
+    Endpoint com as métricas do micro-batcher (espera na fila, tamanho de lote e latência)
+    """
+    if batcher is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Micro-batching desativado (MICRO_BATCHING=1 para ativar)'
+        }), 404
+    
+    return jsonify({
+        'status': 'success',
+        'stats': batcher.stats()
+    }), 200
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Endpoint com os contadores do cache de predições
+    """
+    if prediction_cache is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Cache de predições desativado (PREDICTION_CACHE_SIZE=0)'
+        }), 404
+    
+    return jsonify({
+        'status': 'success',
+        'stats': prediction_cache.stats()
+    }), 200
+
+@app.route('/drift', methods=['GET'])
+def drift():
+    """
+    Endpoint com o drift das features e das probabilidades em relação ao treinamento
+    
+    Parâmetros: version (padrão: a ativa), window ('recent' ou 'total') e bins=1
+    para incluir as proporções por bin.
+    """
+    body, status = drift_payload(request.args.get('version'), request.args.get('window', 'recent'),
+                                 request.args.get('bins') == '1')
+    return jsonify(body), status
+
+@app.route('/models', methods=['GET'])
+def list_models():
+    """
+    Endpoint com as versões residentes, o roteamento e as métricas de tráfego e latência por versão
+    """
+    body, status = models_payload()
+    return jsonify(body), status
+
+@app.route('/models/load', methods=['POST'])
+def load_model_version():
+    """
+    Endpoint para carregar uma versão em segundo plano
+    
+    Corpo: {"bundle": caminho} ou {"model": ..., "preprocessor": ..., "config": ...},
+    com "activate" opcional. Responde 202 com o identificador do carregamento,
+    cujo andamento aparece em GET /models.
+    """
+    error = _admin_error()
+    if error is not None:
+        body, status = error
+        return jsonify(body), status
+    
+    data = request.get_json(silent=True) or {}
+    keys = ('bundle', 'model', 'preprocessor', 'config', 'cleaning_stats', 'flat_model', 'explainer_background',
+            'drift_reference')
+    source = {key: data[key] for key in keys if data.get(key)}
+    if 'bundle' not in source and not all(key in source for key in ('model', 'preprocessor', 'config')):
+        return jsonify({
+            'status': 'error',
+            'message': "Informe 'bundle' ou 'model', 'preprocessor' e 'config'"
+        }), 400
+    
+    description = source.get('bundle') or source['model']
+    load_id = registry.load_async(lambda: build_model_version(source), activate=bool(data.get('activate')),
+                                  description=description)
+    return jsonify({
+        'status': 'accepted',
+        'load_id': load_id
+    }), 202
+
+@app.route('/models/activate', methods=['POST'])
+def activate_model_version():
+    """
+    Endpoint para trocar a versão ativa ({"version": nome})
+    """
+    def action(data):
+        registry.activate(data.get('version'))
+        return {'active': registry.active.name}
+    return _registry_action(action)
+
+@app.route('/models/routing', methods=['POST'])
+def route_model_versions():
+    """
+    Endpoint para o roteamento A/B ({"weights": {versão: percentual}}; vazio desativa)
+    """
+    def action(data):
+        registry.set_routing(data.get('weights'))
+        return {'routing': registry.describe()['routing']}
+    return _registry_action(action)
+
+@app.route('/models/shadow', methods=['POST'])
+def shadow_model_versions():
+    """
+    Endpoint para definir as versões em shadow ({"versions": [nomes]}; vazio desativa)
+    """
+    def action(data):
+        registry.set_shadow(data.get('versions'))
+        return {'shadow': list(registry.shadow)}
+    return _registry_action(action)
+
+@app.route('/models/unload', methods=['POST'])
+def unload_model_version():
+    """
+    Endpoint para descarregar uma versão que não está ativa, no roteamento ou em shadow
+    """
+    def action(data):
+        registry.unload(data.get('version'))
+        return {'versions': registry.names()}
+    return _registry_action(action)
+
+@app.route('/explain', methods=['POST'])
+def explain():
+    """
+    Endpoint para explicar uma predição
+    """
+    try:
+        # Obtém os dados da requisição
+        data = request.get_json()
     except Exception as e:
         logger.error(f"Erro ao gerar explicação: {str(e)}")
         return jsonify({
             'status': 'error',
             'message': f'Ocorreu um erro ao processar a requisição: {str(e)}'
         }), 500
+    
+    body, status = explain_payload(data)
+    return jsonify(body), status
+
+@app.route('/explain/batch', methods=['POST'])
+def explain_batch():
+    """
+    Endpoint para explicar predições de um lote de solicitantes
+    """
+    try:
+        data = request.get_json()
+    except Exception as e:
+        logger.error(f"Erro ao gerar explicações em lote: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Ocorreu um erro ao processar a requisição: {str(e)}'
+        }), 500
+    
+    body, status = explain_batch_payload(data)
+    return jsonify(body), status
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000)
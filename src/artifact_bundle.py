@@ -0,0 +1,357 @@
+import argparse
+import os
+import json
+import time
+import shutil
+import hashlib
+import platform
+import threading
+import numpy as np
+import pandas as pd
+import joblib
+from tree_compiler import compile_tree_model, save_flat_ensemble, load_flat_ensemble, check_backend_parity
+from inference import compile_preprocessor, build_parity_matrix
+from data_processing import load_cleaning_stats
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+# Arquivo na raiz dos bundles com a versão publicada mais recente
+LATEST_FILE = 'LATEST'
+
+# Arquivos de cada componente dentro do bundle
+COMPONENT_FILES = {
+    'model': 'model.joblib',
+    'preprocessor': 'preprocessor.joblib',
+    'config': 'config.json',
+    'cleaning_stats': 'cleaning_stats.json',
+    'explainer_background': 'explainer_background.csv',
+    'drift_reference': 'drift_reference.json',
+    'flat_model': 'flat_model'
+}
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _library_versions():
+    versions = {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__}
+    for module_name in ['sklearn', 'xgboost']:
+        try:
+            versions[module_name] = __import__(module_name).__version__
+        except ImportError:
+            pass
+    return versions
+
+def _list_files(directory):
+    """
+    Lista os arquivos de um bundle (caminhos relativos), exceto o manifest
+    """
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            relative = os.path.relpath(os.path.join(root, name), directory)
+            if relative != MANIFEST_FILE:
+                files.append(relative)
+    return sorted(files)
+
+def save_bundle(model, preprocessor, config, bundle_root, version=None, cleaning_stats=None,
+                explainer_background=None, drift_reference=None, compile_trees=True):
+    """
+    Salva um bundle versionado com modelo, preprocessador, configuração e checksums
+    
+    Layout de `bundle_root/<versão>/`:
+        - manifest.json: versão, data, bibliotecas, componentes e sha256 de cada arquivo
+        - model.joblib / preprocessor.joblib: sem compressão, para que os arrays
+          NumPy possam ser carregados em memory-map
+        - config.json, cleaning_stats.json, explainer_background.csv e
+          drift_reference.json (opcionais)
+        - flat_model/: ensemble achatado em .npy (modelos de árvores), compartilhado
+          entre processos via page cache; incluído apenas se a paridade com o
+          modelo nativo for confirmada
+    
+    O bundle é escrito em um diretório temporário e renomeado ao final; em
+    seguida `bundle_root/LATEST` passa a apontar para a nova versão.
+    
+    Args:
+        model: Modelo treinado
+        preprocessor: Preprocessador treinado
+        config (dict): Configuração consumida pela API
+        bundle_root (str): Diretório raiz dos bundles
+        version (str): Nome da versão (padrão: data e hora)
+        cleaning_stats (dict): Estatísticas de limpeza (opcional)
+        explainer_background (pd.DataFrame): Amostra de referência do explicador (opcional)
+        drift_reference (dict): Histogramas de referência do monitoramento de drift (opcional)
+        compile_trees (bool): Salva também o ensemble achatado, se o modelo for de árvores
+    
+    Returns:
+        str: Caminho do bundle salvo
+    """
+    version = version or time.strftime('%Y%m%d-%H%M%S')
+    bundle_path = os.path.join(bundle_root, version)
+    if os.path.exists(bundle_path):
+        raise ValueError(f"O bundle {bundle_path} já existe")
+    tmp_path = os.path.join(bundle_root, f".{version}.tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    
+    components = ['model', 'preprocessor', 'config']
+    flat_model_parity = None
+    joblib.dump(model, os.path.join(tmp_path, COMPONENT_FILES['model']))
+    joblib.dump(preprocessor, os.path.join(tmp_path, COMPONENT_FILES['preprocessor']))
+    with open(os.path.join(tmp_path, COMPONENT_FILES['config']), 'w') as f:
+        json.dump(config, f, indent=4)
+    if cleaning_stats is not None:
+        with open(os.path.join(tmp_path, COMPONENT_FILES['cleaning_stats']), 'w') as f:
+            json.dump(cleaning_stats, f, indent=2, default=str)
+        components.append('cleaning_stats')
+    if explainer_background is not None:
+        explainer_background.to_csv(os.path.join(tmp_path, COMPONENT_FILES['explainer_background']), index=False)
+        components.append('explainer_background')
+    if drift_reference is not None:
+        with open(os.path.join(tmp_path, COMPONENT_FILES['drift_reference']), 'w') as f:
+            json.dump(drift_reference, f, indent=2)
+        components.append('drift_reference')
+    if compile_trees:
+        try:
+            flat_model = compile_tree_model(model)
+            # A paridade é verificada aqui para que a API possa usar o ensemble sem carregar o modelo nativo
+            X_check = build_parity_matrix(compile_preprocessor(preprocessor))
+            flat_model_parity = check_backend_parity(flat_model, model, X_check)
+            if np.isfinite(flat_model_parity):
+                save_flat_ensemble(flat_model, os.path.join(tmp_path, COMPONENT_FILES['flat_model']))
+                components.append('flat_model')
+        except Exception as e:
+            logger.info(f"Bundle sem ensemble achatado: {str(e)}")
+    
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'version': version,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'model_type': type(model).__name__,
+        'libraries': _library_versions(),
+        'components': components,
+        'flat_model_parity': flat_model_parity,
+        'files': {
+            relative: {
+                'sha256': _sha256(os.path.join(tmp_path, relative)),
+                'size': os.path.getsize(os.path.join(tmp_path, relative))
+            }
+            for relative in _list_files(tmp_path)
+        }
+    }
+    with open(os.path.join(tmp_path, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=4)
+    
+    os.replace(tmp_path, bundle_path)
+    set_latest_version(bundle_root, version)
+    logger.info(f"Bundle {version} salvo em {bundle_path} ({len(manifest['files'])} arquivos)")
+    return bundle_path
+
+def set_latest_version(bundle_root, version):
+    """
+    Aponta bundle_root/LATEST para uma versão (escrita atômica)
+    """
+    tmp_path = os.path.join(bundle_root, f"{LATEST_FILE}.tmp")
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(bundle_root, LATEST_FILE))
+
+def resolve_bundle_path(path):
+    """
+    Resolve o caminho de um bundle: o próprio diretório (com manifest.json) ou
+    a versão apontada por LATEST dentro de um diretório raiz
+    
+    Returns:
+        str: Diretório do bundle
+    """
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return path
+    latest = os.path.join(path, LATEST_FILE)
+    if os.path.exists(latest):
+        with open(latest, 'r') as f:
+            return os.path.join(path, f.read().strip())
+    raise FileNotFoundError(f"Nenhum bundle encontrado em {path}")
+
+class ArtifactBundle:
+    """
+    Bundle de artefatos com carregamento preguiçoso
+    
+    Apenas o manifest e o config são lidos na abertura. Cada componente é
+    carregado no primeiro acesso e, se `verify=True`, tem o sha256 conferido
+    com o manifest antes de ser desserializado. Os arrays NumPy dos arquivos
+    joblib e o ensemble achatado são abertos em memory-map (`mmap_mode`), de
+    modo que processos que carregam o mesmo bundle compartilham as páginas.
+    
+    Args:
+        path (str): Diretório do bundle ou diretório raiz com LATEST
+        mmap_mode (str): Modo de memory-map dos arrays (None carrega em memória)
+        verify (bool): Confere os checksums dos arquivos carregados
+    """
+    
+    def __init__(self, path, mmap_mode='r', verify=True):
+        self.path = resolve_bundle_path(path)
+        self.mmap_mode = mmap_mode
+        self.verify = verify
+        with open(os.path.join(self.path, MANIFEST_FILE), 'r') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format_version', 0) > BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"Formato de bundle não suportado: {self.manifest['format_version']}")
+        self._loaded = {}
+        self._lock = threading.Lock()
+        self._check_libraries()
+        self.config = self._load('config')
+    
+    @property
+    def version(self):
+        return self.manifest['version']
+    
+    @property
+    def manifest_path(self):
+        return os.path.join(self.path, MANIFEST_FILE)
+    
+    def has(self, component):
+        return component in self.manifest['components']
+    
+    def _check_libraries(self):
+        current = _library_versions()
+        for library, saved in self.manifest.get('libraries', {}).items():
+            if library in current and current[library] != saved:
+                logger.warning(f"Bundle {self.version} salvo com {library} {saved}, carregado com {current[library]}")
+    
+    def _verify_file(self, relative):
+        expected = self.manifest['files'].get(relative)
+        if expected is None:
+            raise ValueError(f"Arquivo {relative} não consta no manifest do bundle {self.version}")
+        if _sha256(os.path.join(self.path, relative)) != expected['sha256']:
+            raise ValueError(f"Checksum inválido para {relative} no bundle {self.version}")
+    
+    def _load(self, component):
+        if component in self._loaded:
+            return self._loaded[component]
+        with self._lock:
+            if component in self._loaded:
+                return self._loaded[component]
+            if not self.has(component):
+                self._loaded[component] = None
+                return None
+            relative = COMPONENT_FILES[component]
+            if self.verify:
+                if component == 'flat_model':
+                    for name in self.manifest['files']:
+                        if name.startswith(relative + os.sep):
+                            self._verify_file(name)
+                else:
+                    self._verify_file(relative)
+            
+            start = time.perf_counter()
+            file_path = os.path.join(self.path, relative)
+            if component in ('model', 'preprocessor'):
+                value = joblib.load(file_path, mmap_mode=self.mmap_mode)
+            elif component in ('config', 'drift_reference'):
+                with open(file_path, 'r') as f:
+                    value = json.load(f)
+            elif component == 'cleaning_stats':
+                value = load_cleaning_stats(file_path)
+            elif component == 'explainer_background':
+                value = pd.read_csv(file_path)
+            else:
+                value = load_flat_ensemble(file_path, mmap_mode=self.mmap_mode)
+            self._loaded[component] = value
+            logger.info(f"Bundle {self.version}: {component} carregado em {time.perf_counter() - start:.3f}s")
+            return value
+    
+    @property
+    def model(self):
+        return self._load('model')
+    
+    @property
+    def preprocessor(self):
+        return self._load('preprocessor')
+    
+    @property
+    def cleaning_stats(self):
+        return self._load('cleaning_stats')
+    
+    @property
+    def explainer_background(self):
+        return self._load('explainer_background')
+    
+    @property
+    def drift_reference(self):
+        return self._load('drift_reference')
+    
+    @property
+    def flat_model(self):
+        return self._load('flat_model')
+    
+    def verify_all(self):
+        """
+        Confere o checksum de todos os arquivos do manifest
+        
+        Returns:
+            list: Arquivos com checksum divergente ou ausentes
+        """
+        invalid = []
+        for relative in self.manifest['files']:
+            try:
+                self._verify_file(relative)
+            except (ValueError, OSError):
+                invalid.append(relative)
+        return invalid
+
+def main():
+    parser = argparse.ArgumentParser(description='Bundles versionados de artefatos do modelo')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    build = subparsers.add_parser('build', help='cria um bundle a partir dos arquivos joblib atuais')
+    build.add_argument('--model', default='./models/trained_models/best_model.joblib')
+    build.add_argument('--preprocessor', default='./models/trained_models/preprocessor.joblib')
+    build.add_argument('--config', default='./models/trained_models/config.json')
+    build.add_argument('--cleaning-stats', help='JSON com as estatísticas de limpeza')
+    build.add_argument('--background', default='./models/trained_models/explainer_background.csv',
+                       help='CSV com a amostra de referência do explicador (ignorado se não existir)')
+    build.add_argument('--drift-reference', default='./models/trained_models/drift_reference.json',
+                       help='JSON com os histogramas de referência do monitoramento de drift (ignorado se não existir)')
+    build.add_argument('--output', default='./models/bundles', help='Diretório raiz dos bundles')
+    build.add_argument('--version', help='Nome da versão (padrão: data e hora)')
+    
+    verify = subparsers.add_parser('verify', help='confere os checksums de um bundle')
+    verify.add_argument('path', help='Diretório do bundle ou diretório raiz com LATEST')
+    
+    args = parser.parse_args()
+    if args.command == 'build':
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+        cleaning_stats = None
+        if args.cleaning_stats:
+            with open(args.cleaning_stats, 'r') as f:
+                cleaning_stats = json.load(f)
+        background = None
+        if args.background and os.path.exists(args.background):
+            background = pd.read_csv(args.background)
+        elif args.background:
+            logger.warning(f"Amostra de referência do explicador não encontrada em {args.background}")
+        drift_reference = None
+        if args.drift_reference and os.path.exists(args.drift_reference):
+            with open(args.drift_reference, 'r') as f:
+                drift_reference = json.load(f)
+        save_bundle(joblib.load(args.model), joblib.load(args.preprocessor), config, args.output,
+                    version=args.version, cleaning_stats=cleaning_stats, explainer_background=background,
+                    drift_reference=drift_reference)
+    else:
+        bundle = ArtifactBundle(args.path, verify=False)
+        invalid = bundle.verify_all()
+        if invalid:
+            logger.error(f"Bundle {bundle.version} com arquivos inválidos: {invalid}")
+            raise SystemExit(1)
+        logger.info(f"Bundle {bundle.version} íntegro ({len(bundle.manifest['files'])} arquivos)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import asyncio
+from urllib.parse import parse_qs
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+import api
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Configurações da variante ASGI
+ASGI_SCORING_WORKERS = int(os.environ.get('ASGI_SCORING_WORKERS', os.cpu_count() or 1))
+ASGI_MAX_CONCURRENCY = int(os.environ.get('ASGI_MAX_CONCURRENCY', 256))
+ASGI_QUEUE_TIMEOUT = float(os.environ.get('ASGI_QUEUE_TIMEOUT', 5))
+ASGI_MAX_BODY_BYTES = int(os.environ.get('ASGI_MAX_BODY_BYTES', 1024 * 1024))
+# Corpos acima deste tamanho são decodificados no executor para não bloquear o event loop
+ASGI_INLINE_JSON_BYTES = int(os.environ.get('ASGI_INLINE_JSON_BYTES', 64 * 1024))
+ASGI_RESPONSE_CHUNK_BYTES = int(os.environ.get('ASGI_RESPONSE_CHUNK_BYTES', 64 * 1024))
+
+# Executor limitado para o trabalho de CPU (pré-processamento e predict_proba)
+executor = ThreadPoolExecutor(max_workers=ASGI_SCORING_WORKERS, thread_name_prefix='scoring')
+_admission = {}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def _semaphore():
+    """
+    Retorna o semáforo de admissão do event loop atual
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _admission:
+        _admission[loop] = asyncio.Semaphore(ASGI_MAX_CONCURRENCY)
+    return _admission[loop]
+
+async def read_body(receive):
+    """
+    Lê o corpo da requisição de forma assíncrona, respeitando ASGI_MAX_BODY_BYTES
+    """
+    chunks = []
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise HTTPError(499, 'Cliente desconectado')
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > ASGI_MAX_BODY_BYTES:
+            raise HTTPError(413, f'Corpo da requisição excede {ASGI_MAX_BODY_BYTES} bytes')
+        chunks.append(chunk)
+        more_body = message.get('more_body', False)
+    return b''.join(chunks)
+
+async def parse_json(body):
+    """
+    Decodifica o JSON do corpo; corpos grandes são decodificados no executor
+    """
+    if not body:
+        return None
+    try:
+        if len(body) > ASGI_INLINE_JSON_BYTES:
+            return await asyncio.get_running_loop().run_in_executor(executor, json.loads, body)
+        return json.loads(body)
+    except ValueError as e:
+        raise HTTPError(400, f'JSON inválido: {str(e)}')
+
+async def run_scoring(fn, *args):
+    """
+    Executa uma função de pontuação no executor limitado
+    
+    O semáforo limita quantas requisições podem estar em execução ou aguardando
+    o executor; acima disso a requisição espera até ASGI_QUEUE_TIMEOUT e então
+    recebe 503, em vez de acumular trabalho sem limite.
+    """
+    semaphore = _semaphore()
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout=ASGI_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPError(503, 'Servidor sobrecarregado, tente novamente')
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+    finally:
+        semaphore.release()
+
+async def send_json(send, body, status, observe=False):
+    """
+    Envia a resposta JSON, em blocos quando ela for grande
+    """
+    start = time.perf_counter()
+    payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+    if observe:
+        api.STAGE_DURATION.observe(time.perf_counter() - start, 'serialize')
+    await send_bytes(send, payload, status, b'application/json')
+
+async def send_bytes(send, payload, status, content_type):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type),
+            (b'content-length', str(len(payload)).encode())
+        ]
+    })
+    for start in range(0, max(len(payload), 1), ASGI_RESPONSE_CHUNK_BYTES):
+        chunk = payload[start:start + ASGI_RESPONSE_CHUNK_BYTES]
+        more_body = start + ASGI_RESPONSE_CHUNK_BYTES < len(payload)
+        await send({'type': 'http.response.body', 'body': chunk, 'more_body': more_body})
+
+async def handle_health(scope, receive):
+    return api.health_payload()
+
+async def handle_models(scope, receive):
+    return api.models_payload()
+
+async def handle_drift(scope, receive):
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    return api.drift_payload(query.get('version', [None])[0], query.get('window', ['recent'])[0],
+                             query.get('bins', [''])[0] == '1')
+
+async def handle_predict(scope, receive):
+    body = await read_body(receive)
+    start = time.perf_counter()
+    data = await parse_json(body)
+    api.STAGE_DURATION.observe(time.perf_counter() - start, 'parse')
+    return await run_scoring(api.predict_payload, data)
+
+async def handle_explain(scope, receive):
+    data = await parse_json(await read_body(receive))
+    return await run_scoring(api.explain_payload, data)
+
+async def handle_explain_batch(scope, receive):
+    data = await parse_json(await read_body(receive))
+    return await run_scoring(api.explain_batch_payload, data)
+
+ROUTES = {
+    ('GET', '/health'): handle_health,
+    ('GET', '/models'): handle_models,
+    ('GET', '/drift'): handle_drift,
+    ('POST', '/predict'): handle_predict,
+    ('POST', '/explain'): handle_explain,
+    ('POST', '/explain/batch'): handle_explain_batch
+}
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            logger.info(f"API ASGI iniciada: {ASGI_SCORING_WORKERS} threads de pontuação, "
+                        f"concorrência máxima {ASGI_MAX_CONCURRENCY}")
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    """
+    Aplicação ASGI com os mesmos contratos de /health, /metrics, /models, /drift, /predict, /explain e /explain/batch da API Flask
+    """
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    
+    start = time.perf_counter()
+    path = scope['path']
+    if scope['method'] == 'GET' and path == '/metrics':
+        await send_bytes(send, api.metrics.render().encode('utf-8'), 200, api.METRICS_CONTENT_TYPE.encode())
+        api.record_request(path, 200, time.perf_counter() - start)
+        return
+    
+    handler = ROUTES.get((scope['method'], path))
+    if handler is None:
+        allowed = any(route_path == path for _, route_path in ROUTES)
+        status = 405 if allowed else 404
+        await send_json(send, {'status': 'error', 'message': 'Rota ou método não suportado'}, status)
+        api.record_request(path if allowed else 'unmatched', status, time.perf_counter() - start)
+        return
+    
+    try:
+        body, status = await handler(scope, receive)
+    except HTTPError as e:
+        if e.status == 499:
+            return
+        body, status = {'status': 'error', 'message': e.message}, e.status
+    except Exception as e:
+        logger.error(f"Erro ao processar a requisição: {str(e)}")
+        body, status = {'status': 'error', 'message': f'Ocorreu um erro ao processar a requisição: {str(e)}'}, 500
+    await send_json(send, body, status, observe=path == '/predict')
+    api.record_request(path, status, time.perf_counter() - start)
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit('Instale o uvicorn para executar a API ASGI: pip install uvicorn')
+    uvicorn.run(app, host=os.environ.get('HOST', '0.0.0.0'), port=int(os.environ.get('PORT', 8000)))
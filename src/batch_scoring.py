@@ -0,0 +1,386 @@
+import argparse
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.compose import ColumnTransformer
+from data_processing import (iter_data_from_csv, iter_data_from_database, get_engine, load_cleaning_stats,
+                             apply_cleaning_stats, DEFAULT_CHUNK_SIZE)
+from derived_features import FeatureEngine, DEFAULT_FEATURE_DEFINITIONS
+from artifact_bundle import ArtifactBundle
+from prediction_cache import artifact_version
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Artefatos carregados uma vez por processo (no pai antes do fork, ou no initializer de cada worker)
+_scorer = None
+
+class PortfolioScorer:
+    """
+    Pontua blocos de solicitantes com os mesmos artefatos e etapas da API
+    
+    Aplica, nesta ordem, as estatísticas de limpeza, as features derivadas, o
+    preprocessador e o modelo, e usa o threshold e as categorias da configuração.
+    
+    Args:
+        source (dict): {'bundle': caminho} ou {'model': ..., 'preprocessor': ...,
+            'config': ...}, com 'cleaning_stats' opcional
+        backend (str): 'native' ou 'flat' (ensemble achatado do bundle, se houver)
+    """
+    
+    def __init__(self, source, backend='native'):
+        self.source = dict(source)
+        self.backend = backend
+        cleaning_stats = None
+        if self.source.get('bundle'):
+            bundle = ArtifactBundle(self.source['bundle'], mmap_mode='r')
+            self.config = bundle.config
+            self.preprocessor = bundle.preprocessor
+            if backend == 'flat' and bundle.has('flat_model'):
+                self.model = bundle.flat_model
+            else:
+                self.model = bundle.model
+            cleaning_stats = bundle.cleaning_stats
+            self.model_version = bundle.version
+        else:
+            self.model = joblib.load(self.source['model'])
+            self.preprocessor = joblib.load(self.source['preprocessor'])
+            with open(self.source['config'], 'r') as f:
+                self.config = json.load(f)
+            paths = [self.source['model'], self.source['preprocessor'], self.source['config']]
+            self.model_version = artifact_version(paths, self.config.get('model_version'))
+        if cleaning_stats is None and self.source.get('cleaning_stats'):
+            cleaning_stats = load_cleaning_stats(self.source['cleaning_stats'])
+        self.cleaning_stats = cleaning_stats
+        
+        feature_names = self.config.get('feature_names', [])
+        if 'derived_features' in self.config:
+            self.feature_engine = FeatureEngine.from_config(self.config['derived_features'])
+        else:
+            self.feature_engine = FeatureEngine([definition for definition in DEFAULT_FEATURE_DEFINITIONS
+                                                 if definition.name in feature_names])
+        # Colunas numéricas do preprocessador: um valor inválido em um bloco CSV transforma a coluna inteira em texto
+        self.numeric_columns = []
+        if isinstance(self.preprocessor, ColumnTransformer):
+            for name, _, columns in self.preprocessor.transformers_:
+                if name == 'num':
+                    self.numeric_columns = list(columns)
+        self.threshold = self.config.get('threshold', 0.5)
+        self.risk_categories = np.asarray(self.config.get('risk_categories', ['Baixo Risco', 'Alto Risco']),
+                                          dtype=object)
+    
+    def score_frame(self, df):
+        """
+        Pontua um DataFrame de solicitantes
+        
+        Returns:
+            np.array: Probabilidades de alto risco
+        """
+        if self.cleaning_stats is not None:
+            df = apply_cleaning_stats(df, self.cleaning_stats)
+        if self.feature_engine.definitions:
+            df = self.feature_engine.transform_frame(df, copy=self.cleaning_stats is None)
+        return self.model.predict_proba(self.preprocessor.transform(df))[:, 1]
+    
+    def _score_positions(self, chunk, positions, probs, errors):
+        """
+        Pontua as linhas indicadas dividindo ao meio as partes que falham, até isolar as inválidas
+        """
+        try:
+            probs[positions] = self.score_frame(chunk.iloc[positions])
+        except Exception as e:
+            if len(positions) == 1:
+                errors[positions[0]] = str(e)
+                return
+            middle = len(positions) // 2
+            self._score_positions(chunk, positions[:middle], probs, errors)
+            self._score_positions(chunk, positions[middle:], probs, errors)
+    
+    def score_chunk(self, chunk, keep_columns=None):
+        """
+        Pontua um bloco, isolando as linhas inválidas sem descartar o bloco inteiro
+        
+        Args:
+            chunk (pd.DataFrame): Bloco lido da entrada
+            keep_columns (list): Colunas da entrada copiadas para a saída (ex.: identificadores)
+        
+        Returns:
+            pd.DataFrame: Colunas mantidas, probabilidade, categoria, versão e erro
+        """
+        chunk = chunk.reset_index(drop=True)
+        errors = np.full(len(chunk), None, dtype=object)
+        scored = chunk
+        for column in self.numeric_columns:
+            if column in chunk.columns and not pd.api.types.is_numeric_dtype(chunk[column]):
+                values = pd.to_numeric(chunk[column], errors='coerce')
+                for i in np.flatnonzero((values.isna() & chunk[column].notna()).to_numpy()):
+                    errors[i] = f"Valor não numérico em {column}: {chunk[column].iloc[i]!r}"
+                scored = scored.assign(**{column: values})
+        probs = np.full(len(chunk), np.nan)
+        valid = np.flatnonzero(pd.isna(errors))
+        if len(valid):
+            self._score_positions(scored, valid, probs, errors)
+        categories = self.risk_categories[(probs >= self.threshold).astype(int)]
+        categories[np.isnan(probs)] = None
+        result = chunk[keep_columns].copy() if keep_columns else pd.DataFrame(index=chunk.index)
+        result['risk_probability'] = probs
+        result['risk_category'] = categories
+        result['model_version'] = self.model_version
+        result['error'] = errors
+        return result
+
+def _init_worker(source, backend):
+    global _scorer
+    # Com fork, o worker herda o scorer já carregado pelo processo pai
+    if _scorer is None or _scorer.source != source or _scorer.backend != backend:
+        _scorer = PortfolioScorer(source, backend)
+
+def _score_chunk(index, chunk, keep_columns):
+    start = time.perf_counter()
+    result = _scorer.score_chunk(chunk, keep_columns)
+    return index, result, time.perf_counter() - start
+
+class CsvSink:
+    """
+    Saída em CSV, acrescentando um bloco por vez; a posição em bytes vai para o checkpoint
+    """
+    
+    def __init__(self, path):
+        self.path = path
+    
+    def position(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+    
+    def resume(self, position):
+        # Descarta o que foi escrito depois do último checkpoint
+        if os.path.exists(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(position)
+    
+    def reset(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+    
+    def write(self, frame):
+        header = self.position() == 0
+        with open(self.path, 'a', newline='') as f:
+            frame.to_csv(f, header=header, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+class SqlSink:
+    """
+    Saída em tabela SQL, com um INSERT em lote por bloco dentro de uma transação
+    
+    A tabela guarda o número do bloco (coluna scoring_chunk); ao retomar, os
+    blocos posteriores ao checkpoint são apagados antes de serem reescritos.
+    """
+    
+    def __init__(self, db_connection_string, table, insert_chunksize=1000):
+        self.engine = get_engine(db_connection_string)
+        self.table = table
+        self.insert_chunksize = insert_chunksize
+        self.chunk_index = 0
+    
+    def position(self):
+        return self.chunk_index
+    
+    def resume(self, position):
+        from sqlalchemy import inspect, text
+        self.chunk_index = position
+        if inspect(self.engine).has_table(self.table):
+            with self.engine.begin() as connection:
+                connection.execute(text(f'DELETE FROM {self.table} WHERE scoring_chunk >= :chunk'),
+                                   {'chunk': position})
+    
+    def reset(self):
+        from sqlalchemy import inspect, text
+        self.chunk_index = 0
+        if inspect(self.engine).has_table(self.table):
+            with self.engine.begin() as connection:
+                connection.execute(text(f'DELETE FROM {self.table}'))
+    
+    def write(self, frame):
+        frame = frame.assign(scoring_chunk=self.chunk_index)
+        with self.engine.begin() as connection:
+            frame.to_sql(self.table, connection, if_exists='append', index=False, method='multi',
+                         chunksize=self.insert_chunksize)
+        self.chunk_index += 1
+
+def _read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def _write_checkpoint(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+def score_portfolio(chunks, sink, source, workers=None, backend='native', keep_columns=None, checkpoint_path=None,
+                    job=None, max_pending=None):
+    """
+    Pontua um fluxo de blocos em um pool de processos e grava os resultados em ordem
+    
+    Os blocos são gravados na ordem de leitura, e o checkpoint (blocos e linhas
+    concluídos, posição da saída) é atualizado depois de cada gravação. Ao
+    retomar, os blocos já concluídos são lidos e descartados sem pontuar, e a
+    saída é cortada na posição do checkpoint.
+    
+    Args:
+        chunks (iterable): Blocos (pd.DataFrame) da entrada
+        sink (CsvSink ou SqlSink): Destino dos resultados
+        source (dict): Artefatos do modelo (ver PortfolioScorer)
+        workers (int): Processos de pontuação (padrão: os.cpu_count(); 1 pontua no próprio processo)
+        backend (str): 'native' ou 'flat'
+        keep_columns (list): Colunas da entrada copiadas para a saída
+        checkpoint_path (str): Arquivo de checkpoint (None desativa a retomada)
+        job (dict): Descrição da execução; um checkpoint de outra execução é ignorado
+        max_pending (int): Blocos em processamento ao mesmo tempo (padrão: 2 por worker)
+    
+    Returns:
+        dict: Relatório com linhas, erros, tempo e linhas por segundo
+    """
+    global _scorer
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    job = dict(job or {}, source=source, keep_columns=keep_columns)
+    
+    checkpoint = _read_checkpoint(checkpoint_path)
+    if checkpoint is not None and checkpoint.get('job') != job:
+        logger.warning("Checkpoint de outra execução encontrado; recomeçando do início")
+        checkpoint = None
+    if checkpoint is not None:
+        sink.resume(checkpoint['output_position'])
+        logger.info(f"Retomando do bloco {checkpoint['chunks_done']} ({checkpoint['rows_done']} linhas já pontuadas)")
+    else:
+        sink.reset()
+        checkpoint = {'job': job, 'chunks_done': 0, 'rows_done': 0, 'errors': 0, 'output_position': 0}
+    
+    # Carrega os artefatos no processo pai: com fork, os workers os herdam sem recarregar
+    _init_worker(source, backend)
+    skip = checkpoint['chunks_done']
+    report = {'model_version': _scorer.model_version, 'workers': workers, 'resumed_from_chunk': skip,
+              'rows': 0, 'errors': 0, 'chunks': 0, 'scoring_seconds': 0.0}
+    start = time.perf_counter()
+    
+    def commit(result, scoring_seconds):
+        sink.write(result)
+        checkpoint['chunks_done'] += 1
+        checkpoint['rows_done'] += len(result)
+        n_errors = int(result['error'].notna().sum())
+        checkpoint['errors'] += n_errors
+        checkpoint['output_position'] = sink.position()
+        if checkpoint_path:
+            _write_checkpoint(checkpoint_path, checkpoint)
+        report['rows'] += len(result)
+        report['errors'] += n_errors
+        report['chunks'] += 1
+        report['scoring_seconds'] += scoring_seconds
+        elapsed = time.perf_counter() - start
+        logger.info(f"Bloco {checkpoint['chunks_done']} gravado: {checkpoint['rows_done']} linhas no total, "
+                    f"{report['rows'] / elapsed:.0f} linhas/s")
+    
+    indexed = ((index, chunk) for index, chunk in enumerate(chunks) if index >= skip)
+    if workers == 1:
+        for index, chunk in indexed:
+            _, result, seconds = _score_chunk(index, chunk, keep_columns)
+            commit(result, seconds)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(source, backend)) as pool:
+            pending, ready, next_index = set(), {}, skip
+            exhausted = False
+            while True:
+                # Mantém no máximo max_pending blocos em memória entre leitura, pontuação e gravação
+                while not exhausted and len(pending) + len(ready) < max_pending:
+                    try:
+                        index, chunk = next(indexed)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(pool.submit(_score_chunk, index, chunk, keep_columns))
+                if not pending and not ready:
+                    break
+                if pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, result, seconds = future.result()
+                        ready[index] = (result, seconds)
+                while next_index in ready:
+                    commit(*ready.pop(next_index))
+                    next_index += 1
+    
+    report['seconds'] = time.perf_counter() - start
+    report['rows_per_second'] = report['rows'] / report['seconds'] if report['seconds'] > 0 else None
+    report['total_rows'] = checkpoint['rows_done']
+    report['total_errors'] = checkpoint['errors']
+    logger.info(f"Pontuação concluída: {report['rows']} linhas em {report['seconds']:.1f}s "
+                f"({report['rows_per_second'] or 0:.0f} linhas/s, {report['errors']} com erro)")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Pontuação em lote da carteira com os artefatos da API')
+    parser.add_argument('--input', help='CSV de entrada')
+    parser.add_argument('--db-connection', help='String de conexão do banco de entrada')
+    parser.add_argument('--query', help='Query SQL da entrada')
+    parser.add_argument('--output', help='CSV de saída')
+    parser.add_argument('--output-table', help='Tabela SQL de saída')
+    parser.add_argument('--output-db', help='String de conexão da saída (padrão: --db-connection)')
+    parser.add_argument('--bundle', default=os.environ.get('MODEL_BUNDLE_PATH'))
+    parser.add_argument('--model', default=os.environ.get('MODEL_PATH', './models/trained_models/best_model.joblib'))
+    parser.add_argument('--preprocessor', default=os.environ.get('PREPROCESSOR_PATH', './models/trained_models/preprocessor.joblib'))
+    parser.add_argument('--config', default=os.environ.get('CONFIG_PATH', './models/trained_models/config.json'))
+    parser.add_argument('--cleaning-stats', default=os.environ.get('CLEANING_STATS_PATH'))
+    parser.add_argument('--backend', choices=['native', 'flat'], default=os.environ.get('MODEL_BACKEND', 'native'))
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--keep-columns', nargs='*', default=[], help='Colunas da entrada copiadas para a saída (ex.: id)')
+    parser.add_argument('--checkpoint', help='Arquivo de checkpoint (padrão: <saída>.checkpoint.json)')
+    parser.add_argument('--restart', action='store_true', help='Ignora o checkpoint e recomeça do início')
+    parser.add_argument('--report', help='Arquivo JSON para o relatório')
+    args = parser.parse_args()
+    
+    if bool(args.input) == bool(args.query):
+        parser.error('Informe --input (CSV) ou --db-connection e --query')
+    if bool(args.output) == bool(args.output_table):
+        parser.error('Informe --output (CSV) ou --output-table')
+    
+    if args.bundle:
+        source = {'bundle': args.bundle}
+    else:
+        source = {'model': args.model, 'preprocessor': args.preprocessor, 'config': args.config}
+    if args.cleaning_stats:
+        source['cleaning_stats'] = args.cleaning_stats
+    
+    if args.input:
+        chunks = iter_data_from_csv(args.input, chunksize=args.chunksize)
+        job = {'input': os.path.abspath(args.input), 'chunksize': args.chunksize}
+    else:
+        chunks = iter_data_from_database(args.db_connection, args.query, chunksize=args.chunksize)
+        job = {'query': args.query, 'chunksize': args.chunksize}
+    
+    if args.output:
+        sink = CsvSink(args.output)
+        checkpoint_path = args.checkpoint or f"{args.output}.checkpoint.json"
+    else:
+        sink = SqlSink(args.output_db or args.db_connection, args.output_table)
+        checkpoint_path = args.checkpoint or f"{args.output_table}.checkpoint.json"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    
+    report = score_portfolio(chunks, sink, source, workers=args.workers, backend=args.backend,
+                             keep_columns=args.keep_columns, checkpoint_path=checkpoint_path, job=job)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+import os
+import time
+import queue
+import bisect
+import threading
+from concurrent.futures import Future
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Limites superiores dos buckets dos histogramas
+LATENCY_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+
+class BucketHistogram:
+    """
+    Histograma de buckets fixos com um único escritor (a thread do batcher)
+    """
+    
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+    
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+    
+    def quantile(self, q):
+        """
+        Estima um quantil pelo limite superior do bucket que o contém
+        """
+        if self.count == 0:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+        return float('inf')
+    
+    def to_dict(self):
+        # Lista (e não dict) para preservar a ordem dos buckets na serialização JSON
+        upper_bounds = self.buckets + ['+Inf']
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'buckets': [{'le': le, 'count': count} for le, count in zip(upper_bounds, self.counts)]
+        }
+
+class MicroBatcher:
+    """
+    Agrupa requisições individuais em lotes para uma única pontuação vetorizada
+    
+    As requisições entram em uma fila; uma thread dedicada coleta até
+    `max_batch_size` itens ou espera no máximo `max_wait_ms` a partir do primeiro
+    item do lote, pontua o lote com `score_fn` e devolve cada resultado ao
+    `Future` da requisição correspondente.
+    
+    Args:
+        score_fn (callable): Função que recebe uma lista de registros e retorna
+            um array com a probabilidade de cada um
+        max_batch_size (int): Tamanho máximo do lote
+        max_wait_ms (float): Tempo máximo de espera para completar um lote
+        max_queue_size (int): Tamanho máximo da fila (0 = ilimitada)
+    """
+    
+    def __init__(self, score_fn, max_batch_size=64, max_wait_ms=2.0, max_queue_size=10000):
+        self.score_fn = score_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        
+        self.queue_wait_ms = BucketHistogram(LATENCY_BUCKETS_MS)
+        self.latency_ms = BucketHistogram(LATENCY_BUCKETS_MS)
+        self.batch_size = BucketHistogram(BATCH_SIZE_BUCKETS)
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+    
+    def _ensure_started(self):
+        # A thread é criada sob demanda em cada processo, pois não sobrevive a um fork
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+    
+    def submit(self, record):
+        """
+        Enfileira um registro para pontuação
+        
+        Args:
+            record (dict): Dados de um solicitante
+        
+        Returns:
+            Future: Resolvido com a probabilidade de alto risco
+        """
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put_nowait((record, future, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise RuntimeError('Fila do micro-batcher cheia')
+        return future
+    
+    def _collect(self):
+        """
+        Coleta o próximo lote respeitando o tamanho máximo e a janela de espera
+        """
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            records = [record for record, _, _ in batch]
+            try:
+                probs = self.score_fn(records)
+                outcomes = [(prob, None) for prob in probs]
+            except Exception:
+                # Pontua individualmente para que um registro inválido não derrube o lote
+                outcomes = []
+                for record in records:
+                    try:
+                        outcomes.append((self.score_fn([record])[0], None))
+                    except Exception as e:
+                        outcomes.append((None, e))
+            
+            finished = time.perf_counter()
+            self.batch_size.observe(len(batch))
+            for (_, future, enqueued), (prob, error) in zip(batch, outcomes):
+                self.queue_wait_ms.observe((started - enqueued) * 1000)
+                self.latency_ms.observe((finished - enqueued) * 1000)
+                self.requests += 1
+                if error is not None:
+                    self.errors += 1
+                    future.set_exception(error)
+                else:
+                    future.set_result(prob)
+    
+    def stats(self):
+        """
+        Retorna as métricas do micro-batcher
+        
+        Returns:
+            dict: Configuração, contadores e histogramas de espera na fila,
+                latência total e tamanho de lote
+        """
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'queue_size': self._queue.qsize(),
+            'requests': self.requests,
+            'errors': self.errors,
+            'rejected': self.rejected,
+            'queue_wait_ms': self.queue_wait_ms.to_dict(),
+            'latency_ms': self.latency_ms.to_dict(),
+            'batch_size': self.batch_size.to_dict()
+        }
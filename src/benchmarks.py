@@ -0,0 +1,607 @@
+import argparse
+import os
+import sys
+import json
+import time
+import signal
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import joblib
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Solicitante usado nos testes de carga quando nenhum payload é informado
+EXAMPLE_APPLICANT = {'idade': 35, 'renda': 5000.0, 'divida_total': 12000.0, 'historico_credito': 'bom'}
+
+def time_calls(fn, repeat=50, warmup=3):
+    """
+    Mede o tempo de execução de uma função várias vezes
+    
+    Args:
+        fn (callable): Função sem argumentos a ser medida
+        repeat (int): Número de execuções medidas
+        warmup (int): Número de execuções descartadas antes da medição
+    
+    Returns:
+        np.array: Tempos de cada execução em segundos
+    """
+    for _ in range(warmup):
+        fn()
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - start
+    return timings
+
+def summarize_timings(timings, n_rows):
+    """
+    Resume tempos de execução em latência (ms) e vazão (linhas/s)
+    """
+    return {
+        'latency_p50_ms': float(np.percentile(timings, 50) * 1000),
+        'latency_p99_ms': float(np.percentile(timings, 99) * 1000),
+        'throughput_rows_s': float(n_rows / np.median(timings))
+    }
+
+def benchmark_tree_backends(model, X, batch_sizes=(1, 16, 256, 4096), repeat=50):
+    """
+    Compara latência e vazão do predict_proba nativo com o ensemble achatado
+    
+    Args:
+        model: Modelo de árvores treinado (DecisionTree, RandomForest ou XGBoost)
+        X (np.array): Matriz de features pré-processada
+        batch_sizes (tuple): Tamanhos de lote avaliados
+        repeat (int): Número de execuções por medição
+    
+    Returns:
+        pd.DataFrame: Uma linha por backend e tamanho de lote
+    """
+    from tree_compiler import compile_tree_model
+    
+    flat_model = compile_tree_model(model)
+    if not hasattr(X, 'tocsr'):
+        X = np.asarray(X)
+    results = []
+    for batch_size in batch_sizes:
+        batch = X[np.arange(batch_size) % X.shape[0]]
+        for backend, predictor in [('native', model), ('flat', flat_model)]:
+            timings = time_calls(lambda: predictor.predict_proba(batch), repeat=repeat)
+            results.append({'backend': backend, 'batch_size': batch_size, **summarize_timings(timings, batch_size)})
+    
+    results = pd.DataFrame(results)
+    logger.info(f"Benchmark de backends de árvores:\n{results.to_string(index=False)}")
+    return results
+
+def benchmark_explanations(model, preprocessor, X_raw, background=None, batch_sizes=(1, 16, 256),
+                           budget_ms=50.0, repeat=20):
+    """
+    Mede a latência das explicações com o explicador pré-computado
+    
+    Para comparação, mede também o custo de construir o explicador a cada
+    requisição (abordagem ingênua), com uma única linha.
+    
+    Args:
+        model: Modelo treinado
+        preprocessor (ColumnTransformer): Preprocessador treinado
+        X_raw (pd.DataFrame): Solicitantes (dados brutos) usados nas medições
+        background (pd.DataFrame): Amostra de referência do explicador (opcional)
+        batch_sizes (tuple): Tamanhos de lote avaliados
+        budget_ms (float): Orçamento de latência p99 de uma requisição de explicação
+        repeat (int): Número de execuções por medição
+    
+    Returns:
+        pd.DataFrame: Uma linha por estratégia e tamanho de lote, indicando se o
+            p99 ficou dentro do orçamento
+    """
+    from explainability import PredictionExplainer
+    
+    explainer = PredictionExplainer(model, preprocessor, background=background)
+    X = preprocessor.transform(X_raw)
+    results = []
+    for batch_size in batch_sizes:
+        batch = X[np.arange(batch_size) % X.shape[0]]
+        timings = time_calls(lambda: explainer.explain(batch), repeat=repeat)
+        results.append({'strategy': 'precomputed', 'method': explainer.method, 'batch_size': batch_size,
+                        **summarize_timings(timings, batch_size)})
+    
+    single = X[:1]
+    timings = time_calls(lambda: PredictionExplainer(model, preprocessor, background=background).explain(single),
+                         repeat=max(1, repeat // 4), warmup=1)
+    results.append({'strategy': 'per_request', 'method': explainer.method, 'batch_size': 1,
+                    **summarize_timings(timings, 1)})
+    
+    results = pd.DataFrame(results)
+    results['budget_ms'] = budget_ms
+    results['within_budget'] = results['latency_p99_ms'] <= budget_ms
+    logger.info(f"Benchmark de explicações:\n{results.to_string(index=False)}")
+    return results
+
+def make_synthetic_applicants(n_rows, seed=42):
+    """
+    Gera solicitantes sintéticos (com faltantes) para os benchmarks
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'idade': rng.integers(18, 80, n_rows).astype(np.float64),
+        'renda': rng.lognormal(8, 0.5, n_rows),
+        'divida_total': rng.lognormal(7, 1, n_rows),
+        # Coluna de texto (object), como lida de um CSV
+        'historico_credito': np.array(['bom', 'regular', 'ruim', 'muito_ruim', np.nan],
+                                      dtype=object)[rng.integers(0, 5, n_rows)]
+    })
+    df.loc[rng.random(n_rows) < 0.05, 'renda'] = np.nan
+    return df
+
+def benchmark_feature_engine(n_rows=20000000, legacy_rows=1000000, record_calls=100000, repeat=3):
+    """
+    Mede a vazão das features derivadas nos caminhos vetorizado e por registro
+    
+    Compara o FeatureEngine vetorizado com a implementação anterior em pandas
+    (apply linha a linha e pd.cut), medida em uma amostra menor por ser lenta,
+    e mede a latência do caminho por registro usado na API.
+    
+    Args:
+        n_rows (int): Linhas usadas no caminho vetorizado
+        legacy_rows (int): Linhas usadas na implementação anterior
+        record_calls (int): Número de registros no caminho por registro
+        repeat (int): Número de execuções por medição
+    
+    Returns:
+        pd.DataFrame: Uma linha por caminho, com vazão (linhas/s) e latências
+    """
+    from derived_features import FeatureEngine
+    
+    engine = FeatureEngine()
+    df = make_synthetic_applicants(n_rows)
+    results = []
+    
+    timings = time_calls(lambda: engine.transform_frame(df, copy=False), repeat=repeat, warmup=1)
+    results.append({'path': 'vectorized', 'rows': n_rows, **summarize_timings(timings, n_rows)})
+    
+    legacy_df = df.iloc[:legacy_rows].copy()
+    
+    def legacy():
+        df_new = legacy_df.copy()
+        df_new['razao_divida_renda'] = df_new['divida_total'] / (df_new['renda'] + 1e-10)
+        df_new['faixa_etaria'] = pd.cut(df_new['idade'], bins=[0, 25, 35, 45, 55, 65, 100],
+                                        labels=['18-25', '26-35', '36-45', '46-55', '56-65', '65+'])
+        df_new['historico_credito_ruim'] = df_new['historico_credito'].apply(
+            lambda x: 1 if x in ['ruim', 'muito_ruim'] else 0
+        )
+    
+    timings = time_calls(legacy, repeat=repeat, warmup=1)
+    results.append({'path': 'pandas_rowwise', 'rows': len(legacy_df), **summarize_timings(timings, len(legacy_df))})
+    
+    records = df.iloc[:record_calls].to_dict('records')
+    
+    def per_record():
+        for record in records:
+            engine.transform_record(record)
+    
+    timings = time_calls(per_record, repeat=repeat, warmup=1)
+    results.append({'path': 'record', 'rows': len(records), **summarize_timings(timings, len(records))})
+    
+    results = pd.DataFrame(results)
+    results['per_row_us'] = 1e6 / results['throughput_rows_s']
+    logger.info(f"Benchmark de features derivadas:\n{results.to_string(index=False)}")
+    return results
+
+def _matrix_nbytes(X):
+    """
+    Bytes ocupados por uma matriz densa ou esparsa (dados + índices)
+    """
+    if hasattr(X, 'indptr'):
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    return X.nbytes
+
+def benchmark_sparse_preprocessing(n_rows=50000, cardinalities=None, families=('logistic_regression', 'xgboost'),
+                                   max_dense_mb=2048, seed=42):
+    """
+    Compara o one-hot denso com o esparso (CSR) em memória e tempo de treino
+    
+    Acrescenta aos solicitantes sintéticos categóricas de alta cardinalidade
+    (região, empregador, produto) e mede, para cada modo do preprocessador, o
+    tamanho da matriz transformada, o tempo do fit_transform e o tempo de treino
+    de cada família. O caminho denso é pulado (com o tamanho estimado) quando a
+    matriz passaria de `max_dense_mb`.
+    
+    Args:
+        n_rows (int): Linhas sintéticas
+        cardinalities (dict): Coluna categórica -> número de categorias
+        families (tuple): Famílias treinadas (chaves de MODEL_FAMILIES)
+        max_dense_mb (float): Limite de memória da matriz densa
+        seed (int): Semente dos dados sintéticos
+    
+    Returns:
+        pd.DataFrame: Uma linha por modo e etapa (transform ou família)
+    """
+    from feature_engineering import identify_feature_types, create_preprocessing_pipeline
+    from training_orchestrator import MODEL_FAMILIES
+    
+    cardinalities = cardinalities or {'regiao': 50, 'empregador': 2000, 'codigo_produto': 200}
+    rng = np.random.default_rng(seed)
+    df = make_synthetic_applicants(n_rows, seed=seed)
+    for col, n_categories in cardinalities.items():
+        # Frequências com cauda longa (Zipf), como códigos reais
+        codes = np.minimum(rng.zipf(1.3, n_rows), n_categories) - 1
+        df[col] = np.array([f'{col}_{i}' for i in range(n_categories)], dtype=object)[codes]
+    logit = (df['historico_credito'].isin(['ruim', 'muito_ruim']).to_numpy() * 1.5
+             + (df['divida_total'] / df['renda'].fillna(df['renda'].median())).clip(upper=5).to_numpy() * 0.3
+             + (df['empregador'].str.len().to_numpy() % 3) * 0.4 - 1.5)
+    y = (rng.random(n_rows) < 1 / (1 + np.exp(-logit))).astype(int)
+    numeric_cols, categorical_cols = identify_feature_types(df)
+    
+    results = []
+    for mode in ['dense', 'sparse']:
+        preprocessor = create_preprocessing_pipeline(numeric_cols, categorical_cols, sparse_output=mode == 'sparse')
+        if mode == 'dense':
+            n_outputs = len(numeric_cols) + sum(df[col].nunique() for col in categorical_cols)
+            estimated_mb = n_rows * n_outputs * 8 / 1e6
+            if estimated_mb > max_dense_mb:
+                logger.warning(f"Caminho denso pulado: matriz estimada em {estimated_mb:.0f} MB")
+                results.append({'mode': mode, 'stage': 'transform', 'matrix_mb': estimated_mb, 'seconds': np.nan})
+                continue
+        start = time.perf_counter()
+        X = preprocessor.fit_transform(df)
+        results.append({'mode': mode, 'stage': 'transform', 'matrix_mb': _matrix_nbytes(X) / 1e6,
+                        'seconds': time.perf_counter() - start})
+        for family in families:
+            start = time.perf_counter()
+            MODEL_FAMILIES[family](X, y)
+            results.append({'mode': mode, 'stage': family, 'matrix_mb': np.nan,
+                            'seconds': time.perf_counter() - start})
+        del X
+    
+    results = pd.DataFrame(results)
+    logger.info(f"Benchmark do one-hot denso vs. esparso ({n_rows} linhas):\n{results.to_string(index=False)}")
+    return results
+
+def _read_process_memory():
+    """
+    Memória do processo atual em MB: RSS total, privada (anônima), mapeada de
+    arquivos e PSS (páginas compartilhadas divididas entre os processos)
+    """
+    fields = {'VmRSS': 'rss_mb', 'RssAnon': 'private_mb', 'RssFile': 'file_mb', 'Pss': 'pss_mb'}
+    memory = {}
+    for path in ['/proc/self/status', '/proc/self/smaps_rollup']:
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    key, _, value = line.partition(':')
+                    if key in fields and fields[key] not in memory:
+                        memory[fields[key]] = int(value.split()[0]) / 1024
+        except OSError:
+            pass
+    return memory
+
+def _startup_probe(mode, paths, record, barrier, queue):
+    """
+    Carrega os artefatos em um processo novo e mede tempo e memória (executado nos processos filhos)
+    """
+    # As bibliotecas são importadas nos dois modos antes da medição do carregamento
+    start = time.perf_counter()
+    import sklearn.compose, sklearn.ensemble, sklearn.linear_model, sklearn.pipeline, sklearn.tree
+    from artifact_bundle import ArtifactBundle
+    try:
+        import xgboost
+    except ImportError:
+        pass
+    import_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    if mode == 'joblib':
+        model = joblib.load(paths['model'])
+        preprocessor = joblib.load(paths['preprocessor'])
+        scorer = model
+    else:
+        bundle = ArtifactBundle(paths['bundle'], mmap_mode='r')
+        preprocessor = bundle.preprocessor
+        scorer = bundle.flat_model if bundle.has('flat_model') else bundle.model
+    load_seconds = time.perf_counter() - start
+    scorer.predict_proba(preprocessor.transform(pd.DataFrame([record])))
+    ready_seconds = time.perf_counter() - start
+    
+    # Mede com todos os processos vivos, para que as páginas compartilhadas apareçam no PSS
+    barrier.wait()
+    queue.put({'mode': mode, 'import_s': import_seconds, 'load_s': load_seconds, 'first_prediction_s': ready_seconds,
+               **_read_process_memory()})
+    barrier.wait()
+
+def benchmark_startup(model_path, preprocessor_path, bundle_path, n_workers=4, repeat=3, record=None):
+    """
+    Compara o cold start e a memória residente dos arquivos joblib e do bundle
+    
+    Para cada modo, `n_workers` processos novos (spawn) carregam os artefatos ao
+    mesmo tempo, como os workers da API, e pontuam um solicitante. A importação
+    das bibliotecas é medida à parte; os tempos de carregamento incluem a
+    desserialização e a primeira predição, com o page cache do sistema já
+    aquecido pela execução anterior.
+    
+    Args:
+        model_path (str): Caminho do best_model.joblib
+        preprocessor_path (str): Caminho do preprocessor.joblib
+        bundle_path (str): Diretório do bundle (ou raiz com LATEST)
+        n_workers (int): Processos simultâneos por medição
+        repeat (int): Número de medições por modo
+        record (dict): Solicitante pontuado (padrão: EXAMPLE_APPLICANT com as features derivadas)
+    
+    Returns:
+        pd.DataFrame: Uma linha por modo com tempos médios, memória por processo e PSS total
+    """
+    import multiprocessing
+    from derived_features import FeatureEngine
+    
+    record = FeatureEngine().transform_record(dict(record or EXAMPLE_APPLICANT))
+    paths = {'model': model_path, 'preprocessor': preprocessor_path, 'bundle': bundle_path}
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for mode in ['joblib', 'bundle']:
+        samples = []
+        for _ in range(repeat):
+            barrier = context.Barrier(n_workers)
+            queue = context.Queue()
+            processes = [context.Process(target=_startup_probe, args=(mode, paths, record, barrier, queue))
+                         for _ in range(n_workers)]
+            for process in processes:
+                process.start()
+            samples.append(pd.DataFrame([queue.get(timeout=300) for _ in processes]))
+            for process in processes:
+                process.join()
+        samples = pd.concat(samples, keys=range(repeat), names=['run'])
+        results.append({
+            'mode': mode,
+            'workers': n_workers,
+            'import_s': samples['import_s'].mean(),
+            'load_s': samples['load_s'].mean(),
+            'first_prediction_s': samples['first_prediction_s'].mean(),
+            'rss_mb_per_worker': samples['rss_mb'].mean(),
+            'private_mb_per_worker': samples['private_mb'].mean(),
+            'pss_mb_total': samples.get('pss_mb', pd.Series(np.nan)).groupby(level='run').sum().mean()
+        })
+    
+    results = pd.DataFrame(results)
+    logger.info(f"Benchmark de inicialização:\n{results.to_string(index=False)}")
+    return results
+
+def _post_json(url, body, timeout):
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            ok = response.status == 200
+    except Exception:
+        ok = False
+    return time.perf_counter() - start, ok
+
+def _client_process(url, body, n_requests, threads, timeout):
+    """
+    Processo cliente do teste de carga: dispara requisições com várias threads
+    """
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(lambda _: _post_json(url, body, timeout), range(n_requests)))
+    return [latency for latency, _ in results], sum(1 for _, ok in results if not ok)
+
+def load_test(url, payload, n_requests=2000, concurrency=32, client_processes=4, timeout=30):
+    """
+    Executa um teste de carga HTTP contra um endpoint de predição
+    
+    As requisições são distribuídas entre vários processos clientes para que o
+    próprio cliente (limitado pelo GIL) não seja o gargalo da medição.
+    
+    Args:
+        url (str): URL do endpoint (ex.: http://127.0.0.1:5000/predict)
+        payload (dict): Corpo JSON enviado em cada requisição
+        n_requests (int): Número total de requisições
+        concurrency (int): Número total de requisições simultâneas
+        client_processes (int): Número de processos clientes
+        timeout (float): Timeout de cada requisição em segundos
+    
+    Returns:
+        dict: Vazão (req/s), latências p50/p99 (ms) e número de erros
+    """
+    body = json.dumps(payload).encode()
+    client_processes = max(1, min(client_processes, concurrency))
+    threads = max(1, concurrency // client_processes)
+    per_process = n_requests // client_processes
+    
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=client_processes) as executor:
+        futures = [executor.submit(_client_process, url, body, per_process, threads, timeout)
+                   for _ in range(client_processes)]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+    
+    latencies = np.concatenate([np.asarray(latency) for latency, _ in results])
+    errors = sum(error for _, error in results)
+    return {
+        'requests': len(latencies),
+        'errors': int(errors),
+        'throughput_req_s': float(len(latencies) / elapsed),
+        'latency_p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'latency_p99_ms': float(np.percentile(latencies, 99) * 1000)
+    }
+
+def wait_for_health(base_url, timeout=60):
+    """
+    Aguarda o endpoint /health responder com sucesso
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'{base_url}/health', timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except Exception:
+            pass
+        time.sleep(0.5)
+    return False
+
+def benchmark_worker_scaling(worker_counts=(1, 2, 4, 8), payload=None, port=5099,
+                             n_requests=4000, concurrency=64, client_processes=4):
+    """
+    Mede a vazão do servidor pre-fork (src/serve.py) para diferentes números de workers
+    
+    Para cada número de workers, inicia o servidor em um subprocesso com os
+    artefatos definidos pelas variáveis de ambiente (MODEL_PATH, ...), executa
+    o teste de carga em /predict e encerra o servidor.
+    
+    Args:
+        worker_counts (tuple): Números de workers avaliados
+        payload (dict): Solicitante enviado nas requisições (padrão: EXAMPLE_APPLICANT)
+        port (int): Porta usada pelo servidor durante o benchmark
+        n_requests (int): Número de requisições por medição
+        concurrency (int): Requisições simultâneas
+        client_processes (int): Processos clientes do teste de carga
+    
+    Returns:
+        pd.DataFrame: Uma linha por número de workers
+    """
+    payload = payload or EXAMPLE_APPLICANT
+    serve_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'serve.py')
+    base_url = f'http://127.0.0.1:{port}'
+    results = []
+    for workers in worker_counts:
+        env = dict(os.environ, PORT=str(port), HOST='127.0.0.1')
+        server = subprocess.Popen([sys.executable, serve_script, str(workers)], env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_for_health(base_url):
+                raise RuntimeError(f'Servidor com {workers} workers não ficou saudável')
+            # Aquecimento para que todos os workers já tenham atendido requisições
+            load_test(f'{base_url}/predict', payload, n_requests=workers * 20,
+                      concurrency=concurrency, client_processes=client_processes)
+            result = load_test(f'{base_url}/predict', payload, n_requests=n_requests,
+                               concurrency=concurrency, client_processes=client_processes)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+        results.append({'workers': workers, **result})
+        logger.info(f"{workers} workers: {result['throughput_req_s']:.0f} req/s")
+    
+    results = pd.DataFrame(results)
+    results['speedup'] = results['throughput_req_s'] / results['throughput_req_s'].iloc[0]
+    logger.info(f"Escalabilidade do servidor pre-fork:\n{results.to_string(index=False)}")
+    return results
+
+def benchmark_concurrency_limits(targets, concurrency_levels=(1, 8, 32, 128, 512), payload=None,
+                                 requests_per_level=2000, client_processes=4):
+    """
+    Compara como diferentes servidores se comportam com o aumento da concorrência
+    
+    Usado para comparar a API Flask (src/api.py ou src/serve.py) com a variante
+    ASGI (src/asgi_api.py). Os servidores devem estar em execução.
+    
+    Args:
+        targets (dict): Nome do servidor -> URL do endpoint /predict
+        concurrency_levels (tuple): Níveis de requisições simultâneas avaliados
+        payload (dict): Solicitante enviado nas requisições (padrão: EXAMPLE_APPLICANT)
+        requests_per_level (int): Número de requisições por medição
+        client_processes (int): Processos clientes do teste de carga
+    
+    Returns:
+        pd.DataFrame: Uma linha por servidor e nível de concorrência
+    """
+    payload = payload or EXAMPLE_APPLICANT
+    results = []
+    for name, url in targets.items():
+        for concurrency in concurrency_levels:
+            result = load_test(url, payload, n_requests=requests_per_level, concurrency=concurrency,
+                               client_processes=client_processes)
+            results.append({'server': name, 'concurrency': concurrency, **result})
+            logger.info(f"{name} com concorrência {concurrency}: {result['throughput_req_s']:.0f} req/s, "
+                        f"{result['errors']} erros")
+    
+    results = pd.DataFrame(results)
+    logger.info(f"Comparação de limites de concorrência:\n{results.to_string(index=False)}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de inferência do modelo de risco de crédito')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    
+    trees = subparsers.add_parser('trees', help='predict_proba nativo vs. ensemble achatado')
+    trees.add_argument('--model', default='./models/trained_models/best_model.joblib')
+    trees.add_argument('--preprocessor', default='./models/trained_models/preprocessor.joblib')
+    trees.add_argument('--data', required=True, help='CSV com as features dos solicitantes')
+    trees.add_argument('--repeat', type=int, default=50)
+    
+    explain = subparsers.add_parser('explain', help='latência das explicações (/explain)')
+    explain.add_argument('--model', default='./models/trained_models/best_model.joblib')
+    explain.add_argument('--preprocessor', default='./models/trained_models/preprocessor.joblib')
+    explain.add_argument('--data', required=True, help='CSV com as features dos solicitantes')
+    explain.add_argument('--background', help='CSV com a amostra de referência do explicador')
+    explain.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 16, 256])
+    explain.add_argument('--budget-ms', type=float, default=50.0)
+    explain.add_argument('--repeat', type=int, default=20)
+    
+    features = subparsers.add_parser('features', help='features derivadas: vetorizado vs. por registro')
+    features.add_argument('--rows', type=int, default=20000000)
+    features.add_argument('--legacy-rows', type=int, default=1000000)
+    features.add_argument('--repeat', type=int, default=3)
+    
+    sparse = subparsers.add_parser('sparse', help='one-hot denso vs. esparso (CSR): memória e tempo de treino')
+    sparse.add_argument('--rows', type=int, default=50000)
+    sparse.add_argument('--families', nargs='+', default=['logistic_regression', 'xgboost'])
+    sparse.add_argument('--max-dense-mb', type=float, default=2048)
+    
+    startup = subparsers.add_parser('startup', help='cold start e memória: arquivos joblib vs. bundle')
+    startup.add_argument('--model', default='./models/trained_models/best_model.joblib')
+    startup.add_argument('--preprocessor', default='./models/trained_models/preprocessor.joblib')
+    startup.add_argument('--bundle', default='./models/bundles', help='Diretório do bundle (ou raiz com LATEST)')
+    startup.add_argument('--workers', type=int, default=4)
+    startup.add_argument('--repeat', type=int, default=3)
+    
+    scaling = subparsers.add_parser('scaling', help='vazão do servidor pre-fork por número de workers')
+    scaling.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    scaling.add_argument('--payload', help='arquivo JSON com o solicitante enviado nas requisições')
+    scaling.add_argument('--port', type=int, default=5099)
+    scaling.add_argument('--requests', type=int, default=4000)
+    scaling.add_argument('--concurrency', type=int, default=64)
+    scaling.add_argument('--client-processes', type=int, default=4)
+    
+    concurrency = subparsers.add_parser('concurrency', help='Flask vs. ASGI sob concorrência crescente')
+    concurrency.add_argument('--target', action='append', required=True,
+                             help='nome=url do /predict, ex.: flask=http://127.0.0.1:5000/predict')
+    concurrency.add_argument('--levels', type=int, nargs='+', default=[1, 8, 32, 128, 512])
+    concurrency.add_argument('--requests', type=int, default=2000)
+    concurrency.add_argument('--client-processes', type=int, default=4)
+    
+    args = parser.parse_args()
+    if args.benchmark == 'concurrency':
+        targets = dict(target.split('=', 1) for target in args.target)
+        benchmark_concurrency_limits(targets, args.levels, requests_per_level=args.requests,
+                                     client_processes=args.client_processes)
+    elif args.benchmark == 'scaling':
+        payload = None
+        if args.payload:
+            with open(args.payload, 'r') as f:
+                payload = json.load(f)
+        benchmark_worker_scaling(args.workers, payload=payload, port=args.port, n_requests=args.requests,
+                                 concurrency=args.concurrency, client_processes=args.client_processes)
+    elif args.benchmark == 'trees':
+        model = joblib.load(args.model)
+        preprocessor = joblib.load(args.preprocessor)
+        X = preprocessor.transform(pd.read_csv(args.data))
+        benchmark_tree_backends(model, X, repeat=args.repeat)
+    elif args.benchmark == 'startup':
+        benchmark_startup(args.model, args.preprocessor, args.bundle, n_workers=args.workers, repeat=args.repeat)
+    elif args.benchmark == 'sparse':
+        benchmark_sparse_preprocessing(args.rows, families=args.families, max_dense_mb=args.max_dense_mb)
+    elif args.benchmark == 'features':
+        benchmark_feature_engine(args.rows, legacy_rows=args.legacy_rows, repeat=args.repeat)
+    elif args.benchmark == 'explain':
+        model = joblib.load(args.model)
+        preprocessor = joblib.load(args.preprocessor)
+        background = pd.read_csv(args.background) if args.background else None
+        benchmark_explanations(model, preprocessor, pd.read_csv(args.data), background=background,
+                               batch_sizes=args.batch_sizes, budget_ms=args.budget_ms, repeat=args.repeat)
+
+if __name__ == '__main__':
+    main()
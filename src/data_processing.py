@@ -1,12 +1,39 @@
+import os
+import json
+from functools import lru_cache
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sqlalchemy import create_engine
+from streaming_stats import ColumnStatistics
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Número padrão de linhas por bloco na leitura em streaming
+DEFAULT_CHUNK_SIZE = int(os.environ.get('DATA_CHUNK_SIZE', 50000))
+
+# Schema de dtypes compactos (infer_schema): versão do formato e limite de categorias por coluna
+SCHEMA_VERSION = 1
+DEFAULT_MAX_CATEGORIES = 1000
+
+@lru_cache(maxsize=8)
+def get_engine(db_connection_string):
+    """
+    Retorna um engine SQLAlchemy com pool de conexões, reutilizado entre chamadas
+    
+    Args:
+        db_connection_string (str): String de conexão com o banco de dados
+    
+    Returns:
+        sqlalchemy.engine.Engine: Engine compartilhado para a string de conexão
+    """
+    # pool_pre_ping descarta conexões do pool que o servidor já encerrou
+    engine = create_engine(db_connection_string, pool_pre_ping=True)
+    logger.info("Engine do banco de dados criado")
+    return engine
+
 def load_data_from_database(db_connection_string, query):
     """
     Carrega dados de um banco de dados SQL
@@ -19,7 +46,7 @@ def load_data_from_database(db_connection_string, query):
         pd.DataFrame: Dados carregados do banco de dados
     """
     try:
-        engine = create_engine(db_connection_string)
+        engine = get_engine(db_connection_string)
         logger.info("Conectado ao banco de dados com sucesso")
         df = pd.read_sql(query, engine)
         logger.info(f"Dados carregados com sucesso. Shape: {df.shape}")
@@ -28,24 +55,465 @@ def load_data_from_database(db_connection_string, query):
         logger.error(f"Erro ao carregar dados do banco: {str(e)}")
         raise
 
-def load_data_from_csv(file_path):
+def load_data_from_csv(file_path, schema=None):
     """
     Carrega dados de um arquivo CSV
     
     Args:
         file_path (str): Caminho para o arquivo CSV
+        schema (dict): Schema de dtypes compactos (opcional); as colunas categóricas
+            são lidas direto como categóricas, sem passar por strings
         
     Returns:
         pd.DataFrame: Dados carregados do arquivo CSV
     """
     try:
-        df = pd.read_csv(file_path)
+        if schema is not None:
+            df = apply_schema(pd.read_csv(file_path, dtype=schema_read_dtypes(schema)), schema, copy=False)
+        else:
+            df = pd.read_csv(file_path)
         logger.info(f"Dados carregados com sucesso do arquivo {file_path}. Shape: {df.shape}")
         return df
     except Exception as e:
         logger.error(f"Erro ao carregar dados do arquivo CSV: {str(e)}")
         raise
 
+def iter_data_from_database(db_connection_string, query, chunksize=DEFAULT_CHUNK_SIZE, dtype=None, params=None):
+    """
+    Lê o resultado de uma query SQL em blocos, com memória limitada
+    
+    Usa um cursor do lado do servidor (stream_results) para que o driver não
+    traga o resultado inteiro para a memória, e o engine com pool de get_engine.
+    
+    Args:
+        db_connection_string (str): String de conexão com o banco de dados
+        query (str): Query SQL para extrair os dados
+        chunksize (int): Número de linhas por bloco
+        dtype (dict): Mapa coluna -> dtype aplicado a cada bloco
+        params (dict): Parâmetros da query (opcional)
+    
+    Yields:
+        pd.DataFrame: Blocos de até `chunksize` linhas
+    """
+    engine = get_engine(db_connection_string)
+    n_rows = 0
+    n_chunks = 0
+    try:
+        with engine.connect() as connection:
+            connection = connection.execution_options(stream_results=True, max_row_buffer=chunksize)
+            for chunk in pd.read_sql(query, connection, params=params, chunksize=chunksize, dtype=dtype):
+                n_rows += len(chunk)
+                n_chunks += 1
+                yield chunk
+    except Exception as e:
+        logger.error(f"Erro ao carregar dados do banco em blocos: {str(e)}")
+        raise
+    logger.info(f"Leitura em blocos do banco concluída: {n_rows} linhas em {n_chunks} blocos")
+
+def iter_data_from_csv(file_path, chunksize=DEFAULT_CHUNK_SIZE, dtype=None, usecols=None):
+    """
+    Lê um arquivo CSV em blocos, com memória limitada
+    
+    Args:
+        file_path (str): Caminho para o arquivo CSV
+        chunksize (int): Número de linhas por bloco
+        dtype (dict): Mapa coluna -> dtype aplicado na leitura (evita inferência por bloco);
+            para colunas categóricas use pd.CategoricalDtype com as categorias
+            explícitas, pois 'category' infere categorias diferentes em cada bloco
+        usecols (list): Colunas a serem lidas (opcional)
+    
+    Yields:
+        pd.DataFrame: Blocos de até `chunksize` linhas
+    """
+    n_rows = 0
+    n_chunks = 0
+    try:
+        with pd.read_csv(file_path, chunksize=chunksize, dtype=dtype, usecols=usecols) as reader:
+            for chunk in reader:
+                n_rows += len(chunk)
+                n_chunks += 1
+                yield chunk
+    except Exception as e:
+        logger.error(f"Erro ao carregar dados do arquivo CSV em blocos: {str(e)}")
+        raise
+    logger.info(f"Leitura em blocos de {file_path} concluída: {n_rows} linhas em {n_chunks} blocos")
+
+def _integer_dtype(min_value, max_value):
+    """
+    Menor dtype inteiro com sinal que comporta o intervalo
+    """
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= min_value and max_value <= info.max:
+            return np.dtype(dtype).name
+    return 'int64'
+
+def infer_schema(df, max_categories=DEFAULT_MAX_CATEGORIES, max_category_ratio=0.5, float_precision='lossless'):
+    """
+    Infere um schema compacto para as colunas de um DataFrame
+    
+    - Texto com poucos valores distintos vira categórico, com as categorias
+      explícitas (o mesmo schema vale para todos os blocos e para novos dados)
+    - Colunas numéricas sem faltantes e com valores inteiros viram o menor
+      inteiro que comporta o intervalo observado
+    - Floats viram float32 quando a conversão não altera nenhum valor
+      (float_precision='lossless') ou sempre (float_precision='float32')
+    
+    Args:
+        df (pd.DataFrame): Dados de referência (ex.: treino)
+        max_categories (int): Máximo de categorias de uma coluna categórica
+        max_category_ratio (float): Máximo de valores distintos por linha não nula
+        float_precision (str): 'lossless', 'float32' ou 'float64' (não reduz floats)
+    
+    Returns:
+        dict: Schema serializável em JSON ({'columns': {coluna: {...}}})
+    """
+    if float_precision not in ('lossless', 'float32', 'float64'):
+        raise ValueError("float_precision deve ser 'lossless', 'float32' ou 'float64'")
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            columns[col] = {'dtype': 'bool'}
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            columns[col] = {'dtype': 'category', 'categories': series.cat.categories.tolist()}
+        elif pd.api.types.is_numeric_dtype(series):
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            finite = values[np.isfinite(values)]
+            integral = (len(finite) == len(values) and len(values) > 0 and
+                        np.array_equal(finite, np.round(finite)))
+            if integral:
+                columns[col] = {'dtype': _integer_dtype(finite.min(), finite.max())}
+            elif float_precision == 'float32' or (
+                    float_precision == 'lossless' and
+                    np.array_equal(values.astype(np.float32).astype(np.float64), values, equal_nan=True)):
+                columns[col] = {'dtype': 'float32'}
+            else:
+                columns[col] = {'dtype': 'float64'}
+        else:
+            non_null = series.dropna()
+            distinct = non_null.unique()
+            if len(distinct) <= max_categories and len(distinct) <= max(1, max_category_ratio * len(non_null)):
+                columns[col] = {'dtype': 'category', 'categories': sorted(str(value) for value in distinct)}
+            else:
+                columns[col] = {'dtype': 'str'}
+    return {'version': SCHEMA_VERSION, 'columns': columns}
+
+def schema_read_dtypes(schema, columns=None):
+    """
+    Mapa coluna -> dtype para pd.read_csv / iter_data_from_csv
+    
+    Apenas os dtypes que a leitura aplica com segurança entram no mapa
+    (categóricos com categorias explícitas e floats); os inteiros, que falham
+    na leitura se surgir um faltante, são convertidos depois por apply_schema.
+    """
+    dtypes = {}
+    for col, spec in schema['columns'].items():
+        if columns is not None and col not in columns:
+            continue
+        if spec['dtype'] == 'category':
+            dtypes[col] = pd.CategoricalDtype(spec['categories'])
+        elif spec['dtype'] in ('float32', 'float64'):
+            dtypes[col] = spec['dtype']
+    return dtypes
+
+def apply_schema(df, schema, copy=True):
+    """
+    Converte um DataFrame (ou bloco) para os dtypes do schema
+    
+    Valores fora do schema não são perdidos em silêncio: inteiros fora do
+    intervalo ou com faltantes usam um dtype mais largo, e valores de texto
+    fora das categorias ficam como faltantes, com um aviso.
+    
+    Args:
+        df (pd.DataFrame): Dados a converter
+        schema (dict): Resultado de infer_schema
+        copy (bool): Se False, converte as colunas no próprio DataFrame
+    
+    Returns:
+        pd.DataFrame: Dados com os dtypes compactos
+    """
+    if copy:
+        df = df.copy()
+    for col, spec in schema['columns'].items():
+        if col not in df.columns:
+            continue
+        series = df[col]
+        dtype = spec['dtype']
+        if dtype == 'category':
+            target = pd.CategoricalDtype(spec['categories'])
+            if series.dtype == target:
+                continue
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype('object').where(series.isna(), series.astype(str))
+            converted = series.astype(target)
+            unknown = int(converted.isna().sum() - series.isna().sum())
+            if unknown:
+                logger.warning(f"Coluna {col}: {unknown} valores fora das categorias do schema tratados como faltantes")
+            df[col] = converted
+        elif dtype.startswith('int'):
+            if series.dtype == dtype:
+                continue
+            values = pd.to_numeric(series)
+            finite = values.dropna()
+            info = np.iinfo(dtype)
+            if len(finite) < len(values) or not np.array_equal(finite, np.round(finite)):
+                df[col] = values.astype('float64')
+                logger.warning(f"Coluna {col}: faltantes ou valores não inteiros, mantida como float64")
+            elif len(finite) and (finite.min() < info.min or finite.max() > info.max):
+                wider = _integer_dtype(finite.min(), finite.max())
+                df[col] = values.astype(wider)
+                logger.warning(f"Coluna {col}: valores fora do intervalo de {dtype}, convertida para {wider}")
+            else:
+                df[col] = values.astype(dtype)
+        elif dtype in ('float32', 'float64', 'bool') and series.dtype != dtype:
+            df[col] = series.astype(dtype)
+    return df
+
+def save_schema(schema, path):
+    """
+    Salva o schema em JSON
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(schema, f, indent=2)
+    logger.info(f"Schema salvo em {path}")
+    return path
+
+def load_schema(path):
+    """
+    Carrega um schema salvo por save_schema
+    """
+    with open(path, 'r') as f:
+        schema = json.load(f)
+    logger.info(f"Schema carregado de {path}")
+    return schema
+
+def memory_report(before, after):
+    """
+    Compara o uso de memória de um DataFrame antes e depois da compactação
+    
+    Args:
+        before (pd.DataFrame): Dados originais
+        after (pd.DataFrame): Dados compactos
+    
+    Returns:
+        dict: Bytes por coluna e totais (memory_usage com deep=True), com a redução
+    """
+    usage_before = before.memory_usage(deep=True, index=False)
+    usage_after = after.memory_usage(deep=True, index=False)
+    columns = {}
+    for col in before.columns:
+        columns[col] = {
+            'dtype_before': str(before[col].dtype),
+            'dtype_after': str(after[col].dtype) if col in after.columns else None,
+            'bytes_before': int(usage_before[col]),
+            'bytes_after': int(usage_after[col]) if col in after.columns else 0
+        }
+    total_before = int(usage_before.sum())
+    total_after = int(usage_after.sum())
+    return {
+        'columns': columns,
+        'bytes_before': total_before,
+        'bytes_after': total_after,
+        'reduction': 1 - total_after / total_before if total_before else 0.0
+    }
+
+def optimize_dtypes(df, schema=None, **schema_options):
+    """
+    Compacta os dtypes de um DataFrame, inferindo o schema se necessário
+    
+    Args:
+        df (pd.DataFrame): Dados com os dtypes padrão do pandas
+        schema (dict): Schema já salvo (opcional; se None é inferido de `df`)
+        **schema_options: Parâmetros de infer_schema
+    
+    Returns:
+        tuple: DataFrame compacto, schema usado e relatório de memória
+    """
+    schema = schema or infer_schema(df, **schema_options)
+    compact = apply_schema(df, schema)
+    report = memory_report(df, compact)
+    logger.info(f"Memória dos dados: {report['bytes_before'] / 1e6:.1f} MB -> {report['bytes_after'] / 1e6:.1f} MB "
+                f"({report['reduction']:.0%} de redução)")
+    return compact, schema, report
+
+def fit_cleaning_stats(data, missing_strategy='median', outlier_method='iqr', outlier_columns=None,
+                       sketch_size=4096):
+    """
+    Calcula, em uma única passada, as estatísticas usadas na limpeza dos dados
+    
+    Os blocos são percorridos uma única vez; medianas e quartis vêm de sketches
+    mescláveis (exatos enquanto a coluna tiver até `sketch_size` valores), e
+    médias/desvios de momentos acumulados. Os valores mais frequentes só são
+    contados com a estratégia 'mode': exatos para um DataFrame em memória e
+    aproximados (Misra-Gries) em blocos. O resultado é serializável em JSON e
+    pode ser reaplicado bloco a bloco e na API (CLEANING_STATS_PATH).
+    
+    Args:
+        data (pd.DataFrame ou iterável de pd.DataFrame): Dados ou blocos de dados
+        missing_strategy (str): Estratégia para valores faltantes (median, mean, mode, drop ou None)
+        outlier_method (str): Método para outliers (iqr, zscore ou None)
+        outlier_columns (list): Colunas tratadas para outliers (se None, todas as numéricas)
+        sketch_size (int): Capacidade dos sketches de quantis
+    
+    Returns:
+        dict: Política de limpeza e estatísticas por coluna
+    """
+    frame = data if isinstance(data, pd.DataFrame) else None
+    if frame is not None:
+        data = [frame]
+    
+    # Em memória a moda é exata (pd.Series.mode); em blocos, vem do resumo de valores frequentes
+    statistics = ColumnStatistics(sketch_size=sketch_size,
+                                  track_frequent=missing_strategy == 'mode' and frame is None)
+    for chunk in data:
+        statistics.update(chunk)
+    stats = statistics.summary()
+    if missing_strategy == 'mode' and frame is not None:
+        for col, col_stats in stats['columns'].items():
+            modes = frame[col].mode(dropna=True)
+            mode = modes.iloc[0] if len(modes) else None
+            col_stats['mode'] = mode.item() if isinstance(mode, np.generic) else mode
+    
+    numeric_cols = [col for col, col_stats in stats['columns'].items() if col_stats['numeric']]
+    stats['policy'] = {
+        'missing_strategy': missing_strategy,
+        'outlier_method': outlier_method,
+        'outlier_columns': list(outlier_columns) if outlier_columns is not None else numeric_cols
+    }
+    
+    # Pré-calcula os valores de imputação e os limites de outliers
+    fill_values = {}
+    bounds = {}
+    for col, col_stats in stats['columns'].items():
+        if missing_strategy == 'median' and col_stats['numeric']:
+            fill_values[col] = col_stats['median']
+        elif missing_strategy == 'mean' and col_stats['numeric']:
+            fill_values[col] = col_stats['mean']
+        elif missing_strategy == 'mode':
+            if col_stats['mode'] is None and col_stats['missing']:
+                raise ValueError(f"Moda indisponível para a coluna {col} ({col_stats['missing']} valores faltantes); "
+                                 f"use outra estratégia ou, com dados em blocos, carregue-os em memória")
+            fill_values[col] = col_stats['mode']
+    for col in stats['policy']['outlier_columns']:
+        col_stats = stats['columns'][col]
+        if outlier_method == 'iqr':
+            iqr = col_stats['q3'] - col_stats['q1']
+            bounds[col] = {'lower': col_stats['q1'] - 1.5 * iqr, 'upper': col_stats['q3'] + 1.5 * iqr,
+                           'replacement': None}
+        elif outlier_method == 'zscore':
+            # Mesmo critério do scipy.stats.zscore (desvio populacional): |z| >= 3
+            std = col_stats['std_population']
+            bounds[col] = {'lower': col_stats['mean'] - 3 * std, 'upper': col_stats['mean'] + 3 * std,
+                           'replacement': col_stats['mean']}
+    stats['fill_values'] = {col: value for col, value in fill_values.items() if value is not None}
+    stats['outlier_bounds'] = bounds
+    
+    missing = {col: col_stats['missing'] for col, col_stats in stats['columns'].items() if col_stats['missing']}
+    logger.info(f"Estatísticas de limpeza calculadas: {stats['n_rows']} linhas, faltantes por coluna: {missing}")
+    return stats
+
+def apply_cleaning_stats(df, stats, copy=True):
+    """
+    Aplica estatísticas de limpeza já calculadas a um DataFrame ou bloco
+    
+    Args:
+        df (pd.DataFrame): Dados (ou bloco) a serem limpos
+        stats (dict): Resultado de fit_cleaning_stats
+        copy (bool): Se False, altera o próprio DataFrame em vez de uma cópia
+    
+    Returns:
+        pd.DataFrame: Dados com faltantes e outliers tratados
+    """
+    if copy:
+        df = df.copy()
+    policy = stats['policy']
+    
+    if policy['missing_strategy'] == 'drop':
+        df = df.dropna(subset=[col for col in stats['columns'] if col in df.columns])
+    else:
+        fill_values = {col: value for col, value in stats['fill_values'].items()
+                       if col in df.columns and df[col].hasnans}
+        if fill_values:
+            df.fillna(fill_values, inplace=True)
+    
+    for col, bounds in stats['outlier_bounds'].items():
+        if col not in df.columns:
+            continue
+        if bounds['replacement'] is None:
+            df[col] = df[col].clip(bounds['lower'], bounds['upper'])
+        else:
+            outliers = (df[col] <= bounds['lower']) | (df[col] >= bounds['upper'])
+            if outliers.any():
+                df[col] = df[col].mask(outliers, bounds['replacement'])
+    return df
+
+def clean_record(record, stats):
+    """
+    Aplica estatísticas de limpeza a um único registro (dict), sem pandas
+    
+    Usado na API para reproduzir a limpeza do treinamento. Com a estratégia
+    'drop' os faltantes são mantidos, pois um registro não pode ser descartado.
+    
+    Args:
+        record (dict): Dados de um solicitante
+        stats (dict): Resultado de fit_cleaning_stats
+    
+    Returns:
+        dict: Novo registro com faltantes e outliers tratados
+    """
+    cleaned = dict(record)
+    for col, value in stats['fill_values'].items():
+        if col in cleaned and (cleaned[col] is None or cleaned[col] != cleaned[col]):
+            cleaned[col] = value
+    for col, bounds in stats['outlier_bounds'].items():
+        value = cleaned.get(col)
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or value != value:
+            continue
+        if bounds['replacement'] is None:
+            cleaned[col] = min(max(value, bounds['lower']), bounds['upper'])
+        elif value <= bounds['lower'] or value >= bounds['upper']:
+            cleaned[col] = bounds['replacement']
+    return cleaned
+
+def iter_clean_chunks(chunks, stats):
+    """
+    Aplica estatísticas de limpeza bloco a bloco, sem copiar os blocos
+    
+    Args:
+        chunks (iterável de pd.DataFrame): Blocos, ex.: de iter_data_from_csv
+        stats (dict): Resultado de fit_cleaning_stats
+    
+    Yields:
+        pd.DataFrame: Blocos limpos
+    """
+    for chunk in chunks:
+        yield apply_cleaning_stats(chunk, stats, copy=False)
+
+def save_cleaning_stats(stats, path):
+    """
+    Salva as estatísticas de limpeza em JSON
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(stats, f, indent=2, default=str)
+    logger.info(f"Estatísticas de limpeza salvas em {path}")
+    return path
+
+def load_cleaning_stats(path):
+    """
+    Carrega estatísticas de limpeza salvas por save_cleaning_stats
+    """
+    with open(path, 'r') as f:
+        stats = json.load(f)
+    logger.info(f"Estatísticas de limpeza carregadas de {path}")
+    return stats
+
 def handle_missing_values(df, strategy='median'):
     """
     Trata valores faltantes no DataFrame
@@ -57,32 +525,27 @@ def handle_missing_values(df, strategy='median'):
     Returns:
         pd.DataFrame: DataFrame sem valores faltantes
     """
-    df_copy = df.copy()
-    
     # Verifica se há valores faltantes
-    missing_values = df_copy.isnull().sum()
+    missing_values = df.isnull().sum()
     if missing_values.sum() == 0:
         logger.info("Não há valores faltantes no DataFrame")
-        return df_copy
+        return df.copy()
     
     logger.info(f"Valores faltantes encontrados: \n{missing_values[missing_values > 0]}")
     
-    # Trata valores faltantes de acordo com a estratégia
-    for col in df_copy.columns:
-        if df_copy[col].isnull().sum() > 0:
-            if strategy == 'median' and df_copy[col].dtype in ['int64', 'float64']:
-                df_copy[col] = df_copy[col].fillna(df_copy[col].median())
-            elif strategy == 'mean' and df_copy[col].dtype in ['int64', 'float64']:
-                df_copy[col] = df_copy[col].fillna(df_copy[col].mean())
-            elif strategy == 'mode':
-                df_copy[col] = df_copy[col].fillna(df_copy[col].mode()[0])
-            elif strategy == 'drop':
-                df_copy = df_copy.dropna(subset=[col])
-            else:
+    # Com o DataFrame já em memória, o sketch comporta todos os valores e as medianas são exatas
+    stats = fit_cleaning_stats(df, missing_strategy=strategy, outlier_method=None,
+                               sketch_size=max(len(df), 4096))
+    if strategy not in ('median', 'mean', 'mode', 'drop'):
+        logger.warning(f"Estratégia {strategy} não aplicável")
+    elif strategy in ('median', 'mean'):
+        for col in missing_values[missing_values > 0].index:
+            if col not in stats['fill_values']:
                 logger.warning(f"Estratégia {strategy} não aplicável para a coluna {col}")
+    df_clean = apply_cleaning_stats(df, stats)
     
     logger.info(f"Valores faltantes tratados com a estratégia: {strategy}")
-    return df_copy
+    return df_clean
 
 def handle_outliers(df, method='iqr', columns=None):
     """
@@ -96,32 +559,12 @@ def handle_outliers(df, method='iqr', columns=None):
     Returns:
         pd.DataFrame: DataFrame sem outliers
     """
-    df_copy = df.copy()
-    
-    if columns is None:
-        columns = df_copy.select_dtypes(include=['int64', 'float64']).columns.tolist()
-    
-    for col in columns:
-        if method == 'iqr':
-            Q1 = df_copy[col].quantile(0.25)
-            Q3 = df_copy[col].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            
-            # Substitui outliers pelos limites
-            df_copy.loc[df_copy[col] < lower_bound, col] = lower_bound
-            df_copy.loc[df_copy[col] > upper_bound, col] = upper_bound
-            
-        elif method == 'zscore':
-            from scipy import stats
-            z_scores = stats.zscore(df_copy[col])
-            abs_z_scores = np.abs(z_scores)
-            filtered_entries = (abs_z_scores < 3)
-            df_copy.loc[~filtered_entries, col] = df_copy[col].mean()
+    stats = fit_cleaning_stats(df, missing_strategy=None, outlier_method=method, outlier_columns=columns,
+                               sketch_size=max(len(df), 4096))
+    df_clean = apply_cleaning_stats(df, stats)
     
     logger.info(f"Outliers tratados com o método: {method}")
-    return df_copy
+    return df_clean
 
 def split_data(df, target_column, test_size=0.2, validation_size=0.2, random_state=42):
     """
@@ -0,0 +1,281 @@
+import math
+import bisect
+import itertools
+import numpy as np
+import pandas as pd
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def _as_float(value):
+    """
+    Converte um valor de registro em float, como to_numpy(dtype=np.float64) no caminho vetorizado
+    
+    Strings numéricas (ex.: '30', '1e3') são convertidas; None e strings que não
+    representam um número viram NaN.
+    """
+    if value is None:
+        return math.nan
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return math.nan
+    return float(value)
+
+class RatioFeature:
+    """
+    Razão entre duas colunas: numerador / (denominador + epsilon)
+    
+    Args:
+        name (str): Nome da feature derivada
+        numerator (str): Coluna do numerador
+        denominator (str): Coluna do denominador
+        epsilon (float): Valor somado ao denominador para evitar divisão por zero
+    """
+    
+    kind = 'ratio'
+    
+    def __init__(self, name, numerator, denominator, epsilon=1e-10):
+        self.name = name
+        self.numerator = numerator
+        self.denominator = denominator
+        self.epsilon = epsilon
+        self.inputs = [numerator, denominator]
+    
+    def compute_frame(self, df):
+        numerator = df[self.numerator].to_numpy(dtype=np.float64, na_value=np.nan)
+        denominator = df[self.denominator].to_numpy(dtype=np.float64, na_value=np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return numerator / (denominator + self.epsilon)
+    
+    def compute_value(self, record):
+        numerator = _as_float(record[self.numerator])
+        denominator = _as_float(record[self.denominator]) + self.epsilon
+        if denominator == 0:
+            # Mesmo resultado da divisão do NumPy: ±inf, ou NaN para 0/0
+            return math.nan if numerator == 0 or numerator != numerator else math.copysign(math.inf, numerator)
+        return numerator / denominator
+    
+    def probe_values(self):
+        return {self.numerator: [0, 1500.5, '1500.5', None],
+                self.denominator: [0, -self.epsilon, 3000, '3000', None]}
+    
+    def to_dict(self):
+        return {'type': self.kind, 'name': self.name, 'numerator': self.numerator,
+                'denominator': self.denominator, 'epsilon': self.epsilon}
+
+class BinFeature:
+    """
+    Discretização em faixas fechadas à direita, equivalente a pd.cut(..., right=True)
+    
+    Valores fora das faixas ou faltantes resultam em NaN.
+    
+    Args:
+        name (str): Nome da feature derivada
+        source (str): Coluna discretizada
+        bins (list): Limites das faixas (crescentes)
+        labels (list): Rótulo de cada faixa (len(bins) - 1 rótulos)
+    """
+    
+    kind = 'bins'
+    
+    def __init__(self, name, source, bins, labels):
+        if len(labels) != len(bins) - 1:
+            raise ValueError('O número de rótulos deve ser len(bins) - 1')
+        self.name = name
+        self.source = source
+        self.bins = [float(edge) for edge in bins]
+        self.labels = list(labels)
+        self.inputs = [source]
+        self._edges = np.asarray(self.bins)
+    
+    def compute_frame(self, df):
+        values = df[self.source].to_numpy(dtype=np.float64, na_value=np.nan)
+        # searchsorted à esquerda reproduz os intervalos (a, b] do pd.cut; NaN vai para o fim
+        codes = np.searchsorted(self._edges, values, side='left') - 1
+        codes[(codes < 0) | (codes >= len(self.labels))] = -1
+        return pd.Categorical.from_codes(codes, categories=self.labels, ordered=True)
+    
+    def compute_value(self, record):
+        code = bisect.bisect_left(self.bins, _as_float(record[self.source])) - 1
+        if code < 0 or code >= len(self.labels):
+            return math.nan
+        return self.labels[code]
+    
+    def probe_values(self):
+        edges = self.bins
+        numeric_strings = [str(edges[1]), str(edges[1] + 0.5)]
+        return {self.source: edges + [edge + 0.5 for edge in edges] + numeric_strings + [edges[0] - 1, None]}
+    
+    def to_dict(self):
+        return {'type': self.kind, 'name': self.name, 'source': self.source,
+                'bins': self.bins, 'labels': self.labels}
+
+class MembershipFeature:
+    """
+    Indicador (0/1) de pertencimento do valor de uma coluna a um conjunto
+    
+    Args:
+        name (str): Nome da feature derivada
+        source (str): Coluna avaliada
+        values (list): Valores que resultam em 1
+    """
+    
+    kind = 'membership'
+    
+    def __init__(self, name, source, values):
+        self.name = name
+        self.source = source
+        self.values = list(values)
+        self.inputs = [source]
+        self._value_set = frozenset(self.values)
+    
+    def compute_frame(self, df):
+        column = df[self.source]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # Avalia apenas as categorias e indexa pelos códigos (-1 = faltante)
+            in_set = np.append(column.cat.categories.isin(self.values), False)
+            return in_set[column.cat.codes.to_numpy()].astype(np.int64)
+        return column.isin(self.values).to_numpy().astype(np.int64)
+    
+    def compute_value(self, record):
+        value = record[self.source]
+        try:
+            return 1 if value in self._value_set else 0
+        except TypeError:
+            return 0
+    
+    def probe_values(self):
+        return {self.source: self.values + ['outro', None]}
+    
+    def to_dict(self):
+        return {'type': self.kind, 'name': self.name, 'source': self.source, 'values': self.values}
+
+FEATURE_TYPES = {cls.kind: cls for cls in [RatioFeature, BinFeature, MembershipFeature]}
+
+# Features derivadas usadas no treinamento (create_new_features)
+DEFAULT_FEATURE_DEFINITIONS = [
+    RatioFeature('razao_divida_renda', 'divida_total', 'renda'),
+    BinFeature('faixa_etaria', 'idade', bins=[0, 25, 35, 45, 55, 65, 100],
+               labels=['18-25', '26-35', '36-45', '46-55', '56-65', '65+']),
+    MembershipFeature('historico_credito_ruim', 'historico_credito', ['ruim', 'muito_ruim'])
+]
+
+def feature_from_dict(spec):
+    """
+    Cria uma definição de feature a partir do seu dicionário (ex.: lido do config.json)
+    """
+    spec = dict(spec)
+    feature_type = spec.pop('type')
+    if feature_type not in FEATURE_TYPES:
+        raise ValueError(f"Tipo de feature derivada desconhecido: {feature_type}")
+    return FEATURE_TYPES[feature_type](**spec)
+
+class FeatureEngine:
+    """
+    Calcula features derivadas a partir de definições declarativas
+    
+    O mesmo conjunto de definições tem dois caminhos equivalentes: vetorizado
+    (NumPy) para DataFrames no treinamento e em lotes, e escalar para um único
+    registro (dict) na API, escrevendo os valores no próprio dict sem criar
+    DataFrames ou arrays.
+    
+    Args:
+        definitions (list): Definições de features (RatioFeature, BinFeature, MembershipFeature)
+    """
+    
+    def __init__(self, definitions=None):
+        self.definitions = list(DEFAULT_FEATURE_DEFINITIONS if definitions is None else definitions)
+    
+    @classmethod
+    def from_config(cls, specs):
+        return cls([feature_from_dict(spec) for spec in specs])
+    
+    def to_config(self):
+        return [definition.to_dict() for definition in self.definitions]
+    
+    @property
+    def names(self):
+        return [definition.name for definition in self.definitions]
+    
+    @property
+    def inputs(self):
+        """
+        Colunas de entrada necessárias, sem repetição e na ordem das definições
+        """
+        return list(dict.fromkeys(column for definition in self.definitions for column in definition.inputs))
+    
+    def transform_frame(self, df, copy=True):
+        """
+        Adiciona as features derivadas a um DataFrame
+        
+        Definições cujas colunas de entrada não existem no DataFrame são ignoradas.
+        
+        Args:
+            df (pd.DataFrame): Dados de entrada
+            copy (bool): Se False, adiciona as colunas no próprio DataFrame
+        
+        Returns:
+            pd.DataFrame: Dados com as features derivadas
+        """
+        if copy:
+            df = df.copy()
+        for definition in self.definitions:
+            if all(column in df.columns for column in definition.inputs):
+                df[definition.name] = definition.compute_frame(df)
+        return df
+    
+    def transform_record(self, record):
+        """
+        Escreve as features derivadas no próprio registro
+        
+        Args:
+            record (dict): Dados de um solicitante (alterado no lugar)
+        
+        Returns:
+            dict: O mesmo registro, com as features derivadas
+        """
+        for definition in self.definitions:
+            record[definition.name] = definition.compute_value(record)
+        return record
+    
+    def generate_probe_records(self, max_records=2000):
+        """
+        Gera registros de teste combinando valores-limite de cada coluna de entrada
+        """
+        probes = {}
+        for definition in self.definitions:
+            for column, values in definition.probe_values().items():
+                probes.setdefault(column, [])
+                probes[column].extend(value for value in values if value not in probes[column])
+        columns = list(probes)
+        combinations = itertools.product(*(probes[column] for column in columns))
+        return [dict(zip(columns, values)) for values in itertools.islice(combinations, max_records)]
+    
+    def check_parity(self, records=None):
+        """
+        Compara o caminho vetorizado com o caminho por registro
+        
+        Args:
+            records (list): Registros avaliados (padrão: generate_probe_records)
+        
+        Returns:
+            list: Divergências encontradas, como (feature, índice do registro)
+        """
+        records = records if records is not None else self.generate_probe_records()
+        frame = self.transform_frame(pd.DataFrame.from_records(records), copy=False)
+        mismatches = []
+        for i, record in enumerate(records):
+            derived = self.transform_record(dict(record))
+            for name in self.names:
+                expected = frame[name].iloc[i]
+                value = derived[name]
+                if pd.isna(expected) and pd.isna(value):
+                    continue
+                if pd.isna(expected) or pd.isna(value) or expected != value:
+                    mismatches.append((name, i))
+        if mismatches:
+            logger.warning(f"Divergências entre os caminhos vetorizado e por registro: {mismatches[:10]}")
+        return mismatches
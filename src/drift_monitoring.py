@@ -0,0 +1,554 @@
+import argparse
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+import numpy as np
+import pandas as pd
+import joblib
+from derived_features import FeatureEngine
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DRIFT_REFERENCE_VERSION = 1
+# Nome da distribuição das probabilidades do modelo no arquivo de referência e nos relatórios
+SCORE_FEATURE = 'risk_probability'
+
+# Limites usuais do PSI: < 0.1 estável, 0.1-0.25 mudança moderada, > 0.25 mudança significativa
+PSI_WARNING = 0.1
+PSI_ALERT = 0.25
+# Proporção mínima de um bin no PSI (evita log(0) em bins vazios)
+PSI_EPSILON = 1e-4
+# Abaixo deste número de observações o status é 'insuficiente'
+MIN_SAMPLES = 100
+
+STATUS_ORDER = ['insuficiente', 'estavel', 'moderado', 'significativo']
+
+def _numeric_values(series):
+    """
+    Valores numéricos como float64 (texto inválido e ausentes viram NaN)
+    """
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+def _is_numeric(series):
+    dtype = series.dtype
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+def _numeric_reference(values, n_bins):
+    values = np.asarray(values, dtype=np.float64)
+    present = values[~np.isnan(values)]
+    edges = []
+    if len(present):
+        # Limites internos nos quantis; valores repetidos (ex.: muitos zeros) reduzem o número de bins
+        edges = np.unique(np.quantile(present, np.linspace(0, 1, n_bins + 1)[1:-1])).tolist()
+    codes = np.searchsorted(edges, present, side='right')
+    counts = np.bincount(codes, minlength=len(edges) + 1).tolist()
+    return {'type': 'numeric', 'edges': edges, 'counts': counts + [int(len(values) - len(present))]}
+
+def _categorical_reference(series, max_categories):
+    missing = int(series.isna().sum())
+    frequencies = series.dropna().astype(str).value_counts()
+    top = frequencies.iloc[:max_categories]
+    other = int(frequencies.iloc[max_categories:].sum())
+    return {'type': 'categorical', 'categories': top.index.tolist(),
+            'counts': [int(count) for count in top.tolist()] + [other, missing]}
+
+def build_drift_reference(df, feature_names=None, risk_probabilities=None, n_bins=10, max_categories=50):
+    """
+    Constrói os histogramas de referência usados no monitoramento de drift
+    
+    Deve ser chamada no treinamento, com os dados antes do pré-processamento
+    (e com as features derivadas, se o modelo as usa). Cada feature numérica
+    é dividida em até `n_bins` bins pelos quantis; cada categórica guarda as
+    `max_categories` categorias mais frequentes e um bin 'outras'. Todas têm
+    um bin final para valores ausentes.
+    
+    Args:
+        df (pd.DataFrame): Dados de referência (tipicamente os de treino)
+        feature_names (list): Features monitoradas (padrão: todas as colunas)
+        risk_probabilities (np.array): Probabilidades do modelo nos mesmos dados (opcional)
+        n_bins (int): Número máximo de bins das features numéricas
+        max_categories (int): Categorias mantidas por feature categórica
+    
+    Returns:
+        dict: Referência serializável em JSON
+    """
+    feature_names = list(feature_names) if feature_names is not None else list(df.columns)
+    missing = [feature for feature in feature_names if feature not in df.columns]
+    if missing:
+        raise ValueError(f"Features ausentes nos dados de referência: {missing}")
+    
+    features = {}
+    for feature in feature_names:
+        series = df[feature]
+        if _is_numeric(series):
+            features[feature] = _numeric_reference(_numeric_values(series), n_bins)
+        else:
+            features[feature] = _categorical_reference(series, max_categories)
+    reference = {
+        'version': DRIFT_REFERENCE_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'n_rows': int(len(df)),
+        'features': features
+    }
+    if risk_probabilities is not None:
+        reference[SCORE_FEATURE] = _numeric_reference(risk_probabilities, n_bins)
+    logger.info(f"Referência de drift construída: {len(df)} linhas, {len(features)} features")
+    return reference
+
+def save_drift_reference(reference, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(reference, f, indent=2)
+    logger.info(f"Referência de drift salva em {path}")
+    return path
+
+def load_drift_reference(path):
+    """
+    Carrega a referência de drift (None se o arquivo não existir)
+    """
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        reference = json.load(f)
+    if reference.get('version') != DRIFT_REFERENCE_VERSION:
+        raise ValueError(f"Versão da referência de drift não suportada: {reference.get('version')}")
+    return reference
+
+def population_stability_index(expected, actual, epsilon=PSI_EPSILON):
+    """
+    PSI entre duas contagens nos mesmos bins: soma de (q - p) * ln(q / p)
+    
+    Returns:
+        float: PSI, ou None se alguma das contagens estiver vazia
+    """
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    if expected.sum() <= 0 or actual.sum() <= 0:
+        return None
+    p = np.maximum(expected / expected.sum(), epsilon)
+    q = np.maximum(actual / actual.sum(), epsilon)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+def binned_ks_statistic(expected, actual):
+    """
+    Estatística KS entre duas contagens nos mesmos bins ordenados
+    
+    Compara as distribuições acumuladas apenas nos limites dos bins, então é
+    um limite inferior do KS calculado sobre os valores originais.
+    
+    Returns:
+        float: Maior diferença entre as distribuições acumuladas, ou None se alguma estiver vazia
+    """
+    expected = np.asarray(expected, dtype=np.float64)
+    actual = np.asarray(actual, dtype=np.float64)
+    if expected.sum() <= 0 or actual.sum() <= 0:
+        return None
+    return float(np.max(np.abs(np.cumsum(expected) / expected.sum() - np.cumsum(actual) / actual.sum())))
+
+def drift_status(psi, n, min_samples=MIN_SAMPLES):
+    if psi is None or n < min_samples:
+        return 'insuficiente'
+    if psi >= PSI_ALERT:
+        return 'significativo'
+    if psi >= PSI_WARNING:
+        return 'moderado'
+    return 'estavel'
+
+class DriftMonitor:
+    """
+    Histogramas das features e das probabilidades do tráfego, comparados com a referência do treino
+    
+    O caminho da requisição apenas enfileira o registro e a probabilidade; uma
+    thread em segundo plano agrupa os itens, calcula as features derivadas e
+    distribui os valores nos bins da referência de forma vetorizada. As
+    contagens ocupam memória fixa: um vetor com o total desde o carregamento e
+    `window_buckets` fatias de tempo que formam a janela recente (a mais
+    antiga é reaproveitada quando o tempo avança). Com a fila cheia, os itens
+    são descartados e contados. A thread termina depois de `idle_timeout`
+    segundos sem tráfego e é recriada no próximo item.
+    
+    Args:
+        reference (dict): Referência de build_drift_reference
+        feature_engine (FeatureEngine): Calcula as features derivadas monitoradas (opcional)
+        window_seconds (float): Duração da janela recente
+        window_buckets (int): Fatias de tempo da janela recente
+        batch_size (int): Itens processados de uma vez
+        flush_interval (float): Tempo máximo (s) que um item espera na fila
+        max_queue_size (int): Tamanho da fila
+        idle_timeout (float): Tempo (s) sem itens após o qual a thread termina
+    """
+    
+    def __init__(self, reference, feature_engine=None, window_seconds=3600, window_buckets=12, batch_size=1000,
+                 flush_interval=1.0, max_queue_size=100000, idle_timeout=60):
+        self.reference = reference
+        self.feature_engine = feature_engine
+        self.features = list(reference['features'])
+        self.window_seconds = float(window_seconds)
+        self.window_buckets = max(1, int(window_buckets))
+        self.slot_seconds = self.window_seconds / self.window_buckets
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.idle_timeout = float(idle_timeout)
+        
+        # Cada distribuição ocupa uma faixa contígua do vetor de contagens
+        self._specs = dict(reference['features'])
+        if SCORE_FEATURE in reference:
+            self._specs[SCORE_FEATURE] = reference[SCORE_FEATURE]
+        self._offsets = {}
+        offset = 0
+        for name, spec in self._specs.items():
+            self._offsets[name] = (offset, offset + len(spec['counts']))
+            offset += len(spec['counts'])
+        self.n_bins = offset
+        self._totals = np.zeros(self.n_bins, dtype=np.int64)
+        self._window = np.zeros((self.window_buckets, self.n_bins), dtype=np.int64)
+        self._slot_ids = np.full(self.window_buckets, -1, dtype=np.int64)
+        
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._counts_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.observed = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+    
+    def observe(self, record, risk_probability):
+        """
+        Enfileira um solicitante pontuado (não bloqueia)
+        
+        Args:
+            record (dict): Dados do solicitante; só as features monitoradas são lidas, na thread do monitor
+            risk_probability (float): Probabilidade de alto risco
+        """
+        self._put(('record', time.time(), record, float(risk_probability)))
+    
+    def observe_frame(self, df, risk_probabilities):
+        """
+        Enfileira um lote já colunar como um único item da fila
+        
+        Args:
+            df (pd.DataFrame): Dados de entrada, uma linha por solicitante
+            risk_probabilities (np.array): Probabilidades (NaN nas linhas com erro, ignoradas)
+        """
+        self._put(('batch', time.time(), df, np.asarray(risk_probabilities, dtype=np.float64)))
+    
+    def _put(self, item):
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+        try:
+            self._queue.put_nowait(item)
+            self.observed += 1
+        except queue.Full:
+            self.dropped += 1
+            return
+        # Verificado depois do put: a thread só termina com a fila vazia
+        if self._thread is None:
+            self._start()
+    
+    def _reset_after_fork(self):
+        # A thread e a fila não sobrevivem a um fork
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._thread = None
+                self._pid = os.getpid()
+                atexit.register(self.close)
+    
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='drift-monitor', daemon=True)
+                self._thread.start()
+    
+    def _collect(self):
+        """
+        Coleta até batch_size itens, esperando no máximo flush_interval a partir do primeiro
+        """
+        try:
+            items = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(items) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                items.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+    
+    def _run(self):
+        idle_since = time.monotonic()
+        while True:
+            items = self._collect()
+            if not items:
+                if time.monotonic() - idle_since >= self.idle_timeout:
+                    with self._lock:
+                        if self._queue.empty():
+                            self._thread = None
+                            return
+                continue
+            idle_since = time.monotonic()
+            stop = any(item is None for item in items)
+            events = [item for item in items if isinstance(item, threading.Event)]
+            items = [item for item in items if item is not None and not isinstance(item, threading.Event)]
+            try:
+                if items:
+                    self._update(*self._to_frame(items))
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Erro ao atualizar o monitoramento de drift: {str(e)}")
+            for event in events:
+                event.set()
+            if stop:
+                with self._lock:
+                    self._thread = None
+                return
+    
+    def _to_frame(self, items):
+        """
+        Converte os itens da fila em um DataFrame com as features monitoradas, as probabilidades e o horário
+        """
+        frames, probabilities, timestamps = [], [], []
+        records, record_probabilities, record_timestamps = [], [], []
+        for kind, timestamp, features, probability in items:
+            if kind == 'batch':
+                scored = ~np.isnan(probability)
+                columns = [column for column in features.columns if column in self._specs or
+                           self.feature_engine is not None and column in self.feature_engine.inputs]
+                frames.append(features.loc[scored, columns].reset_index(drop=True))
+                probabilities.append(probability[scored])
+                timestamps.append(np.full(int(scored.sum()), timestamp))
+            else:
+                records.append(features)
+                record_probabilities.append(probability)
+                record_timestamps.append(timestamp)
+        if records:
+            frames.append(pd.DataFrame.from_records(records))
+            probabilities.append(np.asarray(record_probabilities))
+            timestamps.append(np.asarray(record_timestamps))
+        frame = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        if self.feature_engine is not None:
+            frame = self.feature_engine.transform_frame(frame)
+        return frame, np.concatenate(probabilities), np.concatenate(timestamps)
+    
+    def _bin(self, name, values):
+        """
+        Índice do bin de cada valor, relativo ao início da faixa da distribuição
+        """
+        spec = self._specs[name]
+        if spec['type'] == 'numeric':
+            values = values if isinstance(values, np.ndarray) else _numeric_values(values)
+            codes = np.searchsorted(spec['edges'], values, side='right')
+            codes[np.isnan(values)] = len(spec['edges']) + 1
+            return codes
+        n_categories = len(spec['categories'])
+        codes = pd.Categorical(values.astype(str), categories=spec['categories']).codes.astype(np.int64)
+        codes[codes < 0] = n_categories
+        codes[values.isna().to_numpy()] = n_categories + 1
+        return codes
+    
+    def _update(self, frame, probabilities, timestamps):
+        n = len(probabilities)
+        if n == 0:
+            return
+        indices = np.empty((n, len(self._specs)), dtype=np.int64)
+        for position, (name, (start, end)) in enumerate(self._offsets.items()):
+            if name == SCORE_FEATURE:
+                codes = self._bin(name, probabilities)
+            elif name in frame.columns:
+                codes = self._bin(name, frame[name])
+            else:
+                # Feature ausente do tráfego conta como valor ausente
+                codes = np.full(n, end - start - 1)
+            indices[:, position] = start + codes
+        slots = (timestamps // self.slot_seconds).astype(np.int64)
+        with self._counts_lock:
+            self._totals += np.bincount(indices.ravel(), minlength=self.n_bins)
+            for slot in np.unique(slots):
+                position = slot % self.window_buckets
+                if self._slot_ids[position] != slot:
+                    self._window[position] = 0
+                    self._slot_ids[position] = slot
+                self._window[position] += np.bincount(indices[slots == slot].ravel(), minlength=self.n_bins)
+            self.processed += n
+    
+    def flush(self, timeout=10):
+        """
+        Espera os itens já enfileirados serem processados
+        
+        Returns:
+            bool: True se a fila foi processada dentro do timeout
+        """
+        if self._pid != os.getpid() or self._thread is None:
+            return True
+        event = threading.Event()
+        try:
+            self._queue.put(event, timeout=timeout)
+        except queue.Full:
+            return False
+        if self._thread is None:
+            self._start()
+        return event.wait(timeout)
+    
+    def counts(self, window='recent'):
+        """
+        Contagens atuais de todos os bins
+        
+        Args:
+            window (str): 'recent' (últimos window_seconds) ou 'total' (desde o carregamento)
+        """
+        if window not in ('recent', 'total'):
+            raise ValueError(f"Janela inválida: {window} (use 'recent' ou 'total')")
+        with self._counts_lock:
+            if window == 'total':
+                return self._totals.copy()
+            current = int(time.time() // self.slot_seconds)
+            valid = self._slot_ids > current - self.window_buckets
+            return self._window[valid].sum(axis=0)
+    
+    def report(self, window='recent', include_bins=False):
+        """
+        PSI, KS e taxa de ausentes de cada feature e das probabilidades em relação à referência
+        
+        Args:
+            window (str): 'recent' (últimos window_seconds) ou 'total' (desde o carregamento)
+            include_bins (bool): Inclui as proporções por bin da referência e do tráfego
+        
+        Returns:
+            dict: Relatório com o status de cada distribuição e o status geral (o pior entre elas)
+        """
+        counts = self.counts(window)
+        distributions = {}
+        for name, (start, end) in self._offsets.items():
+            spec = self._specs[name]
+            expected = np.asarray(spec['counts'], dtype=np.float64)
+            actual = counts[start:end]
+            n = int(actual.sum())
+            psi = population_stability_index(expected, actual)
+            entry = {
+                'type': spec['type'],
+                'n': n,
+                'psi': psi,
+                'missing_rate': float(actual[-1] / n) if n else None,
+                'reference_missing_rate': float(expected[-1] / expected.sum()) if expected.sum() else None,
+                'status': drift_status(psi, n)
+            }
+            if spec['type'] == 'numeric':
+                entry['ks'] = binned_ks_statistic(expected[:-1], actual[:-1])
+            if include_bins:
+                # O último bin é sempre o de ausentes; nas categóricas o penúltimo reúne as outras categorias
+                if spec['type'] == 'numeric':
+                    entry['edges'] = spec['edges']
+                else:
+                    entry['categories'] = spec['categories']
+                entry['reference_proportions'] = (expected / expected.sum()).tolist() if expected.sum() else None
+                entry['observed_proportions'] = (actual / n).tolist() if n else None
+            distributions[name] = entry
+        
+        statuses = [entry['status'] for entry in distributions.values()]
+        return {
+            'window': window,
+            'window_seconds': self.window_seconds if window == 'recent' else None,
+            'status': max(statuses, key=STATUS_ORDER.index) if statuses else 'insuficiente',
+            'reference_rows': self.reference.get('n_rows'),
+            'reference_created_at': self.reference.get('created_at'),
+            'features': {name: entry for name, entry in distributions.items() if name != SCORE_FEATURE},
+            SCORE_FEATURE: distributions.get(SCORE_FEATURE)
+        }
+    
+    def close(self, timeout=10):
+        """
+        Processa os itens pendentes e encerra a thread
+        """
+        if self._pid != os.getpid() or self._thread is None:
+            return
+        thread = self._thread
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("Fila do monitoramento de drift cheia ao encerrar; itens pendentes descartados")
+            return
+        thread.join(timeout)
+    
+    def stats(self):
+        return {
+            'queue_size': self._queue.qsize(),
+            'observed': self.observed,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'errors': self.errors
+        }
+
+def main():
+    from data_processing import load_data_from_csv
+    
+    parser = argparse.ArgumentParser(description='Referência e relatório do monitoramento de drift')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    build = subparsers.add_parser('build', help='constrói a referência a partir dos dados de treino')
+    build.add_argument('--data', required=True, help='CSV com os dados de treino')
+    build.add_argument('--target', help='Coluna alvo (removida dos dados)')
+    build.add_argument('--model', default='./models/trained_models/best_model.joblib')
+    build.add_argument('--preprocessor', default='./models/trained_models/preprocessor.joblib')
+    build.add_argument('--config', default='./models/trained_models/config.json')
+    build.add_argument('--output', default='./models/trained_models/drift_reference.json')
+    build.add_argument('--bins', type=int, default=10)
+    build.add_argument('--max-categories', type=int, default=50)
+    build.add_argument('--no-scores', action='store_true', help='Não pontua os dados (sem a distribuição das probabilidades)')
+    
+    compare = subparsers.add_parser('compare', help='compara um CSV (ex.: dados recentes) com a referência')
+    compare.add_argument('--reference', default='./models/trained_models/drift_reference.json')
+    compare.add_argument('--data', required=True)
+    compare.add_argument('--config', default='./models/trained_models/config.json')
+    compare.add_argument('--bins', action='store_true', help='Inclui as proporções por bin')
+    args = parser.parse_args()
+    
+    config = {}
+    if os.path.exists(args.config):
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+    engine = FeatureEngine.from_config(config['derived_features']) if 'derived_features' in config else None
+    df = load_data_from_csv(args.data)
+    
+    if args.command == 'build':
+        if args.target and args.target in df.columns:
+            df = df.drop(columns=[args.target])
+        feature_names = config.get('feature_names') or list(df.columns)
+        if engine is not None:
+            df = engine.transform_frame(df)
+        probabilities = None
+        if not args.no_scores:
+            model = joblib.load(args.model)
+            preprocessor = joblib.load(args.preprocessor)
+            probabilities = model.predict_proba(preprocessor.transform(df[feature_names]))[:, 1]
+        reference = build_drift_reference(df, feature_names, probabilities, n_bins=args.bins,
+                                          max_categories=args.max_categories)
+        save_drift_reference(reference, args.output)
+        return
+    
+    reference = load_drift_reference(args.reference)
+    if reference is None:
+        raise SystemExit(f"Referência de drift não encontrada: {args.reference}")
+    if SCORE_FEATURE in df.columns:
+        scores = df[SCORE_FEATURE].to_numpy(dtype=np.float64)
+    else:
+        # Sem a coluna de probabilidades, só as features são comparadas
+        reference = {key: value for key, value in reference.items() if key != SCORE_FEATURE}
+        scores = np.zeros(len(df))
+    monitor = DriftMonitor(reference, feature_engine=engine)
+    monitor.observe_frame(df, scores)
+    monitor.close()
+    print(json.dumps(monitor.report('total', include_bins=args.bins), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+import os
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.ensemble import RandomForestClassifier
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# O SHAP é opcional: sem ele, apenas XGBoost (contribuições nativas) e
+# regressão logística (forma fechada) têm explicações
+try:
+    import shap
+except ImportError:
+    shap = None
+
+try:
+    import xgboost as xgb
+except ImportError:
+    xgb = None
+
+def map_output_columns(preprocessor):
+    """
+    Mapeia cada coluna de saída do preprocessador para a feature original
+    
+    As colunas geradas pelo OneHotEncoder são agrupadas na feature categórica
+    que as originou, para que as contribuições sejam reportadas por feature.
+    
+    Args:
+        preprocessor (ColumnTransformer): Preprocessador treinado
+    
+    Returns:
+        tuple: Lista de features originais e array com o índice da feature
+            original de cada coluna de saída
+    """
+    if not isinstance(preprocessor, ColumnTransformer):
+        raise ValueError('Apenas ColumnTransformer é suportado pelo explicador')
+    
+    features = []
+    groups = []
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == 'drop' or len(columns) == 0:
+            continue
+        columns = list(columns)
+        last_step = transformer.steps[-1][1] if isinstance(transformer, Pipeline) else transformer
+        for i, column in enumerate(columns):
+            if isinstance(last_step, OneHotEncoder):
+                n_outputs = len(last_step.categories_[i])
+                if last_step.drop_idx_ is not None and last_step.drop_idx_[i] is not None:
+                    n_outputs -= 1
+            else:
+                n_outputs = 1
+            groups.extend([len(features)] * n_outputs)
+            features.append(column)
+    
+    n_features_out = len(preprocessor.get_feature_names_out())
+    if len(groups) != n_features_out:
+        raise ValueError(f'Mapeamento de colunas inconsistente: {len(groups)} != {n_features_out}')
+    return features, np.asarray(groups)
+
+def save_explainer_background(X, path, n_samples=200, random_state=42):
+    """
+    Salva uma amostra de referência (dados brutos) usada pelo explicador
+    
+    Deve ser chamada no treinamento, com os dados de treino antes do
+    pré-processamento. A amostra é resumida uma única vez quando a API carrega
+    o modelo.
+    
+    Args:
+        X (pd.DataFrame): Features de treino (antes do pré-processamento)
+        path (str): Caminho do CSV de saída
+        n_samples (int): Tamanho máximo da amostra
+        random_state (int): Semente da amostragem
+    
+    Returns:
+        str: Caminho do arquivo salvo
+    """
+    sample = X.sample(n=min(n_samples, len(X)), random_state=random_state)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    sample.to_csv(path, index=False)
+    logger.info(f"Amostra de referência do explicador salva em {path} ({len(sample)} linhas)")
+    return path
+
+class PredictionExplainer:
+    """
+    Explicador de predições construído uma única vez no carregamento do modelo
+    
+    Estratégias por tipo de modelo:
+        - XGBoost: contribuições SHAP nativas (pred_contribs), em log-odds
+        - DecisionTree/RandomForest: TreeSHAP pelo caminho das árvores
+          (tree_path_dependent), em probabilidade; requer o pacote shap
+        - LogisticRegression: forma fechada coef * (x - referência), em log-odds
+    
+    A referência da regressão logística é a média da amostra de referência
+    pré-processada; sem amostra, usa-se o vetor nulo (média do StandardScaler).
+    
+    Args:
+        model: Modelo treinado
+        preprocessor (ColumnTransformer): Preprocessador treinado
+        background (pd.DataFrame): Amostra de referência com dados brutos (opcional)
+    """
+    
+    def __init__(self, model, preprocessor, background=None):
+        self.features, self.groups = map_output_columns(preprocessor)
+        # Matriz (colunas de saída x features originais) que soma as colunas one-hot
+        self.aggregation = np.zeros((len(self.groups), len(self.features)))
+        self.aggregation[np.arange(len(self.groups)), self.groups] = 1.0
+        
+        if xgb is not None and isinstance(model, xgb.XGBClassifier):
+            self.method = 'xgboost_native'
+            self.output_space = 'log_odds'
+            self._booster = model.get_booster()
+            best_iteration = getattr(model, 'best_iteration', None)
+            self._iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+        elif isinstance(model, (DecisionTreeClassifier, RandomForestClassifier)):
+            if shap is None:
+                raise ImportError('O pacote shap é necessário para explicar modelos de árvores do sklearn')
+            self.method = 'tree_shap'
+            self.output_space = 'probability'
+            self._tree_explainer = shap.TreeExplainer(model, feature_perturbation='tree_path_dependent')
+            self._tree_base_value = float(np.ravel(self._tree_explainer.expected_value)[-1])
+        elif isinstance(model, LogisticRegression):
+            self.method = 'linear'
+            self.output_space = 'log_odds'
+            self._coef = np.asarray(model.coef_, dtype=np.float64)[0]
+            if background is not None and len(background):
+                reference = _to_dense(preprocessor.transform(background)).mean(axis=0)
+            else:
+                logger.warning("Explicador linear sem amostra de referência: usando o vetor nulo")
+                reference = np.zeros(len(self._coef))
+            self._reference = reference
+            self._linear_base_value = float(model.intercept_[0] + self._coef @ reference)
+        else:
+            raise ValueError(f'Modelo {type(model).__name__} não suportado pelo explicador')
+        
+        logger.info(f"Explicador construído: método {self.method}, {len(self.features)} features")
+    
+    def contributions(self, X):
+        """
+        Calcula as contribuições por coluna de saída do preprocessador
+        
+        Args:
+            X (np.array): Matriz pré-processada (n_amostras x n_colunas), densa ou CSR
+        
+        Returns:
+            tuple: Matriz de contribuições (n_amostras x n_colunas) e array com o
+                valor base de cada amostra
+        """
+        if self.method == 'xgboost_native':
+            # A CSR vai direto para o DMatrix: entradas não armazenadas são faltantes, como no treino
+            data = X if sparse.issparse(X) else np.asarray(X, dtype=np.float64)
+            raw = self._booster.predict(xgb.DMatrix(data), pred_contribs=True,
+                                        iteration_range=self._iteration_range)
+            return raw[:, :-1], raw[:, -1]
+        X = _to_dense(X)
+        if self.method == 'tree_shap':
+            values = np.asarray(self._tree_explainer.shap_values(X, check_additivity=False))
+            # Classificadores binários retornam uma matriz por classe; usa a classe de alto risco
+            if values.ndim == 3:
+                values = values[..., 1]
+            return values, np.full(len(X), self._tree_base_value)
+        contributions = (X - self._reference) * self._coef
+        return contributions, np.full(len(X), self._linear_base_value)
+    
+    def explain_matrix(self, X):
+        """
+        Calcula as contribuições agregadas por feature original
+        
+        Args:
+            X (np.array): Matriz pré-processada (n_amostras x n_colunas)
+        
+        Returns:
+            tuple: Matriz de contribuições (n_amostras x n_features) e valores base
+        """
+        contributions, base_values = self.contributions(X)
+        return contributions @ self.aggregation, base_values
+    
+    def explain(self, X, records=None, top_k=3):
+        """
+        Gera explicações legíveis para cada linha de X
+        
+        Args:
+            X (np.array): Matriz pré-processada (n_amostras x n_colunas)
+            records (list): Dados brutos de cada linha, incluídos na resposta (opcional)
+            top_k (int): Número de fatores que mais aumentam o risco a destacar
+        
+        Returns:
+            list: Um dict por linha com o valor base, as contribuições ordenadas
+                por magnitude e os principais fatores de risco
+        """
+        contributions, base_values = self.explain_matrix(X)
+        explanations = []
+        for i in range(len(contributions)):
+            row = contributions[i]
+            order = np.argsort(-np.abs(row), kind='stable')
+            items = []
+            for j in order:
+                item = {'feature': self.features[j], 'contribution': float(row[j])}
+                if records is not None:
+                    value = records[i].get(self.features[j])
+                    item['value'] = None if isinstance(value, float) and value != value else value
+                items.append(item)
+            risk_factors = [item['feature'] for item in items if item['contribution'] > 0][:top_k]
+            explanations.append({
+                'method': self.method,
+                'output_space': self.output_space,
+                'base_value': float(base_values[i]),
+                'contributions': items,
+                'top_risk_factors': risk_factors
+            })
+        return explanations
+
+def _to_dense(X):
+    """
+    Converte a saída do preprocessador em array denso (nos modelos do sklearn, zeros não armazenados valem zero)
+    """
+    return X.toarray() if sparse.issparse(X) else np.asarray(X, dtype=np.float64)
+
+def load_explainer_background(path):
+    """
+    Carrega a amostra de referência do explicador, se existir
+    
+    Args:
+        path (str): Caminho do CSV salvo por save_explainer_background
+    
+    Returns:
+        pd.DataFrame: Amostra de referência, ou None se o arquivo não existir
+    """
+    if not path or not os.path.exists(path):
+        return None
+    return pd.read_csv(path)
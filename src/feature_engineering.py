@@ -1,39 +1,70 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+import joblib
+from joblib import Parallel, delayed
 from sklearn.preprocessing import StandardScaler, MinMaxScaler, OneHotEncoder, LabelEncoder
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
+from derived_features import FeatureEngine
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Diretório do cache de scores de features (vazio desativa o cache em disco)
+FEATURE_SCORE_CACHE_DIR = os.environ.get('FEATURE_SCORE_CACHE_DIR', './models/feature_scores')
+
+# Cache em memória dos scores já calculados neste processo
+_score_cache = {}
+
 def identify_feature_types(df):
     """
     Identifica os tipos de features no DataFrame
     
+    Aceita os dtypes compactos de optimize_dtypes (int8/int16/int32, float32 e
+    categóricos), além dos padrões do pandas; colunas booleanas são ignoradas.
+    
     Args:
         df (pd.DataFrame): DataFrame com os dados
     
     Returns:
         tuple: Listas de colunas numéricas e categóricas
     """
-    numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns.tolist()
-    categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+    numeric_cols, categorical_cols = [], []
+    for col in df.columns:
+        dtype = df[col].dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            continue
+        if pd.api.types.is_numeric_dtype(dtype):
+            numeric_cols.append(col)
+        elif (isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(dtype) or
+              pd.api.types.is_string_dtype(dtype)):
+            categorical_cols.append(col)
     
     logger.info(f"Features numéricas identificadas: {len(numeric_cols)}")
     logger.info(f"Features categóricas identificadas: {len(categorical_cols)}")
     
     return numeric_cols, categorical_cols
 
-def create_preprocessing_pipeline(numeric_cols, categorical_cols, numeric_strategy='median', scaler='standard'):
+def create_preprocessing_pipeline(numeric_cols, categorical_cols, numeric_strategy='median', scaler='standard',
+                                  sparse_output=False):
     """
     Cria um pipeline de pré-processamento para features numéricas e categóricas
     
+    Com `sparse_output`, o one-hot é esparso e a saída é sempre uma matriz CSR,
+    o que evita matrizes densas enormes com categóricas de alta cardinalidade.
+    Os modelos treinados nessa saída devem ser pontuados também com CSR: o
+    XGBoost trata as entradas não armazenadas como faltantes, não como zero.
+    
     Args:
         numeric_cols (list): Lista de colunas numéricas
         categorical_cols (list): Lista de colunas categóricas
         numeric_strategy (str): Estratégia para tratar valores faltantes em colunas numéricas
         scaler (str): Tipo de escalonamento (standard ou minmax)
+        sparse_output (bool): Gera matrizes CSR em vez de arrays densos
     
     Returns:
         ColumnTransformer: Pipeline de pré-processamento
@@ -55,7 +86,7 @@ def create_preprocessing_pipeline(numeric_cols, categorical_cols, numeric_strate
     # Pipeline para features categóricas
     categorical_transformer = Pipeline(steps=[
         ('imputer', SimpleImputer(strategy='most_frequent')),
-        ('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=False))
+        ('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=sparse_output))
     ])
     
     # Combinação dos pipelines
@@ -63,45 +94,154 @@ def create_preprocessing_pipeline(numeric_cols, categorical_cols, numeric_strate
         transformers=[
             ('num', numeric_transformer, numeric_cols),
             ('cat', categorical_transformer, categorical_cols)
-        ]
+        ],
+        sparse_threshold=1.0 if sparse_output else 0.0
     )
     
-    logger.info(f"Pipeline de pré-processamento criado com scaler: {scaler}")
+    logger.info(f"Pipeline de pré-processamento criado com scaler: {scaler}"
+                f"{' (saída esparsa CSR)' if sparse_output else ''}")
     return preprocessor
 
-def create_new_features(df):
+def create_new_features(df, engine=None):
     """
     Cria novas features a partir das existentes
     
+    As features são calculadas pelo FeatureEngine (src/derived_features.py), de
+    forma vetorizada; a API usa as mesmas definições para cada solicitante.
+    
     Args:
         df (pd.DataFrame): DataFrame original
+        engine (FeatureEngine): Definições das features (padrão: DEFAULT_FEATURE_DEFINITIONS)
     
     Returns:
         pd.DataFrame: DataFrame com novas features
     """
-    df_new = df.copy()
+    engine = engine or FeatureEngine()
+    df_new = engine.transform_frame(df)
     
-    # Exemplo: cálculo de razões financeiras
-    if 'renda' in df_new.columns and 'divida_total' in df_new.columns:
-        df_new['razao_divida_renda'] = df_new['divida_total'] / (df_new['renda'] + 1e-10)
+    logger.info(f"Novas features criadas. Shape atualizado: {df_new.shape}")
+    return df_new
+
+def dataset_fingerprint(X, y):
+    """
+    Calcula uma impressão digital do conteúdo de X e y
     
-    if 'idade' in df_new.columns:
-        # Discretização da idade em faixas
-        df_new['faixa_etaria'] = pd.cut(
-            df_new['idade'],
-            bins=[0, 25, 35, 45, 55, 65, 100],
-            labels=['18-25', '26-35', '36-45', '46-55', '56-65', '65+']
-        )
+    Args:
+        X (pd.DataFrame ou np.array): Features
+        y (pd.Series ou np.array): Target
     
-    if 'historico_credito' in df_new.columns:
-        df_new['historico_credito_ruim'] = df_new['historico_credito'].apply(
-            lambda x: 1 if x in ['ruim', 'muito_ruim'] else 0
-        )
+    Returns:
+        str: Hash SHA-256 (hex) de colunas, tipos e valores
+    """
+    digest = hashlib.sha256()
+    if isinstance(X, pd.DataFrame):
+        digest.update(repr([(str(col), str(dtype)) for col, dtype in X.dtypes.items()]).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    else:
+        X = np.ascontiguousarray(X)
+        digest.update(repr((X.shape, str(X.dtype))).encode('utf-8'))
+        digest.update(X.tobytes())
+    digest.update(np.ascontiguousarray(np.asarray(y)).tobytes())
+    return digest.hexdigest()
+
+def _score_columns(X, y, columns, method, random_state):
+    """
+    Calcula os scores de um grupo de colunas (executado nos workers)
+    """
+    from sklearn.feature_selection import mutual_info_classif, chi2, f_classif
     
-    logger.info(f"Novas features criadas. Shape atualizado: {df_new.shape}")
-    return df_new
+    X_shard = X[:, columns]
+    if method == 'mutual_info':
+        return mutual_info_classif(X_shard, y, random_state=random_state)
+    if method == 'chi2':
+        return chi2(X_shard, y)[0]
+    return f_classif(X_shard, y)[0]
 
-def select_important_features(X_train, y_train, X_val, X_test, method='mutual_info', k=10):
+def compute_feature_scores(X, y, method='mutual_info', n_jobs=-1, n_shards=None, sample_size=None,
+                           n_repeats=1, random_state=42, cache_dir=FEATURE_SCORE_CACHE_DIR):
+    """
+    Calcula o score de cada feature em paralelo, dividindo as colunas entre processos
+    
+    A matriz é compartilhada com os workers via memory-map (joblib) em vez de ser
+    copiada para cada um. Com `sample_size`, cada repetição usa uma subamostra
+    diferente das linhas, e a variação entre repetições indica a confiança dos
+    scores. Os resultados ficam em cache pela impressão digital dos dados e pelos
+    parâmetros, de modo que seleções com outro `k` não recalculam nada.
+    
+    Args:
+        X (pd.DataFrame ou np.array): Features de treino
+        y (pd.Series ou np.array): Target de treino
+        method (str): Método de pontuação (mutual_info, chi2, f_classif)
+        n_jobs (int): Número de processos (-1 = todos os núcleos)
+        n_shards (int): Número de grupos de colunas (padrão: um por processo)
+        sample_size (int): Linhas por subamostra (None = todas as linhas)
+        n_repeats (int): Número de subamostras avaliadas
+        random_state (int): Semente das subamostras e do mutual_info
+        cache_dir (str): Diretório do cache em disco (None desativa)
+    
+    Returns:
+        dict: 'features' (nomes), 'scores' (média por feature) e 'repeat_scores'
+            (matriz repetições x features)
+    """
+    if method not in ('mutual_info', 'chi2', 'f_classif'):
+        raise ValueError("Método deve ser 'mutual_info', 'chi2' ou 'f_classif'")
+    if sample_size is None or sample_size >= len(X):
+        sample_size, n_repeats = None, 1
+    
+    fingerprint = dataset_fingerprint(X, y)
+    key = hashlib.sha256(repr((fingerprint, method, sample_size, n_repeats, random_state)).encode()).hexdigest()[:32]
+    if key in _score_cache:
+        logger.info("Scores de features obtidos do cache em memória")
+        return _score_cache[key]
+    cache_path = os.path.join(cache_dir, f'{key}.joblib') if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        result = joblib.load(cache_path)
+        _score_cache[key] = result
+        logger.info(f"Scores de features obtidos do cache em disco: {cache_path}")
+        return result
+    
+    features = list(X.columns) if isinstance(X, pd.DataFrame) else list(range(X.shape[1]))
+    X_values = np.asarray(X, dtype=np.float64)
+    y_values = np.asarray(y)
+    
+    n_workers = joblib.cpu_count() if n_jobs in (None, -1) else max(1, n_jobs)
+    n_shards = n_shards or min(n_workers, len(features))
+    shards = [shard for shard in np.array_split(np.arange(len(features)), n_shards) if len(shard)]
+    
+    rng = np.random.default_rng(random_state)
+    repeat_scores = np.empty((n_repeats, len(features)))
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for repeat in range(n_repeats):
+            if sample_size is None:
+                X_sample, y_sample = X_values, y_values
+            else:
+                rows = np.sort(rng.choice(len(X_values), size=sample_size, replace=False))
+                X_sample, y_sample = X_values[rows], y_values[rows]
+            shard_scores = parallel(delayed(_score_columns)(X_sample, y_sample, shard, method, random_state)
+                                    for shard in shards)
+            for shard, scores in zip(shards, shard_scores):
+                repeat_scores[repeat, shard] = scores
+    
+    result = {'features': features, 'scores': repeat_scores.mean(axis=0), 'repeat_scores': repeat_scores}
+    _score_cache[key] = result
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        joblib.dump(result, cache_path)
+    logger.info(f"Scores de {len(features)} features calculados ({method}, {len(shards)} grupos de colunas, "
+                f"{n_repeats} repetições)")
+    return result
+
+def _top_k(scores, k):
+    """
+    Índices (em ordem crescente) das k maiores notas, com o mesmo critério do SelectKBest
+    """
+    scores = np.where(np.isnan(scores), np.finfo(np.float64).min, scores)
+    if k == 'all' or k >= len(scores):
+        return np.arange(len(scores))
+    return np.sort(np.argsort(scores, kind='mergesort')[len(scores) - k:])
+
+def select_important_features(X_train, y_train, X_val, X_test, method='mutual_info', k=10, n_jobs=-1,
+                              sample_size=None, n_repeats=1, random_state=42, cache_dir=FEATURE_SCORE_CACHE_DIR):
     """
     Seleciona as features mais importantes
     
@@ -112,29 +252,34 @@ def select_important_features(X_train, y_train, X_val, X_test, method='mutual_in
         X_test (pd.DataFrame): Features de teste
         method (str): Método de seleção (mutual_info, chi2, f_classif)
         k (int): Número de features a serem selecionadas
+        n_jobs (int): Processos usados no cálculo dos scores (-1 = todos os núcleos)
+        sample_size (int): Linhas por subamostra (None = todas as linhas)
+        n_repeats (int): Número de subamostras; com mais de uma, reporta a confiança da seleção
+        random_state (int): Semente das subamostras e do mutual_info
+        cache_dir (str): Diretório do cache de scores (None desativa o cache em disco)
     
     Returns:
         tuple: X_train, X_val, X_test apenas com as features selecionadas
     """
-    if method == 'mutual_info':
-        from sklearn.feature_selection import SelectKBest, mutual_info_classif
-        selector = SelectKBest(mutual_info_classif, k=k)
-    elif method == 'chi2':
-        from sklearn.feature_selection import SelectKBest, chi2
-        selector = SelectKBest(chi2, k=k)
-    elif method == 'f_classif':
-        from sklearn.feature_selection import SelectKBest, f_classif
-        selector = SelectKBest(f_classif, k=k)
-    else:
-        raise ValueError("Método deve ser 'mutual_info', 'chi2' ou 'f_classif'")
-    
-    # Treina o seletor
-    selector.fit(X_train, y_train)
+    result = compute_feature_scores(X_train, y_train, method=method, n_jobs=n_jobs, sample_size=sample_size,
+                                    n_repeats=n_repeats, random_state=random_state, cache_dir=cache_dir)
     
     # Obtém os índices das features selecionadas
-    selected_indices = selector.get_support(indices=True)
+    selected_indices = _top_k(result['scores'], k)
     feature_names = X_train.columns[selected_indices]
     
+    # Confiança: fração das subamostras em que cada feature selecionada ficou entre as k melhores
+    repeat_scores = result['repeat_scores']
+    if len(repeat_scores) > 1:
+        in_top_k = np.zeros(repeat_scores.shape[1])
+        for scores in repeat_scores:
+            in_top_k[_top_k(scores, k)] += 1
+        confidence = in_top_k[selected_indices] / len(repeat_scores)
+        std = repeat_scores.std(axis=0, ddof=1)[selected_indices]
+        report = {name: f'{conf:.0%} (score {score:.4f} ± {err:.4f})' for name, conf, score, err
+                  in zip(feature_names, confidence, result['scores'][selected_indices], std)}
+        logger.info(f"Confiança da seleção em {len(repeat_scores)} subamostras: {report}")
+    
     # Aplica a seleção
     X_train_selected = X_train.iloc[:, selected_indices]
     X_val_selected = X_val.iloc[:, selected_indices]
@@ -0,0 +1,118 @@
+import argparse
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+import joblib
+import xgboost as xgb
+from sklearn.base import clone
+from sklearn.metrics import roc_auc_score
+from model_training import continue_training
+from derived_features import FeatureEngine
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def _full_retrain(incremental_model, X_full, y_full):
+    """
+    Treina do zero, com o histórico completo, um modelo com a mesma configuração final
+    """
+    full_model = clone(incremental_model)
+    if isinstance(full_model, xgb.XGBClassifier):
+        full_model.set_params(n_estimators=incremental_model.get_booster().num_boosted_rounds(),
+                              early_stopping_rounds=None)
+    full_model.fit(X_full, y_full)
+    return full_model
+
+def retrain_incrementally(model, X_new, y_new, X_eval, y_eval, X_full=None, y_full=None,
+                          n_new_estimators=50, max_iter=50):
+    """
+    Retreina um modelo apenas com os dados novos e compara com o retreino completo
+    
+    Args:
+        model: Modelo treinado anteriormente
+        X_new, y_new: Dados novos (por exemplo, o último mês de resultados)
+        X_eval, y_eval: Dados de avaliação usados para medir o desvio das métricas
+        X_full, y_full: Histórico completo (opcional); quando informado, um modelo
+            é treinado do zero para medir o tempo economizado e o desvio
+        n_new_estimators (int): Rodadas ou árvores adicionadas (XGBoost e Random Forest)
+        max_iter (int): Iterações da atualização parcial (Regressão Logística)
+    
+    Returns:
+        tuple: Modelo atualizado e relatório (dict) com tempos e métricas
+    """
+    report = {
+        'family': type(model).__name__,
+        'new_rows': X_new.shape[0],
+        'previous_auc': float(roc_auc_score(y_eval, model.predict_proba(X_eval)[:, 1]))
+    }
+    
+    start = time.perf_counter()
+    incremental_model = continue_training(model, X_new, y_new, n_new_estimators=n_new_estimators,
+                                          max_iter=max_iter)
+    report['incremental_seconds'] = time.perf_counter() - start
+    incremental_probs = incremental_model.predict_proba(X_eval)[:, 1]
+    report['incremental_auc'] = float(roc_auc_score(y_eval, incremental_probs))
+    
+    if X_full is not None:
+        start = time.perf_counter()
+        full_model = _full_retrain(incremental_model, X_full, y_full)
+        report['full_seconds'] = time.perf_counter() - start
+        full_probs = full_model.predict_proba(X_eval)[:, 1]
+        report['full_auc'] = float(roc_auc_score(y_eval, full_probs))
+        report['time_saved_seconds'] = report['full_seconds'] - report['incremental_seconds']
+        report['speedup'] = report['full_seconds'] / report['incremental_seconds']
+        # Desvio em relação ao retreino completo: diferença de AUC e das probabilidades
+        report['auc_drift'] = report['incremental_auc'] - report['full_auc']
+        report['mean_abs_prob_diff'] = float(np.mean(np.abs(incremental_probs - full_probs)))
+    
+    logger.info(f"Retreino incremental: {json.dumps(report)}")
+    return incremental_model, report
+
+def _load_matrix(path, target, preprocessor, engine):
+    df = pd.read_csv(path)
+    y = df.pop(target)
+    return preprocessor.transform(engine.transform_frame(df, copy=False)), y
+
+def main():
+    parser = argparse.ArgumentParser(description='Retreino incremental a partir do modelo salvo')
+    parser.add_argument('--model', default='./models/trained_models/best_model.joblib')
+    parser.add_argument('--preprocessor', default='./models/trained_models/preprocessor.joblib')
+    parser.add_argument('--config', default='./models/trained_models/config.json')
+    parser.add_argument('--new-data', required=True, help='CSV apenas com os resultados novos')
+    parser.add_argument('--eval-data', required=True, help='CSV usado para medir o desvio das métricas')
+    parser.add_argument('--full-data', help='CSV com o histórico completo, para comparar com o retreino completo')
+    parser.add_argument('--target', required=True, help='Nome da coluna alvo')
+    parser.add_argument('--n-new-estimators', type=int, default=50)
+    parser.add_argument('--max-iter', type=int, default=50)
+    parser.add_argument('--output', help='Caminho do modelo atualizado (padrão: sobrescreve --model)')
+    parser.add_argument('--report', help='Arquivo JSON para o relatório')
+    args = parser.parse_args()
+    
+    model = joblib.load(args.model)
+    preprocessor = joblib.load(args.preprocessor)
+    config = {}
+    if os.path.exists(args.config):
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+    engine = FeatureEngine.from_config(config['derived_features']) if 'derived_features' in config else FeatureEngine()
+    X_new, y_new = _load_matrix(args.new_data, args.target, preprocessor, engine)
+    X_eval, y_eval = _load_matrix(args.eval_data, args.target, preprocessor, engine)
+    X_full, y_full = (None, None)
+    if args.full_data:
+        X_full, y_full = _load_matrix(args.full_data, args.target, preprocessor, engine)
+    
+    updated, report = retrain_incrementally(model, X_new, y_new, X_eval, y_eval, X_full, y_full,
+                                            n_new_estimators=args.n_new_estimators, max_iter=args.max_iter)
+    output = args.output or args.model
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    joblib.dump(updated, output)
+    logger.info(f"Modelo atualizado salvo em {output}")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
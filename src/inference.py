@@ -0,0 +1,408 @@
+import threading
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler, MinMaxScaler, OneHotEncoder
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class CompiledPreprocessor:
+    """
+    Versão compilada de um ColumnTransformer já treinado
+    
+    Extrai as estatísticas dos imputadores, as médias/escalas dos scalers e os
+    vocabulários do OneHotEncoder para arrays NumPy e dicionários, permitindo
+    transformar um único registro (dict) sem construir um DataFrame. As operações
+    aritméticas são as mesmas do sklearn, na mesma ordem, de modo que o vetor
+    gerado é idêntico bit a bit ao de `preprocessor.transform`.
+    
+    Se o preprocessador gera saída esparsa (one-hot esparso), as matrizes
+    retornadas são CSR com as mesmas entradas armazenadas (apenas os valores
+    não nulos), já que o XGBoost trata as entradas ausentes como faltantes.
+    """
+    
+    def __init__(self, preprocessor):
+        if not isinstance(preprocessor, ColumnTransformer):
+            raise ValueError('Apenas ColumnTransformer pode ser compilado')
+        
+        self.numeric_blocks = []
+        self.categorical_blocks = []
+        offset = 0
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            if transformer == 'passthrough' or not isinstance(transformer, Pipeline):
+                raise ValueError(f"Transformador '{name}' não suportado pelo modo compilado")
+            
+            steps = [step for _, step in transformer.steps]
+            if isinstance(steps[-1], OneHotEncoder):
+                block = self._compile_categorical(name, steps, list(columns), offset)
+                self.categorical_blocks.append(block)
+            else:
+                block = self._compile_numeric(name, steps, list(columns), offset)
+                self.numeric_blocks.append(block)
+            offset = block['end']
+        
+        self.n_features_out = offset
+        self.sparse_output = bool(getattr(preprocessor, 'sparse_output_', False))
+        self._local = threading.local()
+        logger.info(f"Preprocessador compilado: {self.n_features_out} features de saída"
+                    f"{' (CSR)' if self.sparse_output else ''}")
+    
+    @staticmethod
+    def _compile_numeric(name, steps, columns, offset):
+        """
+        Extrai as operações de um pipeline numérico (imputer -> scaler)
+        """
+        block = {'columns': columns, 'start': offset, 'end': offset + len(columns),
+                 'fill': None, 'ops': []}
+        for step in steps:
+            if isinstance(step, SimpleImputer) and block['fill'] is None and not block['ops']:
+                fill = np.asarray(step.statistics_, dtype=np.float64)
+                if np.isnan(fill).any():
+                    raise ValueError(f"Imputer de '{name}' possui colunas vazias no treino")
+                block['fill'] = fill
+            elif isinstance(step, StandardScaler):
+                if step.with_mean:
+                    block['ops'].append(('sub', step.mean_))
+                if step.with_std:
+                    block['ops'].append(('div', step.scale_))
+            elif isinstance(step, MinMaxScaler):
+                block['ops'].append(('mul', step.scale_))
+                block['ops'].append(('add', step.min_))
+                if step.clip:
+                    block['ops'].append(('clip', step.feature_range))
+            else:
+                raise ValueError(f"Etapa {type(step).__name__} de '{name}' não suportada pelo modo compilado")
+        return block
+    
+    @staticmethod
+    def _compile_categorical(name, steps, columns, offset):
+        """
+        Extrai o valor de imputação e o vocabulário de um pipeline categórico (imputer -> onehot)
+        """
+        encoder = steps[-1]
+        imputer = None
+        for step in steps[:-1]:
+            if isinstance(step, SimpleImputer) and imputer is None:
+                imputer = step
+            else:
+                raise ValueError(f"Etapa {type(step).__name__} de '{name}' não suportada pelo modo compilado")
+        if encoder.drop is not None:
+            raise ValueError(f"OneHotEncoder de '{name}' com drop não suportado pelo modo compilado")
+        if getattr(encoder, 'max_categories', None) is not None or getattr(encoder, 'min_frequency', None) is not None:
+            raise ValueError(f"OneHotEncoder de '{name}' com categorias infrequentes não suportado pelo modo compilado")
+        
+        vocabularies = []
+        position = offset
+        for categories in encoder.categories_:
+            vocabularies.append({category: position + i for i, category in enumerate(categories)})
+            position += len(categories)
+        
+        return {
+            'columns': columns,
+            'start': offset,
+            'end': position,
+            'fill': list(imputer.statistics_) if imputer is not None else None,
+            'vocabularies': vocabularies,
+            'ignore_unknown': encoder.handle_unknown == 'ignore'
+        }
+    
+    def _buffer(self):
+        """
+        Retorna o vetor de features pré-alocado da thread atual
+        """
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = np.zeros((1, self.n_features_out), dtype=np.float64)
+            self._local.buffer = buffer
+        return buffer
+    
+    def transform_record(self, record):
+        """
+        Transforma um único registro no vetor de features do modelo
+        
+        O vetor denso retornado é reutilizado pela próxima chamada na mesma
+        thread; copie-o caso precise mantê-lo.
+        
+        Args:
+            record (dict): Dados de um solicitante
+        
+        Returns:
+            np.array: Matriz (1, n_features) pronta para `model.predict_proba`
+                (csr_matrix nova se o preprocessador tem saída esparsa)
+        """
+        buffer = self._buffer()
+        self._fill_row(buffer[0], record)
+        if self.sparse_output:
+            return dense_to_csr(buffer)
+        return buffer
+    
+    def transform_records(self, records):
+        """
+        Transforma uma lista de registros em uma matriz de features
+        
+        Args:
+            records (list): Lista de dicts com os dados dos solicitantes
+        
+        Returns:
+            np.array: Matriz (n_registros, n_features) (csr_matrix se a saída é esparsa)
+        """
+        X = np.empty((len(records), self.n_features_out), dtype=np.float64)
+        for i, record in enumerate(records):
+            self._fill_row(X[i], record)
+        if self.sparse_output:
+            return dense_to_csr(X)
+        return X
+    
+    def _fill_row(self, row, record):
+        """
+        Escreve as features de um registro em uma linha já alocada
+        """
+        for block in self.numeric_blocks:
+            values = row[block['start']:block['end']]
+            try:
+                values[:] = [record[col] for col in block['columns']]
+            except KeyError as e:
+                raise ValueError(f'Coluna faltante para o preprocessador: {e}')
+            if block['fill'] is not None:
+                np.copyto(values, block['fill'], where=np.isnan(values))
+            for op, param in block['ops']:
+                if op == 'sub':
+                    values -= param
+                elif op == 'div':
+                    values /= param
+                elif op == 'mul':
+                    values *= param
+                elif op == 'add':
+                    values += param
+                else:
+                    np.clip(values, param[0], param[1], out=values)
+        
+        for block in self.categorical_blocks:
+            row[block['start']:block['end']] = 0.0
+            for i, col in enumerate(block['columns']):
+                try:
+                    value = record[col]
+                except KeyError as e:
+                    raise ValueError(f'Coluna faltante para o preprocessador: {e}')
+                # Assim como o SimpleImputer, apenas NaN é considerado faltante
+                if block['fill'] is not None and value != value:
+                    value = block['fill'][i]
+                position = block['vocabularies'][i].get(value)
+                if position is not None:
+                    row[position] = 1.0
+                elif not block['ignore_unknown']:
+                    raise ValueError(f"Categoria desconhecida '{value}' na coluna {col}")
+
+def dense_to_csr(X):
+    """
+    Converte uma matriz densa em CSR armazenando apenas os valores não nulos
+    (NaN é armazenado), como o ColumnTransformer com saída esparsa
+    """
+    rows, cols = np.nonzero(X)
+    indptr = np.zeros(X.shape[0] + 1, dtype=np.int32)
+    np.cumsum(np.bincount(rows, minlength=X.shape[0]), out=indptr[1:])
+    return sparse.csr_matrix((X[rows, cols], cols.astype(np.int32), indptr), shape=X.shape)
+
+def _dense(X):
+    return X.toarray() if sparse.issparse(X) else np.asarray(X, dtype=np.float64)
+
+def records_frame(records):
+    """
+    Monta um DataFrame de solicitantes em que cada valor é interpretado como no modo compilado
+    
+    O pandas infere o dtype da coluna a partir do lote inteiro: em uma coluna de
+    texto, None vira NaN (e é imputado) quando há strings em outras linhas, mas
+    continua None (categoria desconhecida) em um lote de uma linha. As colunas
+    não numéricas são refeitas com dtype object e os valores originais, para
+    que a pontuação de uma linha não dependa das demais.
+    
+    Args:
+        records (list): Lista de dicts com os dados dos solicitantes
+    
+    Returns:
+        pd.DataFrame: Uma linha por registro
+    """
+    frame = pd.DataFrame.from_records(records)
+    for column in frame.columns:
+        if not pd.api.types.is_numeric_dtype(frame[column].dtype):
+            frame[column] = pd.Series([record.get(column) for record in records], index=frame.index, dtype=object)
+    return frame
+
+def compile_preprocessor(preprocessor):
+    """
+    Compila um ColumnTransformer treinado para o modo de inferência rápida
+    
+    Args:
+        preprocessor (ColumnTransformer): Preprocessador treinado
+    
+    Returns:
+        CompiledPreprocessor: Preprocessador compilado
+    """
+    return CompiledPreprocessor(preprocessor)
+
+def generate_parity_records(compiled):
+    """
+    Gera registros sintéticos que cobrem os casos relevantes para o teste de paridade
+    
+    Inclui valores típicos, faltantes (None/NaN), extremos, strings numéricas,
+    todas as categorias conhecidas e uma categoria desconhecida.
+    
+    Args:
+        compiled (CompiledPreprocessor): Preprocessador compilado
+    
+    Returns:
+        list: Lista de registros (dicts)
+    """
+    numeric_values = [0, 1, -1, 0.1, 1e-12, 123456.789, -98765.4321, 1e12, None, float('nan')]
+    base = {}
+    for block in compiled.numeric_blocks:
+        for i, col in enumerate(block['columns']):
+            base[col] = float(block['fill'][i]) if block['fill'] is not None else 0.0
+    for block in compiled.categorical_blocks:
+        for i, col in enumerate(block['columns']):
+            base[col] = next(iter(block['vocabularies'][i]), None)
+    
+    records = [dict(base)]
+    for block in compiled.numeric_blocks:
+        for col in block['columns']:
+            for value in numeric_values:
+                records.append(dict(base, **{col: value}))
+            # Strings numéricas, como chegam de clientes que serializam tudo como texto
+            for value in [str(base[col]), '0', '-1', '1e3', '123456.789']:
+                records.append(dict(base, **{col: value}))
+    for block in compiled.categorical_blocks:
+        for i, col in enumerate(block['columns']):
+            categories = list(block['vocabularies'][i])
+            extra = [float('nan')] + ([] if not block['ignore_unknown'] else [None, '__categoria_desconhecida__'])
+            for value in categories + extra:
+                records.append(dict(base, **{col: value}))
+    return records
+
+def build_parity_matrix(compiled, records=None):
+    """
+    Monta a matriz de features dos registros de paridade, ignorando os rejeitados
+    
+    Args:
+        compiled (CompiledPreprocessor): Preprocessador compilado
+        records (list): Registros a transformar (se None, usa `generate_parity_records`)
+    
+    Returns:
+        np.array: Matriz (n_registros, n_features) (csr_matrix se a saída é esparsa)
+    """
+    if records is None:
+        records = generate_parity_records(compiled)
+    
+    rows = []
+    for record in records:
+        try:
+            rows.append(compiled.transform_record(record).copy())
+        except ValueError:
+            continue
+    if compiled.sparse_output:
+        return sparse.vstack(rows, format='csr')
+    return np.vstack(rows)
+
+def check_parity(compiled, preprocessor, model=None, records=None):
+    """
+    Compara o modo compilado com o caminho sklearn (DataFrame + ColumnTransformer)
+    
+    Args:
+        compiled (CompiledPreprocessor): Preprocessador compilado
+        preprocessor (ColumnTransformer): Preprocessador original
+        model: Modelo treinado (opcional). Se fornecido, compara também as probabilidades
+        records (list): Registros a comparar (se None, usa `generate_parity_records`)
+    
+    Returns:
+        list: Lista de divergências encontradas (vazia quando há paridade bit a bit)
+    """
+    if records is None:
+        records = generate_parity_records(compiled)
+    
+    mismatches = []
+    for record in records:
+        try:
+            expected = preprocessor.transform(pd.DataFrame([record]))
+        except Exception:
+            expected = None
+        try:
+            actual = compiled.transform_record(record).copy()
+        except Exception:
+            actual = None
+        if expected is None or actual is None:
+            # Ambos os caminhos devem rejeitar os mesmos registros
+            if (expected is None) != (actual is None):
+                mismatches.append({'record': record, 'stage': 'validation'})
+            continue
+        same_format = sparse.issparse(expected) == sparse.issparse(actual)
+        if not same_format or not np.array_equal(_dense(expected), _dense(actual), equal_nan=True):
+            mismatches.append({'record': record, 'stage': 'preprocessor'})
+            continue
+        if model is not None:
+            expected_prob = model.predict_proba(expected)[0, 1]
+            actual_prob = model.predict_proba(actual)[0, 1]
+            if expected_prob != actual_prob:
+                mismatches.append({'record': record, 'stage': 'model'})
+    
+    if mismatches:
+        logger.warning(f"Paridade do modo compilado falhou em {len(mismatches)} de {len(records)} registros")
+    else:
+        logger.info(f"Paridade do modo compilado verificada em {len(records)} registros")
+    return mismatches
+
+def check_batch_parity(compiled, preprocessor, model=None, records=None):
+    """
+    Compara cada registro pontuado sozinho com o mesmo registro dentro de um lote misto
+    
+    O lote (records_frame + ColumnTransformer) reúne todos os registros aceitos,
+    com faltantes, strings numéricas e categorias de todas as colunas, e cada
+    linha deve ser idêntica à do registro transformado isoladamente.
+    
+    Args:
+        compiled (CompiledPreprocessor): Preprocessador compilado
+        preprocessor (ColumnTransformer): Preprocessador original
+        model: Modelo treinado (opcional). Se fornecido, compara também as probabilidades
+        records (list): Registros a comparar (se None, usa `generate_parity_records`)
+    
+    Returns:
+        list: Lista de divergências encontradas (vazia quando há paridade; as
+            matrizes devem ser idênticas e as probabilidades iguais até 1e-9)
+    """
+    if records is None:
+        records = generate_parity_records(compiled)
+    
+    accepted, rows = [], []
+    for record in records:
+        try:
+            rows.append(compiled.transform_record(record).copy())
+        except ValueError:
+            continue
+        accepted.append(record)
+    if not accepted:
+        return []
+    batch = _dense(preprocessor.transform(records_frame(accepted)))
+    alone = _dense(sparse.vstack(rows, format='csr') if compiled.sparse_output else np.vstack(rows))
+    
+    mismatches = []
+    for i, record in enumerate(accepted):
+        if not np.array_equal(batch[i], alone[i], equal_nan=True):
+            mismatches.append({'record': record, 'stage': 'preprocessor'})
+    if model is not None and not mismatches:
+        # Com as linhas idênticas, só resta o arredondamento do BLAS entre matriz e linha única
+        batch_probs = model.predict_proba(preprocessor.transform(records_frame(accepted)))[:, 1]
+        for i, record in enumerate(accepted):
+            alone_prob = model.predict_proba(compiled.transform_record(record))[0, 1]
+            if not np.isclose(batch_probs[i], alone_prob, rtol=1e-9, atol=1e-12):
+                mismatches.append({'record': record, 'stage': 'model'})
+    
+    if mismatches:
+        logger.warning(f"Paridade entre registro isolado e lote falhou em {len(mismatches)} de {len(accepted)} registros")
+    else:
+        logger.info(f"Paridade entre registro isolado e lote verificada em {len(accepted)} registros")
+    return mismatches
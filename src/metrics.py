@@ -0,0 +1,232 @@
+import bisect
+import threading
+import numpy as np
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Limites superiores (s) dos histogramas de duração e buckets dos scores de risco
+DURATION_BUCKETS_S = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5]
+SCORE_BUCKETS = [round(0.05 * i, 2) for i in range(1, 21)]
+
+# Acima deste número de shards, os de threads encerradas são consolidados no registro
+MAX_LIVE_SHARDS = 256
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class _ShardedMetric:
+    """
+    Base das métricas com um shard de valores por thread
+    
+    Cada thread escreve apenas no próprio shard, sem lock no caminho da
+    requisição; a coleta soma os shards. Os shards de threads encerradas (o
+    servidor Flask cria uma thread por requisição) são consolidados em um
+    acumulador, para que o número de shards não cresça sem limite.
+    """
+    
+    kind = None
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = {}
+    
+    def _values(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = {}
+            with self._lock:
+                if len(self._shards) >= MAX_LIVE_SHARDS:
+                    self._retire_dead_shards()
+                self._shards.append((threading.current_thread(), values))
+            self._local.values = values
+            return values
+    
+    def _merge(self, target, values):
+        raise NotImplementedError
+    
+    def _retire_dead_shards(self):
+        live = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                live.append((thread, values))
+            else:
+                self._merge(self._retired, values)
+        self._shards = live
+    
+    def collect(self):
+        """
+        Soma os shards de todas as threads
+        
+        Returns:
+            dict: Tupla de labels -> valor agregado
+        """
+        with self._lock:
+            self._retire_dead_shards()
+            totals = {}
+            self._merge(totals, self._retired)
+            for _, values in self._shards:
+                # dict.copy é atômico sob o GIL, mesmo com a thread dona escrevendo
+                self._merge(totals, values.copy())
+        return totals
+    
+    def _format_labels(self, labels, extra=None):
+        pairs = list(zip(self.labelnames, labels))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        escaped = [(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                   for name, value in pairs]
+        return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+    
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._render_samples(self.collect()))
+        return lines
+
+class Counter(_ShardedMetric):
+    """
+    Contador monotônico com labels
+    
+    Args:
+        name (str): Nome da métrica no formato Prometheus
+        documentation (str): Descrição exibida em # HELP
+        labelnames (tuple): Nomes dos labels, na ordem usada em inc()
+    """
+    
+    kind = 'counter'
+    
+    def inc(self, *labels, amount=1):
+        values = self._values()
+        values[labels] = values.get(labels, 0) + amount
+    
+    def _merge(self, target, values):
+        for labels, value in values.items():
+            target[labels] = target.get(labels, 0) + value
+    
+    def _render_samples(self, totals):
+        for labels, value in sorted(totals.items()):
+            yield f'{self.name}{self._format_labels(labels)} {value}'
+
+class Histogram(_ShardedMetric):
+    """
+    Histograma de buckets fixos com labels
+    
+    Cada série guarda a contagem por bucket (le inclusivo, como no Prometheus)
+    seguida da soma dos valores; a contagem total é a soma dos buckets.
+    
+    Args:
+        name (str): Nome da métrica no formato Prometheus
+        documentation (str): Descrição exibida em # HELP
+        buckets (list): Limites superiores, em ordem crescente
+        labelnames (tuple): Nomes dos labels, na ordem usada em observe()
+    """
+    
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, buckets=DURATION_BUCKETS_S, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = [float(bucket) for bucket in buckets]
+        self._bucket_array = np.asarray(self.buckets)
+    
+    def observe(self, value, *labels):
+        values = self._values()
+        row = values.get(labels)
+        if row is None:
+            row = values[labels] = [0] * (len(self.buckets) + 2)
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+    
+    def observe_many(self, array, *labels):
+        """
+        Registra um array de valores de uma vez (lotes)
+        """
+        array = np.asarray(array, dtype=np.float64)
+        array = array[~np.isnan(array)]
+        if not len(array):
+            return
+        counts = np.bincount(np.searchsorted(self._bucket_array, array, side='left'),
+                             minlength=len(self.buckets) + 1)
+        values = self._values()
+        row = values.get(labels)
+        if row is None:
+            row = values[labels] = [0] * (len(self.buckets) + 2)
+        for i, count in enumerate(counts.tolist()):
+            row[i] += count
+        row[-1] += float(array.sum())
+    
+    def _merge(self, target, values):
+        for labels, row in values.items():
+            row = list(row)
+            current = target.get(labels)
+            target[labels] = row if current is None else [a + b for a, b in zip(current, row)]
+    
+    def _render_samples(self, totals):
+        upper_bounds = [repr(bucket) for bucket in self.buckets] + ['+Inf']
+        for labels, row in sorted(totals.items()):
+            cumulative = 0
+            for le, count in zip(upper_bounds, row[:-1]):
+                cumulative += count
+                yield f'{self.name}_bucket{self._format_labels(labels, ("le", le))} {cumulative}'
+            yield f'{self.name}_sum{self._format_labels(labels)} {row[-1]!r}'
+            yield f'{self.name}_count{self._format_labels(labels)} {cumulative}'
+
+class MetricsRegistry:
+    """
+    Conjunto de métricas exposto no formato texto do Prometheus
+    
+    Além das métricas registradas, aceita coletores chamados no momento da
+    exposição (ex.: contadores já mantidos pelo cache de predições).
+    """
+    
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+    
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+    
+    def histogram(self, name, documentation, buckets=DURATION_BUCKETS_S, labelnames=()):
+        metric = Histogram(name, documentation, buckets, labelnames)
+        self._metrics.append(metric)
+        return metric
+    
+    def register_collector(self, collector):
+        """
+        Registra uma função sem argumentos que retorna uma lista de tuplas
+        (nome, tipo, descrição, {labels: valor}) no momento da exposição
+        """
+        self._collectors.append(collector)
+    
+    def render(self):
+        """
+        Gera o texto da exposição (Content-Type: CONTENT_TYPE)
+        
+        Returns:
+            str: Todas as métricas no formato texto do Prometheus
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                samples = collector()
+            except Exception as e:
+                logger.warning(f"Erro ao coletar métricas: {str(e)}")
+                continue
+            for name, kind, documentation, values in samples:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in values.items():
+                    label_text = ','.join(f'{key}="{label}"' for key, label in labels)
+                    lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
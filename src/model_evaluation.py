@@ -1,49 +1,286 @@
-from sklearn.metrics import (
-    accuracy_score, precision_score, recall_score, f1_score,
-    roc_auc_score, confusion_matrix, classification_report
-)
+import numpy as np
+import pandas as pd
 import joblib
+from joblib import Parallel, delayed
 import os
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def evaluate_model(model, X, y, model_name=None):
+# Métricas escalares calculadas a partir da passada ordenada
+SCALAR_METRICS = ['accuracy', 'precision', 'recall', 'f1', 'roc_auc', 'ks', 'gini']
+
+# Tabela da inversa da CDF de Poisson(1) em 2**16 níveis: sortear os pesos do
+# bootstrap vira uma indexação por inteiros aleatórios de 16 bits
+_POISSON_CDF = np.cumsum(np.exp(-1.0) / np.cumprod(np.concatenate([[1.0], np.arange(1.0, 20.0)])))
+_POISSON_TABLE = np.searchsorted(_POISSON_CDF, (np.arange(65536) + 0.5) / 65536).astype(np.float64)
+
+def predict_scores(model, X, batch_size=None):
+    """
+    Calcula os scores de alto risco com uma única chamada ao modelo
+    
+    Args:
+        model: Modelo treinado
+        X (pd.DataFrame/np.array/scipy.sparse): Features para avaliação
+        batch_size (int): Linhas por bloco de predição (None = tudo de uma vez)
+    
+    Returns:
+        tuple: Array de scores e um booleano indicando se são probabilidades
+    """
+    has_proba = hasattr(model, 'predict_proba')
+    predict = (lambda rows: model.predict_proba(rows)[:, 1]) if has_proba else model.predict
+    # shape[0] em vez de len(): matrizes esparsas não definem len()
+    n_rows = X.shape[0]
+    if batch_size is None or n_rows <= batch_size:
+        scores = predict(X)
+    else:
+        blocks = []
+        for start in range(0, n_rows, batch_size):
+            rows = X.iloc[start:start + batch_size] if isinstance(X, pd.DataFrame) else X[start:start + batch_size]
+            blocks.append(predict(rows))
+        scores = np.concatenate(blocks)
+    return np.asarray(scores, dtype=np.float64), has_proba
+
+def _sort_scores(y, scores):
+    """
+    Ordena os scores de forma decrescente (a única ordenação da avaliação)
+    
+    Returns:
+        tuple: Target ordenado (0/1), scores ordenados e índices do último
+            elemento de cada valor distinto de score
+    """
+    order = np.argsort(-scores, kind='stable')
+    sorted_scores = scores[order]
+    y_sorted = (np.asarray(y)[order] == 1).astype(np.float64)
+    ends = np.append(np.flatnonzero(np.diff(sorted_scores)), len(sorted_scores) - 1)
+    return y_sorted, sorted_scores, ends, order
+
+def _metrics_from_sorted(y_sorted, ends, n_predicted_positive, weights=None):
+    """
+    Calcula todas as métricas a partir dos acumulados sobre os scores ordenados
+    
+    Os previstos como alto risco (score >= limiar) são um prefixo da ordem
+    decrescente, então a matriz de confusão sai dos mesmos acumulados usados
+    na curva ROC. Com `weights` (bootstrap de Poisson) cada linha conta com o
+    seu peso, sem reordenar os dados.
+    
+    Returns:
+        dict: Métricas escalares e matriz de confusão
+    """
+    if weights is None:
+        positives = np.cumsum(y_sorted)
+        negatives = np.arange(1, len(y_sorted) + 1) - positives
+    else:
+        positives = np.cumsum(y_sorted * weights)
+        negatives = np.cumsum(weights) - positives
+    total_positive = positives[-1] if len(positives) else 0.0
+    total_negative = negatives[-1] if len(negatives) else 0.0
+    
+    # Matriz de confusão no limiar
+    if n_predicted_positive > 0:
+        tp = positives[n_predicted_positive - 1]
+        fp = negatives[n_predicted_positive - 1]
+    else:
+        tp = fp = 0.0
+    fn = total_positive - tp
+    tn = total_negative - fp
+    total = total_positive + total_negative
+    precision = tp / (tp + fp) if tp + fp > 0 else 0.0
+    recall = tp / total_positive if total_positive > 0 else 0.0
+    metrics = {
+        'accuracy': (tp + tn) / total if total > 0 else np.nan,
+        'precision': precision,
+        'recall': recall,
+        'f1': 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0,
+        'confusion_matrix': [[tn, fp], [fn, tp]]
+    }
+    
+    # Curva ROC nos valores distintos de score; empates entram como um único ponto
+    if total_positive > 0 and total_negative > 0:
+        tpr = np.concatenate([[0.0], positives[ends] / total_positive])
+        fpr = np.concatenate([[0.0], negatives[ends] / total_negative])
+        roc_auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1])) / 2)
+        metrics['roc_auc'] = roc_auc
+        metrics['ks'] = float(np.max(np.abs(tpr - fpr)))
+        metrics['gini'] = 2 * roc_auc - 1
+    else:
+        metrics['roc_auc'] = metrics['ks'] = metrics['gini'] = np.nan
+    
+    for metric in ['accuracy', 'precision', 'recall', 'f1']:
+        metrics[metric] = float(metrics[metric])
+    return metrics
+
+def compute_metrics(y, scores, threshold=0.5):
+    """
+    Calcula as métricas de classificação a partir dos scores, em uma passada ordenada
+    
+    Args:
+        y (np.array): Target (1 = alto risco)
+        scores (np.array): Scores de alto risco
+        threshold (float): Scores a partir do limiar (score >= limiar) são alto risco, como na API
+    
+    Returns:
+        dict: accuracy, precision, recall, f1, confusion_matrix, roc_auc, ks e gini
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    y_sorted, _, ends, _ = _sort_scores(y, scores)
+    n_predicted_positive = int(np.count_nonzero(scores >= threshold))
+    metrics = _metrics_from_sorted(y_sorted, ends, n_predicted_positive)
+    metrics['confusion_matrix'] = np.asarray(metrics['confusion_matrix'], dtype=np.int64).tolist()
+    return metrics
+
+def _bootstrap_replicates(y_sorted, ends, n_predicted_positive, seeds):
+    """
+    Executa um bloco de réplicas do bootstrap de Poisson (executado nos workers)
+    """
+    replicates = []
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        weights = _POISSON_TABLE[rng.integers(0, 65536, len(y_sorted), dtype=np.uint16)]
+        metrics = _metrics_from_sorted(y_sorted, ends, n_predicted_positive, weights)
+        replicates.append([metrics[metric] for metric in SCALAR_METRICS])
+    return replicates
+
+def bootstrap_confidence_intervals(y, scores, threshold=0.5, n_bootstrap=200, confidence=0.95,
+                                   n_jobs=-1, random_state=42):
+    """
+    Intervalos de confiança das métricas por bootstrap de Poisson em paralelo
+    
+    Cada réplica atribui a cada linha um peso Poisson(1), equivalente a uma
+    reamostragem com reposição em amostras grandes. Os dados são ordenados
+    uma única vez e compartilhados com os workers via memory-map; cada réplica
+    custa apenas somas acumuladas ponderadas.
+    
+    Args:
+        y (np.array): Target (1 = alto risco)
+        scores (np.array): Scores de alto risco
+        threshold (float): Limiar de classificação
+        n_bootstrap (int): Número de réplicas
+        confidence (float): Nível de confiança dos intervalos
+        n_jobs (int): Número de processos (-1 = todos os núcleos)
+        random_state (int): Semente das réplicas
+    
+    Returns:
+        dict: Para cada métrica, {'lower', 'upper', 'std'}
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    y_sorted, _, ends, _ = _sort_scores(y, scores)
+    n_predicted_positive = int(np.count_nonzero(scores >= threshold))
+    
+    seeds = np.random.SeedSequence(random_state).spawn(n_bootstrap)
+    n_workers = joblib.cpu_count() if n_jobs in (None, -1) else max(1, n_jobs)
+    blocks = [block for block in np.array_split(np.arange(n_bootstrap), n_workers) if len(block)]
+    with Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r') as parallel:
+        results = parallel(
+            delayed(_bootstrap_replicates)(y_sorted, ends, n_predicted_positive, [seeds[i] for i in block])
+            for block in blocks
+        )
+    replicates = np.array([row for block in results for row in block], dtype=np.float64)
+    
+    alpha = (1 - confidence) / 2
+    intervals = {}
+    for j, metric in enumerate(SCALAR_METRICS):
+        values = replicates[:, j]
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            intervals[metric] = {'lower': np.nan, 'upper': np.nan, 'std': np.nan}
+            continue
+        lower, upper = np.quantile(values, [alpha, 1 - alpha])
+        intervals[metric] = {'lower': float(lower), 'upper': float(upper), 'std': float(values.std(ddof=1))}
+    return intervals
+
+def segment_metrics(y, scores, segments, threshold=0.5, min_rows=1):
+    """
+    Calcula as métricas por segmento (ex.: faixa etária, produto, região)
+    
+    Os scores são ordenados uma única vez; cada segmento é um filtro que
+    preserva essa ordem.
+    
+    Args:
+        y (np.array): Target (1 = alto risco)
+        scores (np.array): Scores de alto risco
+        segments (array-like): Segmento de cada linha (faltantes são ignorados)
+        threshold (float): Limiar de classificação
+        min_rows (int): Segmentos com menos linhas são omitidos
+    
+    Returns:
+        dict: Segmento -> métricas (com 'n_rows' e 'positive_rate')
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    y_sorted, sorted_scores, _, order = _sort_scores(y, scores)
+    codes, uniques = pd.factorize(np.asarray(segments, dtype=object)[order], sort=True)
+    
+    results = {}
+    for k, segment in enumerate(uniques):
+        mask = codes == k
+        n_rows = int(np.count_nonzero(mask))
+        if n_rows < min_rows:
+            continue
+        segment_y = y_sorted[mask]
+        segment_scores = sorted_scores[mask]
+        ends = np.append(np.flatnonzero(np.diff(segment_scores)), n_rows - 1)
+        metrics = _metrics_from_sorted(segment_y, ends, int(np.count_nonzero(segment_scores >= threshold)))
+        metrics['confusion_matrix'] = np.asarray(metrics['confusion_matrix'], dtype=np.int64).tolist()
+        metrics['n_rows'] = n_rows
+        metrics['positive_rate'] = float(segment_y.mean())
+        results[str(segment)] = metrics
+    return results
+
+def evaluate_model(model, X, y, model_name=None, threshold=0.5, n_bootstrap=0, confidence=0.95,
+                   segments=None, n_jobs=-1, batch_size=None):
     """
     Avalia um modelo com métricas padrão
     
+    O modelo é chamado uma única vez (predict_proba) e todas as métricas,
+    incluindo KS e Gini, saem de uma única ordenação dos scores.
+    
     Args:
         model: Modelo treinado
-        X (pd.DataFrame/np.array): Features para avaliação
+        X (pd.DataFrame/np.array/scipy.sparse): Features para avaliação
         y (pd.Series/np.array): Target para avaliação
         model_name (str): Nome do modelo
+        threshold (float): Scores a partir do limiar (score >= limiar) são alto risco, como na API
+            (0.5 reproduz model.predict)
+        n_bootstrap (int): Réplicas para os intervalos de confiança (0 desativa)
+        confidence (float): Nível de confiança dos intervalos
+        segments (array-like): Segmento de cada linha, para métricas por segmento (opcional)
+        n_jobs (int): Processos usados no bootstrap (-1 = todos os núcleos)
+        batch_size (int): Linhas por bloco de predição (None = tudo de uma vez)
     
     Returns:
         dict: Dicionário com as métricas de avaliação
     """
     # Previsões
-    y_pred = model.predict(X)
-    y_pred_proba = model.predict_proba(X)[:, 1] if hasattr(model, 'predict_proba') else None
+    scores, has_proba = predict_scores(model, X, batch_size)
+    y = np.asarray(y)
     
     # Métricas
-    metrics = {
-        'accuracy': accuracy_score(y, y_pred),
-        'precision': precision_score(y, y_pred),
-        'recall': recall_score(y, y_pred),
-        'f1': f1_score(y, y_pred),
-        'confusion_matrix': confusion_matrix(y, y_pred).tolist()
-    }
+    metrics = compute_metrics(y, scores, threshold)
+    if not has_proba:
+        # Sem probabilidades, as métricas de ordenação não são significativas
+        for metric in ['roc_auc', 'ks', 'gini']:
+            metrics.pop(metric)
     
-    if y_pred_proba is not None:
-        metrics['roc_auc'] = roc_auc_score(y, y_pred_proba)
+    if n_bootstrap and has_proba:
+        metrics['confidence_intervals'] = bootstrap_confidence_intervals(
+            y, scores, threshold, n_bootstrap, confidence, n_jobs
+        )
+    if segments is not None:
+        metrics['segments'] = segment_metrics(y, scores, segments, threshold)
     
     # Log das métricas
     log_prefix = f"{model_name} - " if model_name else ""
     logger.info(f"{log_prefix}Avaliação do modelo:")
-    for metric, value in metrics.items():
-        if metric != 'confusion_matrix':
-            logger.info(f"{log_prefix}{metric}: {value:.4f}")
+    for metric in SCALAR_METRICS:
+        if metric not in metrics:
+            continue
+        interval = metrics.get('confidence_intervals', {}).get(metric)
+        if interval:
+            logger.info(f"{log_prefix}{metric}: {metrics[metric]:.4f} "
+                        f"[{interval['lower']:.4f}, {interval['upper']:.4f}]")
+        else:
+            logger.info(f"{log_prefix}{metric}: {metrics[metric]:.4f}")
     
     return metrics
 
@@ -57,4 +294,11 @@ def save_model(model, model_name, model_dir='./models/trained_models'):
         model_dir (str): Diretório para salvar o modelo
     
     Returns:
-        str: Caminho
+        str: Caminho do modelo salvo
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    model_path = os.path.join(model_dir, f"{model_name}_model.joblib")
+    joblib.dump(model, model_path)
+    
+    logger.info(f"Modelo salvo em {model_path}")
+    return model_path
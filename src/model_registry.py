@@ -0,0 +1,393 @@
+import os
+import time
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from batching import BucketHistogram, LATENCY_BUCKETS_MS
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class VersionStats:
+    """
+    Contadores de tráfego e latência de uma versão do modelo (seguros entre threads)
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.high_risk = 0
+        self.latency_ms = BucketHistogram(LATENCY_BUCKETS_MS)
+        self.shadow_requests = 0
+        self.shadow_errors = 0
+        self.shadow_dropped = 0
+        self.shadow_latency_ms = BucketHistogram(LATENCY_BUCKETS_MS)
+        self.shadow_abs_diff_total = 0.0
+        self.shadow_category_disagreements = 0
+    
+    def record(self, latency_ms, error=False, cache_hit=False, high_risk=False):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+            self.cache_hits += int(cache_hit)
+            self.high_risk += int(high_risk)
+            self.latency_ms.observe(latency_ms)
+    
+    def record_shadow(self, latency_ms, abs_diff=None, disagreement=False, error=False):
+        with self._lock:
+            self.shadow_requests += 1
+            if error:
+                self.shadow_errors += 1
+                return
+            self.shadow_latency_ms.observe(latency_ms)
+            self.shadow_abs_diff_total += abs_diff
+            self.shadow_category_disagreements += int(disagreement)
+    
+    def record_shadow_dropped(self):
+        with self._lock:
+            self.shadow_dropped += 1
+    
+    def snapshot(self):
+        with self._lock:
+            scored = self.shadow_requests - self.shadow_errors
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'cache_hits': self.cache_hits,
+                'high_risk_rate': self.high_risk / self.requests if self.requests else None,
+                'latency_ms': self.latency_ms.to_dict(),
+                'shadow': {
+                    'requests': self.shadow_requests,
+                    'errors': self.shadow_errors,
+                    'dropped': self.shadow_dropped,
+                    'latency_ms': self.shadow_latency_ms.to_dict(),
+                    'mean_abs_diff': self.shadow_abs_diff_total / scored if scored else None,
+                    'category_disagreement_rate': self.shadow_category_disagreements / scored if scored else None
+                }
+            }
+
+class ModelVersion:
+    """
+    Conjunto de artefatos de uma versão do modelo
+    
+    Os artefatos não mudam depois do registro (exceto o explicador, construído
+    sob demanda). Cada requisição obtém uma única referência a um ModelVersion
+    e a usa do início ao fim, de modo que a troca de versão nunca mistura o
+    preprocessador de uma versão com o modelo de outra.
+    
+    Args:
+        name (str): Identificador da versão
+        source (dict): Origem dos artefatos (caminhos ou bundle)
+        **artifacts: Artefatos carregados (model, preprocessor, config, predictor, ...)
+    """
+    
+    def __init__(self, name, source=None, **artifacts):
+        self.name = name
+        self.source = source or {}
+        self.loaded_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.stats = VersionStats()
+        self.__dict__.update(artifacts)
+    
+    def describe(self):
+        return {
+            'name': self.name,
+            'source': self.source,
+            'loaded_at': self.loaded_at,
+            'model_type': type(getattr(self, 'model', None) or getattr(self, 'predictor', None)).__name__,
+            'threshold': getattr(self, 'threshold', None)
+        }
+
+class ModelRegistry:
+    """
+    Registro das versões do modelo residentes na API
+    
+    - Carregamento em segundo plano (`load_async`) e troca atômica da versão
+      ativa (`activate`): requisições em andamento terminam com a versão que
+      já tinham obtido
+    - Até `max_versions` versões residentes; as mais antigas que não estão
+      ativas, no roteamento ou em shadow são descarregadas
+    - Roteamento A/B por percentual (`set_routing`), estável por solicitante
+      quando uma chave de roteamento é informada
+    - Pontuação em shadow (`set_shadow`): as versões em shadow pontuam as mesmas
+      requisições fora do caminho da resposta, para comparação
+    
+    Args:
+        max_versions (int): Número máximo de versões residentes
+        shadow_workers (int): Threads usadas na pontuação em shadow
+        max_shadow_pending (int): Pontuações em shadow pendentes acima das quais novas são descartadas
+        on_activate (callable): Chamado com o ModelVersion sempre que a versão ativa muda
+        on_remove (callable): Chamado com o nome de uma versão descarregada ou
+            substituída (ex.: para invalidar as predições em cache dela)
+    """
+    
+    def __init__(self, max_versions=3, shadow_workers=1, max_shadow_pending=1000, on_activate=None, on_remove=None):
+        self.max_versions = max(1, int(max_versions))
+        self.shadow_workers = max(1, int(shadow_workers))
+        self.max_shadow_pending = int(max_shadow_pending)
+        self.on_activate = on_activate
+        self.on_remove = on_remove
+        self.active = None
+        self.routing = None
+        self.shadow = ()
+        self._versions = OrderedDict()
+        self._lock = threading.RLock()
+        self._loads = OrderedDict()
+        self._load_counter = 0
+        self._executor = None
+        self._executor_pid = None
+        self._shadow_pending = 0
+    
+    def get(self, name):
+        version = self._versions.get(name)
+        if version is None:
+            raise KeyError(f"Versão do modelo não encontrada: {name}")
+        return version
+    
+    def names(self):
+        return list(self._versions)
+    
+    def register(self, version, activate=False):
+        """
+        Adiciona uma versão carregada ao registro
+        
+        Uma versão de mesmo nome só é substituída se tiver o mesmo conteúdo
+        (atributo `fingerprint`); nesse caso as referências à antiga (ativa)
+        passam para a nova.
+        
+        Raises:
+            ValueError: Se já houver uma versão residente com o mesmo nome e outro conteúdo
+        """
+        with self._lock:
+            current = self._versions.get(version.name)
+            if current is not None:
+                fingerprints = (getattr(current, 'fingerprint', None), getattr(version, 'fingerprint', None))
+                if None not in fingerprints and fingerprints[0] != fingerprints[1]:
+                    raise ValueError(f"A versão {version.name} já está carregada com outro conteúdo; "
+                                     f"publique os novos artefatos com outro nome")
+                self._removed(version.name)
+                if self.active is current and not activate:
+                    self._activate(version)
+            self._versions[version.name] = version
+            self._versions.move_to_end(version.name)
+            if activate or self.active is None:
+                self._activate(version)
+            self._evict()
+        logger.info(f"Versão {version.name} registrada ({len(self._versions)} residentes)")
+        return version
+    
+    def activate(self, name):
+        with self._lock:
+            self._activate(self.get(name))
+    
+    def _activate(self, version):
+        previous = self.active
+        # Uma única atribuição: cada requisição lê `active` uma vez
+        self.active = version
+        if self.on_activate is not None:
+            self.on_activate(version)
+        if previous is None or previous.name != version.name:
+            logger.info(f"Versão ativa: {previous.name if previous else None} -> {version.name}")
+    
+    def _pinned(self):
+        pinned = set(self.shadow)
+        if self.active is not None:
+            pinned.add(self.active.name)
+        if self.routing is not None:
+            pinned.update(name for name, _ in self.routing)
+        return pinned
+    
+    def _evict(self):
+        pinned = self._pinned()
+        for name in list(self._versions):
+            if len(self._versions) <= self.max_versions:
+                break
+            if name not in pinned:
+                del self._versions[name]
+                self._removed(name)
+                logger.info(f"Versão {name} descarregada (limite de {self.max_versions} versões residentes)")
+    
+    def unload(self, name):
+        with self._lock:
+            if name in self._pinned():
+                raise ValueError(f"A versão {name} está ativa, no roteamento ou em shadow")
+            self.get(name)
+            del self._versions[name]
+            self._removed(name)
+        logger.info(f"Versão {name} descarregada")
+    
+    def _removed(self, name):
+        if self.on_remove is not None:
+            self.on_remove(name)
+    
+    def set_routing(self, weights):
+        """
+        Define o roteamento A/B por percentual
+        
+        Args:
+            weights (dict): Versão -> percentual do tráfego (soma 100); vazio ou
+                None volta a enviar todo o tráfego para a versão ativa
+        """
+        if not weights:
+            self.routing = None
+            logger.info("Roteamento A/B desativado")
+            return
+        with self._lock:
+            for name in weights:
+                self.get(name)
+            total = float(sum(weights.values()))
+            if any(weight < 0 for weight in weights.values()) or abs(total - 100.0) > 1e-6:
+                raise ValueError('Os percentuais do roteamento devem ser não negativos e somar 100')
+            cumulative, routing = 0.0, []
+            for name, weight in weights.items():
+                cumulative += float(weight)
+                routing.append((name, cumulative))
+            self.routing = tuple(routing)
+        logger.info(f"Roteamento A/B: {dict(weights)}")
+    
+    def set_shadow(self, names):
+        with self._lock:
+            for name in names or ():
+                self.get(name)
+            self.shadow = tuple(names or ())
+        logger.info(f"Versões em shadow: {list(self.shadow)}")
+    
+    def route(self, key=None):
+        """
+        Escolhe a versão que atende uma requisição
+        
+        Args:
+            key (str): Chave estável do solicitante (ex.: hash das features); sem
+                ela o sorteio é aleatório
+        
+        Returns:
+            ModelVersion: Versão escolhida
+        """
+        routing = self.routing
+        if routing is None:
+            return self.active
+        if key is None:
+            point = random.random() * 100
+        else:
+            point = (int(key[:8], 16) % 10000) / 100.0
+        for name, cumulative in routing:
+            if point < cumulative:
+                version = self._versions.get(name)
+                if version is not None:
+                    return version
+        return self.active
+    
+    def _shadow_executor(self):
+        # O pool é criado sob demanda em cada processo, pois as threads não sobrevivem a um fork
+        if self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.shadow_workers,
+                                                        thread_name_prefix='shadow-scoring')
+                    self._shadow_pending = 0
+                    self._executor_pid = os.getpid()
+        return self._executor
+    
+    def submit_shadow(self, record, primary, primary_prob, score_fn, category_fn):
+        """
+        Pontua o registro nas versões em shadow, fora do caminho da resposta
+        
+        Args:
+            record (dict): Cópia dos dados do solicitante, antes da pontuação principal
+            primary (ModelVersion): Versão que respondeu à requisição
+            primary_prob (float): Probabilidade da versão principal
+            score_fn (callable): score_fn(record, version) -> probabilidade
+            category_fn (callable): category_fn(prob, version) -> índice da categoria
+        """
+        shadows = [name for name in self.shadow if name != primary.name and name in self._versions]
+        if not shadows:
+            return
+        executor = self._shadow_executor()
+        primary_category = category_fn(primary_prob, primary)
+        for name in shadows:
+            version = self._versions[name]
+            if self._shadow_pending >= self.max_shadow_pending:
+                version.stats.record_shadow_dropped()
+                continue
+            with self._lock:
+                self._shadow_pending += 1
+            executor.submit(self._run_shadow, dict(record), version, primary_prob, primary_category,
+                            score_fn, category_fn)
+    
+    def _run_shadow(self, record, version, primary_prob, primary_category, score_fn, category_fn):
+        start = time.perf_counter()
+        try:
+            prob = float(score_fn(record, version))
+            version.stats.record_shadow((time.perf_counter() - start) * 1000, abs(prob - primary_prob),
+                                        category_fn(prob, version) != primary_category)
+        except Exception as e:
+            logger.warning(f"Erro na pontuação em shadow da versão {version.name}: {str(e)}")
+            version.stats.record_shadow(0.0, error=True)
+        finally:
+            with self._lock:
+                self._shadow_pending -= 1
+    
+    def load_async(self, loader, activate=False, description=None):
+        """
+        Carrega uma versão em segundo plano
+        
+        Args:
+            loader (callable): Função sem argumentos que retorna um ModelVersion
+            activate (bool): Ativa a versão assim que estiver carregada
+            description (str): Descrição da origem, exibida no status
+        
+        Returns:
+            int: Identificador do carregamento (ver `loads`)
+        """
+        with self._lock:
+            self._load_counter += 1
+            load_id = self._load_counter
+            self._loads[load_id] = {'id': load_id, 'source': description, 'status': 'loading',
+                                    'started_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+            while len(self._loads) > 20:
+                self._loads.popitem(last=False)
+        
+        def run():
+            start = time.perf_counter()
+            try:
+                version = loader()
+                self.register(version, activate=activate)
+                status = {'status': 'ready', 'version': version.name}
+            except Exception as e:
+                logger.error(f"Erro ao carregar versão do modelo ({description}): {str(e)}")
+                status = {'status': 'failed', 'error': str(e)}
+            status['seconds'] = time.perf_counter() - start
+            with self._lock:
+                if load_id in self._loads:
+                    self._loads[load_id].update(status)
+        
+        threading.Thread(target=run, name=f'model-load-{load_id}', daemon=True).start()
+        return load_id
+    
+    def loads(self):
+        with self._lock:
+            return [dict(load) for load in self._loads.values()]
+    
+    def describe(self):
+        """
+        Estado do registro: versões residentes, ativa, roteamento, shadow e métricas por versão
+        """
+        with self._lock:
+            versions = list(self._versions.values())
+            routing = self.routing
+        previous = 0.0
+        weights = {}
+        for name, cumulative in routing or ():
+            weights[name] = cumulative - previous
+            previous = cumulative
+        return {
+            'active': self.active.name if self.active else None,
+            'routing': weights or None,
+            'shadow': list(self.shadow),
+            'max_versions': self.max_versions,
+            'versions': [dict(version.describe(), stats=version.stats.snapshot()) for version in versions],
+            'loads': self.loads()
+        }
@@ -1,6 +1,9 @@
+import copy
+import warnings
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.exceptions import ConvergenceWarning
 import xgboost as xgb
 import logging
 
@@ -12,7 +15,7 @@ def train_decision_tree(X_train, y_train, **kwargs):
     Treina um modelo de Árvore de Decisão
     
     Args:
-        X_train (pd.DataFrame/np.array): Features de treino
+        X_train (pd.DataFrame/np.array/scipy.sparse): Features de treino (CSR aceito)
         y_train (pd.Series/np.array): Target de treino
         **kwargs: Parâmetros do modelo
     
@@ -42,7 +45,7 @@ def train_logistic_regression(X_train, y_train, **kwargs):
     Treina um modelo de Regressão Logística
     
     Args:
-        X_train (pd.DataFrame/np.array): Features de treino
+        X_train (pd.DataFrame/np.array/scipy.sparse): Features de treino (CSR aceito)
         y_train (pd.Series/np.array): Target de treino
         **kwargs: Parâmetros do modelo
     
@@ -73,7 +76,7 @@ def train_random_forest(X_train, y_train, **kwargs):
     Treina um modelo Random Forest
     
     Args:
-        X_train (pd.DataFrame/np.array): Features de treino
+        X_train (pd.DataFrame/np.array/scipy.sparse): Features de treino (CSR aceito)
         y_train (pd.Series/np.array): Target de treino
         **kwargs: Parâmetros do modelo
     
@@ -99,13 +102,16 @@ def train_random_forest(X_train, y_train, **kwargs):
     logger.info(f"Modelo Random Forest treinado com parâmetros: {params}")
     return model
 
-def train_xgboost(X_train, y_train, **kwargs):
+def train_xgboost(X_train, y_train, eval_set=None, **kwargs):
     """
     Treina um modelo XGBoost
     
     Args:
-        X_train (pd.DataFrame/np.array): Features de treino
+        X_train (pd.DataFrame/np.array/scipy.sparse): Features de treino (CSR aceito)
         y_train (pd.Series/np.array): Target de treino
+        eval_set (tuple): (X_val, y_val) monitorado durante o treino; com
+            early_stopping_rounds nos parâmetros, interrompe o treino quando
+            a métrica de validação para de melhorar
         **kwargs: Parâmetros do modelo
     
     Returns:
@@ -128,7 +134,69 @@ def train_xgboost(X_train, y_train, **kwargs):
     
     # Cria e treina o modelo
     model = xgb.XGBClassifier(**params)
-    model.fit(X_train, y_train)
+    if eval_set is not None:
+        model.fit(X_train, y_train, eval_set=[eval_set], verbose=False)
+    else:
+        model.fit(X_train, y_train)
     
     logger.info(f"Modelo XGBoost treinado com parâmetros: {params}")
     return model
+
+def continue_training(model, X_new, y_new, n_new_estimators=50, max_iter=50, eval_set=None):
+    """
+    Continua o treino de um modelo já treinado usando apenas os dados novos
+    
+    - XGBoost: adiciona `n_new_estimators` rodadas de boosting ao booster existente
+    - Random Forest: adiciona `n_new_estimators` árvores treinadas nos dados novos
+      (warm_start); as árvores antigas são mantidas
+    - Regressão Logística: parte dos coeficientes atuais (warm_start) e executa
+      no máximo `max_iter` iterações nos dados novos, uma atualização parcial
+    
+    O modelo original não é alterado.
+    
+    Args:
+        model: Modelo treinado (XGBClassifier, RandomForestClassifier ou LogisticRegression)
+        X_new (pd.DataFrame/np.array/scipy.sparse): Features dos dados novos
+        y_new (pd.Series/np.array): Target dos dados novos
+        n_new_estimators (int): Rodadas ou árvores adicionadas (XGBoost e Random Forest)
+        max_iter (int): Iterações da atualização parcial (Regressão Logística)
+        eval_set (tuple): (X_val, y_val) para o early stopping do XGBoost (opcional)
+    
+    Returns:
+        Modelo com o treino continuado
+    """
+    if isinstance(model, xgb.XGBClassifier):
+        params = model.get_params()
+        params['n_estimators'] = n_new_estimators
+        if eval_set is None:
+            params['early_stopping_rounds'] = None
+        updated = xgb.XGBClassifier(**params)
+        fit_kwargs = {'xgb_model': model.get_booster()}
+        if eval_set is not None:
+            fit_kwargs.update(eval_set=[eval_set], verbose=False)
+        updated.fit(X_new, y_new, **fit_kwargs)
+        logger.info(f"XGBoost continuado com {n_new_estimators} rodadas nos dados novos "
+                    f"({updated.get_booster().num_boosted_rounds()} rodadas no total)")
+        return updated
+    
+    if isinstance(model, RandomForestClassifier):
+        updated = copy.deepcopy(model)
+        updated.set_params(warm_start=True, n_estimators=model.n_estimators + n_new_estimators)
+        updated.fit(X_new, y_new)
+        updated.set_params(warm_start=False)
+        logger.info(f"Random Forest continuado com {n_new_estimators} árvores novas "
+                    f"({updated.n_estimators} árvores no total)")
+        return updated
+    
+    if isinstance(model, LogisticRegression):
+        updated = copy.deepcopy(model)
+        updated.set_params(warm_start=True, max_iter=max_iter)
+        with warnings.catch_warnings():
+            # A atualização parcial é limitada de propósito e pode não convergir
+            warnings.simplefilter('ignore', ConvergenceWarning)
+            updated.fit(X_new, y_new)
+        updated.set_params(warm_start=False, max_iter=model.max_iter)
+        logger.info(f"Regressão Logística atualizada com até {max_iter} iterações nos dados novos")
+        return updated
+    
+    raise ValueError(f"Treino incremental não suportado para {type(model).__name__}")
@@ -0,0 +1,606 @@
+import argparse
+import os
+import ast
+import sys
+import json
+import time
+import shutil
+import hashlib
+import inspect
+import weakref
+import pathlib
+import pandas as pd
+import joblib
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# O pyarrow é opcional: sem ele, os DataFrames são gravados com joblib
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+# Diretório do cache de etapas e limites da limpeza automática
+PIPELINE_CACHE_DIR = os.environ.get('PIPELINE_CACHE_DIR', './models/pipeline_cache')
+PIPELINE_CACHE_MAX_MB = float(os.environ.get('PIPELINE_CACHE_MAX_MB', 10240))
+PIPELINE_CACHE_MAX_AGE_DAYS = float(os.environ.get('PIPELINE_CACHE_MAX_AGE_DAYS', 30))
+
+META_FILE = 'meta.json'
+
+# Diretórios temporários de gravações interrompidas são removidos após este tempo (s)
+STALE_TMP_SECONDS = 3600
+
+_code_fingerprints = {}
+_file_fingerprints = {}
+
+def _project_imports(path):
+    """
+    Arquivos dos módulos do projeto (no mesmo diretório) importados por um arquivo-fonte
+    
+    Inclui os imports feitos dentro de funções, comuns nas etapas para evitar
+    dependências circulares.
+    """
+    directory = os.path.dirname(path)
+    with open(path, 'rb') as f:
+        tree = ast.parse(f.read(), filename=path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split('.')[0])
+    candidates = (os.path.join(directory, f'{name}.py') for name in names)
+    return [candidate for candidate in candidates if os.path.exists(candidate)]
+
+def code_fingerprint(fn):
+    """
+    Impressão digital do código de uma etapa
+    
+    Combina o arquivo-fonte inteiro do módulo da etapa e, transitivamente, o
+    dos módulos do projeto que ele importa (ex.: feature_engineering ->
+    derived_features, data_processing -> streaming_stats). Qualquer alteração
+    nesses arquivos invalida as entradas da etapa.
+    """
+    name = f'{fn.__module__}.{fn.__qualname__}'
+    fingerprint = _code_fingerprints.get(name)
+    if fingerprint is None:
+        digest = hashlib.sha256(name.encode('utf-8'))
+        try:
+            pending = [os.path.abspath(inspect.getsourcefile(fn))]
+        except TypeError:
+            pending = []
+            logger.warning(f"Código-fonte de {name} indisponível: alterações na etapa não invalidam o cache")
+        sources = set()
+        while pending:
+            path = pending.pop()
+            if path in sources:
+                continue
+            sources.add(path)
+            try:
+                pending.extend(os.path.abspath(dependency) for dependency in _project_imports(path))
+            except (OSError, SyntaxError) as e:
+                logger.warning(f"Dependências de {path} não identificadas: {str(e)}")
+        for path in sorted(sources):
+            try:
+                with open(path, 'rb') as f:
+                    digest.update(os.path.basename(path).encode('utf-8'))
+                    digest.update(f.read())
+            except OSError:
+                logger.warning(f"Código-fonte {path} indisponível: alterações nele não invalidam o cache")
+        fingerprint = _code_fingerprints[name] = digest.hexdigest()
+    return fingerprint
+
+def file_fingerprint(path):
+    """
+    Hash SHA-256 do conteúdo de um arquivo, memorizado por tamanho e data de modificação
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    fingerprint = _file_fingerprints.get(memo_key)
+    if fingerprint is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        fingerprint = _file_fingerprints[memo_key] = digest.hexdigest()
+    return fingerprint
+
+def _directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+class DeferredStage:
+    """
+    Etapa declarada, ainda não executada nem carregada
+    
+    A chave é calculada na criação; passada como argumento de outra etapa, a
+    etapa adiada entra na chave dela pela própria chave. O valor só é obtido
+    em result(): com a etapa final no cache, as intermediárias nem são lidas do
+    disco, e as que faltam são executadas a partir das entradas necessárias.
+    """
+    
+    def __init__(self, cache, stage, fn, args, kwargs):
+        self.cache = cache
+        self.stage = stage
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.key = cache.stage_key(stage, fn, args, kwargs) if cache.enabled else None
+        self._resolved = False
+        self._value = None
+    
+    def __getitem__(self, index):
+        return DeferredPart(self, index)
+    
+    def result(self):
+        if not self._resolved:
+            self._value = self.cache._resolve(self)
+            self._resolved = True
+        return self._value
+
+class DeferredPart:
+    """
+    Elemento de uma etapa adiada que retorna uma tupla (ex.: os conjuntos de split_data)
+    """
+    
+    def __init__(self, parent, index):
+        self.parent = parent
+        self.index = index
+        self.key = f'{parent.key}:{index}'
+    
+    def result(self):
+        return self.parent.result()[self.index]
+
+def _materialize(value):
+    return value.result() if isinstance(value, (DeferredStage, DeferredPart)) else value
+
+class PipelineCache:
+    """
+    Cache em disco, endereçado por conteúdo, dos resultados das etapas de preparação
+    
+    A chave de cada etapa combina o nome da etapa, o código do módulo que a
+    implementa, os parâmetros e a impressão digital das entradas. Resultados
+    produzidos pelo próprio cache carregam a chave da etapa que os gerou, de
+    modo que as etapas seguintes não recalculam o hash dos dados. Por isso, os
+    objetos retornados não devem ser modificados no lugar antes de serem
+    passados a outra etapa.
+    
+    DataFrames são gravados em Parquet (com pyarrow) e os demais resultados
+    (matrizes, preprocessadores) com joblib. A cada gravação, entradas sem
+    acesso há mais de `max_age_days` são removidas e, acima de `max_mb`, as
+    acessadas há mais tempo.
+    
+    Args:
+        directory (str): Diretório do cache
+        max_mb (float): Tamanho máximo do cache em MB (0 desativa o limite)
+        max_age_days (float): Idade máxima desde o último acesso (0 desativa o limite)
+        enabled (bool): Se False, as etapas são sempre executadas
+    """
+    
+    def __init__(self, directory=PIPELINE_CACHE_DIR, max_mb=PIPELINE_CACHE_MAX_MB,
+                 max_age_days=PIPELINE_CACHE_MAX_AGE_DAYS, enabled=True):
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1e6)
+        self.max_age_seconds = max_age_days * 86400
+        self.enabled = enabled
+        self._lineage = {}
+        self._stats = {'hits': 0, 'misses': 0, 'seconds_saved': 0.0, 'seconds_computing': 0.0}
+        if enabled:
+            os.makedirs(directory, exist_ok=True)
+    
+    def _remember(self, value, key):
+        """
+        Associa um resultado à chave da etapa que o gerou (enquanto o objeto existir)
+        """
+        try:
+            ref = weakref.ref(value, lambda _, obj_id=id(value): self._lineage.pop(obj_id, None))
+        except TypeError:
+            return
+        self._lineage[id(value)] = (ref, key)
+    
+    def fingerprint(self, value):
+        """
+        Impressão digital de uma entrada de etapa
+        
+        - Etapas adiadas e resultados de etapas anteriores: a chave da etapa
+        - pathlib.Path: o conteúdo do arquivo
+        - DataFrame/Series: colunas, dtypes, índice e valores
+        - Matrizes esparsas, arrays e demais objetos: joblib.hash
+        """
+        if isinstance(value, (DeferredStage, DeferredPart)):
+            return f'stage:{value.key}'
+        entry = self._lineage.get(id(value))
+        if entry is not None and entry[0]() is value:
+            return f'stage:{entry[1]}'
+        if isinstance(value, pathlib.PurePath):
+            return f'file:{file_fingerprint(value)}'
+        if isinstance(value, pd.DataFrame):
+            digest = hashlib.sha256(repr([(str(col), str(dtype)) for col, dtype in value.dtypes.items()]).encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+            return f'frame:{digest.hexdigest()}'
+        if isinstance(value, pd.Series):
+            digest = hashlib.sha256(repr((value.name, str(value.dtype))).encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+            return f'series:{digest.hexdigest()}'
+        if isinstance(value, (list, tuple)):
+            return f'{type(value).__name__}:[' + ','.join(self.fingerprint(item) for item in value) + ']'
+        if isinstance(value, dict):
+            return 'dict:{' + ','.join(f'{key!r}={self.fingerprint(item)}' for key, item
+                                       in sorted(value.items(), key=lambda pair: repr(pair[0]))) + '}'
+        if value is None or isinstance(value, (str, int, float, bool)):
+            return repr(value)
+        return f'object:{joblib.hash(value)}'
+    
+    def stage_key(self, stage, fn, args, kwargs):
+        """
+        Chave de uma execução de etapa (nome, código, argumentos posicionais e nomeados)
+        """
+        payload = json.dumps({
+            'stage': stage,
+            'code': code_fingerprint(fn),
+            'args': [self.fingerprint(value) for value in args],
+            'kwargs': {name: self.fingerprint(value) for name, value in sorted(kwargs.items())}
+        })
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+    
+    def _load(self, key):
+        """
+        Carrega uma entrada do cache
+        
+        Returns:
+            tuple: (encontrada, valor, metadados)
+        """
+        path = self._entry_path(key)
+        meta_path = os.path.join(path, META_FILE)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return False, None, None
+        try:
+            parts = [self._read_part(path, part) for part in meta['parts']]
+        except Exception as e:
+            logger.warning(f"Entrada {key[:12]} do cache ilegível, recalculando: {str(e)}")
+            shutil.rmtree(path, ignore_errors=True)
+            return False, None, None
+        # O horário de modificação do meta.json marca o último acesso (limpeza por idade e LRU)
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+        value = tuple(parts) if meta['is_tuple'] else parts[0]
+        return True, value, meta
+    
+    @staticmethod
+    def _read_part(path, part):
+        file_path = os.path.join(path, part['file'])
+        if part['format'] == 'parquet':
+            return pd.read_parquet(file_path)
+        return joblib.load(file_path)
+    
+    @staticmethod
+    def _write_part(value, path, index):
+        """
+        Grava uma parte do resultado, em Parquet quando possível
+        """
+        if isinstance(value, pd.DataFrame) and pq is not None:
+            file_name = f'part_{index}.parquet'
+            try:
+                value.to_parquet(os.path.join(path, file_name))
+                return {'file': file_name, 'format': 'parquet'}
+            except Exception as e:
+                logger.debug(f"DataFrame não gravável em Parquet, usando joblib: {str(e)}")
+        file_name = f'part_{index}.joblib'
+        joblib.dump(value, os.path.join(path, file_name))
+        return {'file': file_name, 'format': 'joblib'}
+    
+    def _store(self, key, stage, value, compute_seconds):
+        """
+        Grava uma entrada em um diretório temporário e a publica com rename atômico
+        """
+        final_path = self._entry_path(key)
+        tmp_path = os.path.join(self.directory, f'.tmp-{key[:16]}-{os.getpid()}-{time.monotonic_ns()}')
+        os.makedirs(tmp_path)
+        try:
+            is_tuple = isinstance(value, tuple)
+            parts = [self._write_part(part, tmp_path, i) for i, part in enumerate(value if is_tuple else (value,))]
+            meta = {
+                'key': key,
+                'stage': stage,
+                'created': time.time(),
+                'compute_seconds': compute_seconds,
+                'is_tuple': is_tuple,
+                'parts': parts,
+                'bytes': _directory_size(tmp_path)
+            }
+            with open(os.path.join(tmp_path, META_FILE), 'w') as f:
+                json.dump(meta, f, indent=2)
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            try:
+                os.rename(tmp_path, final_path)
+            except OSError:
+                # Outro processo publicou a mesma entrada primeiro
+                shutil.rmtree(tmp_path, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        return meta
+    
+    def defer(self, stage, fn, *args, **kwargs):
+        """
+        Declara uma etapa sem executá-la (veja DeferredStage)
+        
+        Args:
+            stage (str): Nome da etapa (ex.: 'missing_values')
+            fn (callable): Função da etapa
+            *args, **kwargs: Argumentos de `fn`, que podem ser outras etapas adiadas
+        
+        Returns:
+            DeferredStage: Etapa cujo valor é obtido com result()
+        """
+        return DeferredStage(self, stage, fn, args, kwargs)
+    
+    def run(self, stage, fn, *args, **kwargs):
+        """
+        Executa uma etapa ou reutiliza o resultado já gravado para as mesmas entradas
+        
+        Returns:
+            Resultado de `fn(*args, **kwargs)`
+        """
+        return self.defer(stage, fn, *args, **kwargs).result()
+    
+    def _resolve(self, deferred):
+        """
+        Carrega o resultado de uma etapa do cache ou a executa (resolvendo as etapas de entrada)
+        """
+        if not self.enabled:
+            return deferred.fn(*[_materialize(value) for value in deferred.args],
+                               **{name: _materialize(value) for name, value in deferred.kwargs.items()})
+        
+        key, stage = deferred.key, deferred.stage
+        found, value, meta = self._load(key)
+        if found:
+            self._stats['hits'] += 1
+            self._stats['seconds_saved'] += meta['compute_seconds']
+            logger.info(f"Etapa '{stage}' obtida do cache ({key[:12]}, {meta['compute_seconds']:.2f}s economizados)")
+        else:
+            self._stats['misses'] += 1
+            args = [_materialize(value) for value in deferred.args]
+            kwargs = {name: _materialize(value) for name, value in deferred.kwargs.items()}
+            start = time.perf_counter()
+            value = deferred.fn(*args, **kwargs)
+            compute_seconds = time.perf_counter() - start
+            self._stats['seconds_computing'] += compute_seconds
+            try:
+                meta = self._store(key, stage, value, compute_seconds)
+                logger.info(f"Etapa '{stage}' executada em {compute_seconds:.2f}s e gravada no cache "
+                            f"({key[:12]}, {meta['bytes'] / 1e6:.1f} MB)")
+                self.evict()
+            except Exception as e:
+                logger.warning(f"Não foi possível gravar a etapa '{stage}' no cache: {str(e)}")
+        
+        if isinstance(value, tuple):
+            for i, part in enumerate(value):
+                self._remember(part, f'{key}:{i}')
+        else:
+            self._remember(value, key)
+        return value
+    
+    def entries(self):
+        """
+        Lista as entradas do cache
+        
+        Returns:
+            pd.DataFrame: Chave, etapa, tamanho, criação e último acesso de cada entrada
+        """
+        rows = []
+        if not os.path.isdir(self.directory):
+            return pd.DataFrame(columns=['key', 'stage', 'bytes', 'created', 'last_access', 'compute_seconds', 'path'])
+        for prefix in os.listdir(self.directory):
+            prefix_path = os.path.join(self.directory, prefix)
+            if prefix.startswith('.') or not os.path.isdir(prefix_path):
+                continue
+            for key in os.listdir(prefix_path):
+                path = os.path.join(prefix_path, key)
+                meta_path = os.path.join(path, META_FILE)
+                try:
+                    with open(meta_path, 'r') as f:
+                        meta = json.load(f)
+                    last_access = os.path.getmtime(meta_path)
+                except (OSError, ValueError):
+                    continue
+                rows.append({'key': key, 'stage': meta.get('stage'), 'bytes': meta.get('bytes', 0),
+                             'created': meta.get('created'), 'last_access': last_access,
+                             'compute_seconds': meta.get('compute_seconds'), 'path': path})
+        return pd.DataFrame(rows, columns=['key', 'stage', 'bytes', 'created', 'last_access', 'compute_seconds', 'path'])
+    
+    def evict(self, max_mb=None, max_age_days=None):
+        """
+        Remove as entradas expiradas e, acima do limite de tamanho, as menos acessadas
+        
+        Args:
+            max_mb (float): Limite de tamanho (padrão: o do cache)
+            max_age_days (float): Idade máxima desde o último acesso (padrão: a do cache)
+        
+        Returns:
+            int: Número de entradas removidas
+        """
+        max_bytes = self.max_bytes if max_mb is None else int(max_mb * 1e6)
+        max_age_seconds = self.max_age_seconds if max_age_days is None else max_age_days * 86400
+        now = time.time()
+        
+        # Gravações interrompidas (processo encerrado no meio da etapa)
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                try:
+                    if name.startswith('.tmp-') and now - os.path.getmtime(path) > STALE_TMP_SECONDS:
+                        shutil.rmtree(path, ignore_errors=True)
+                except OSError:
+                    pass
+        
+        entries = self.entries().sort_values('last_access')
+        removed = []
+        if max_age_seconds > 0:
+            expired = entries['last_access'] < now - max_age_seconds
+            removed.extend(entries.loc[expired, 'path'])
+            entries = entries[~expired]
+        if max_bytes > 0:
+            excess = entries['bytes'].sum() - max_bytes
+            for path, size in zip(entries['path'], entries['bytes']):
+                if excess <= 0:
+                    break
+                removed.append(path)
+                excess -= size
+        for path in removed:
+            shutil.rmtree(path, ignore_errors=True)
+        if removed:
+            logger.info(f"{len(removed)} entradas removidas do cache de etapas")
+        return len(removed)
+    
+    def clear(self):
+        """
+        Remove todas as entradas do cache
+        """
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self._lineage.clear()
+        logger.info(f"Cache de etapas em {self.directory} esvaziado")
+    
+    def stats(self):
+        """
+        Acertos, falhas e tempo economizado neste processo
+        """
+        return dict(self._stats)
+
+def fit_preprocessor(X_train, X_val, X_test, numeric_strategy='median', scaler='standard', sparse_output=False):
+    """
+    Ajusta o ColumnTransformer no treino e transforma os três conjuntos
+    
+    Returns:
+        tuple: Preprocessador treinado e as matrizes de treino, validação e teste
+    """
+    from feature_engineering import identify_feature_types, create_preprocessing_pipeline
+    
+    numeric_cols, categorical_cols = identify_feature_types(X_train)
+    preprocessor = create_preprocessing_pipeline(numeric_cols, categorical_cols, numeric_strategy=numeric_strategy,
+                                                 scaler=scaler, sparse_output=sparse_output)
+    X_train_processed = preprocessor.fit_transform(X_train)
+    return preprocessor, X_train_processed, preprocessor.transform(X_val), preprocessor.transform(X_test)
+
+def handle_feature_outliers(df, target_column, method='iqr', columns=None):
+    """
+    handle_outliers sem tratar o target (por padrão, todas as numéricas exceto ele)
+    """
+    from data_processing import handle_outliers
+    
+    if columns is None:
+        columns = [col for col in df.columns if col != target_column and
+                   pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])]
+    return handle_outliers(df, method=method, columns=columns)
+
+def prepare_training_data(data, target_column, cache=None, schema=None, missing_strategy='median',
+                          outlier_method='iqr', outlier_columns=None, derived_features=True, test_size=0.2,
+                          validation_size=0.2, random_state=42, numeric_strategy='median', scaler='standard',
+                          sparse_output=False):
+    """
+    Prepara os dados de treino passando cada etapa pelo cache
+    
+    Etapas: leitura do CSV, valores faltantes, outliers, features derivadas,
+    divisão treino/validação/teste e ajuste do preprocessador. Ao repetir um
+    experimento só com outro modelo ou hiperparâmetros, apenas o resultado da
+    última etapa é lido do cache; mudar um parâmetro recalcula somente a etapa
+    afetada e as seguintes.
+    
+    Args:
+        data (str ou pd.DataFrame): Caminho do CSV (chave pelo conteúdo do arquivo) ou dados já carregados
+        target_column (str): Nome da coluna alvo
+        cache (PipelineCache): Cache usado (padrão: PIPELINE_CACHE_DIR)
+        schema (dict): Schema de dtypes compactos aplicado na leitura (opcional)
+        missing_strategy (str): Estratégia de handle_missing_values (None pula a etapa)
+        outlier_method (str): Método de handle_outliers (None pula a etapa)
+        outlier_columns (list): Colunas tratadas (padrão: numéricas, exceto o target)
+        derived_features (bool): Cria as features derivadas (create_new_features)
+        test_size, validation_size, random_state: Parâmetros de split_data
+        numeric_strategy, scaler, sparse_output: Parâmetros de create_preprocessing_pipeline
+    
+    Returns:
+        dict: Preprocessador, matrizes X_train/X_val/X_test pré-processadas,
+            y_train/y_val/y_test e 'split', a etapa de divisão adiada
+            (split[0].result() é o X_train antes do pré-processamento, lido do
+            cache só se for usado)
+    """
+    from data_processing import load_data_from_csv, handle_missing_values, split_data
+    from feature_engineering import create_new_features
+    
+    cache = cache or PipelineCache()
+    if isinstance(data, pd.DataFrame):
+        df = data
+    else:
+        df = cache.defer('load', load_data_from_csv, pathlib.Path(data), schema=schema)
+    if missing_strategy:
+        df = cache.defer('missing_values', handle_missing_values, df, strategy=missing_strategy)
+    if outlier_method:
+        df = cache.defer('outliers', handle_feature_outliers, df, target_column, method=outlier_method,
+                         columns=outlier_columns)
+    if derived_features:
+        df = cache.defer('features', create_new_features, df)
+    split = cache.defer('split', split_data, df, target_column, test_size=test_size,
+                        validation_size=validation_size, random_state=random_state)
+    processed = cache.defer('preprocessor', fit_preprocessor, split[0], split[1], split[2],
+                            numeric_strategy=numeric_strategy, scaler=scaler, sparse_output=sparse_output)
+    
+    preprocessor, X_train, X_val, X_test = processed.result()
+    y_train, y_val, y_test = split[3].result(), split[4].result(), split[5].result()
+    
+    stats = cache.stats()
+    logger.info(f"Preparação concluída: {stats['hits']} etapas do cache, {stats['misses']} executadas "
+                f"({stats['seconds_saved']:.1f}s economizados)")
+    return {
+        'preprocessor': preprocessor,
+        'X_train': X_train,
+        'X_val': X_val,
+        'X_test': X_test,
+        'y_train': y_train,
+        'y_val': y_val,
+        'y_test': y_test,
+        'split': split
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Manutenção do cache de etapas da preparação de dados')
+    parser.add_argument('--dir', default=PIPELINE_CACHE_DIR)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='lista as entradas')
+    evict = subparsers.add_parser('evict', help='remove entradas expiradas ou acima do limite de tamanho')
+    evict.add_argument('--max-mb', type=float, default=PIPELINE_CACHE_MAX_MB)
+    evict.add_argument('--max-age-days', type=float, default=PIPELINE_CACHE_MAX_AGE_DAYS)
+    subparsers.add_parser('clear', help='remove todas as entradas')
+    args = parser.parse_args()
+    
+    cache = PipelineCache(args.dir)
+    if args.command == 'list':
+        entries = cache.entries().sort_values('last_access', ascending=False)
+        entries['mb'] = entries['bytes'] / 1e6
+        entries['key'] = entries['key'].str[:12]
+        print(entries[['key', 'stage', 'mb', 'compute_seconds']].to_string(index=False))
+        print(f"Total: {entries['mb'].sum():.1f} MB em {len(entries)} entradas", file=sys.stderr)
+    elif args.command == 'evict':
+        cache.evict(max_mb=args.max_mb, max_age_days=args.max_age_days)
+    else:
+        cache.clear()
+
+if __name__ == '__main__':
+    main()
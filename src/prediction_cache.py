@@ -0,0 +1,179 @@
+import os
+import json
+import math
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def _canonical_value(value):
+    """
+    Normaliza um valor para que representações equivalentes gerem a mesma chave
+    """
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        value = float(value)
+        # NaN recebe um marcador próprio: em colunas categóricas ele é imputado,
+        # enquanto None é tratado como categoria desconhecida
+        return ['NaN'] if math.isnan(value) else value
+    return str(value)
+
+def canonical_features_key(data, feature_names):
+    """
+    Gera um hash estável dos valores das features de um solicitante
+    
+    Apenas as features de `feature_names` entram na chave, na ordem da
+    configuração; 30 e 30.0 geram a mesma chave.
+    
+    Args:
+        data (dict): Dados do solicitante
+        feature_names (list): Features usadas pelo modelo
+    
+    Returns:
+        str: Hash SHA-256 (hex) dos valores canonicalizados
+    """
+    values = [_canonical_value(data.get(feature)) for feature in feature_names]
+    payload = json.dumps(values, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def artifact_version(paths, extra=None):
+    """
+    Calcula a versão dos artefatos carregados a partir do conteúdo dos arquivos
+    
+    Args:
+        paths (list): Caminhos dos artefatos (modelo, preprocessador, configuração)
+        extra (str): Texto adicional incluído no hash (ex.: versão declarada na configuração)
+    
+    Returns:
+        str: Hash curto que muda sempre que algum artefato muda
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    if extra:
+        digest.update(str(extra).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def file_signature(paths):
+    """
+    Assinatura barata (mtime e tamanho) dos arquivos, usada para detectar mudanças
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+class PredictionCache:
+    """
+    Cache LRU com expiração (TTL) para probabilidades de predição
+    
+    As chaves combinam a versão do modelo com o hash das features, e o cache é
+    esvaziado sempre que a versão muda. Apenas a probabilidade é armazenada: a
+    categoria é recalculada com o threshold vigente a cada requisição.
+    
+    Args:
+        max_size (int): Número máximo de entradas
+        ttl_seconds (float): Tempo de vida de cada entrada (0 = sem expiração)
+    """
+    
+    def __init__(self, max_size=10000, ttl_seconds=3600):
+        self.max_size = int(max_size)
+        self.ttl = float(ttl_seconds)
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def make_key(self, data, feature_names, version=None):
+        # Com roteamento A/B a versão que pontua pode não ser a ativa
+        return f'{version or self.version}:{canonical_features_key(data, feature_names)}'
+    
+    def get(self, key):
+        """
+        Retorna o valor em cache ou None (conta acerto/falha)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+    
+    def invalidate_version(self, version):
+        """
+        Remove as entradas de uma versão (descarregada ou substituída no registro)
+        """
+        prefix = f'{version}:'
+        with self._lock:
+            stale = [key for key in self._entries if key.startswith(prefix)]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self.invalidations += 1
+        if stale:
+            logger.info(f"{len(stale)} predições em cache da versão {version} invalidadas")
+    
+    def set_version(self, version):
+        """
+        Define a versão dos artefatos; uma versão diferente invalida o cache inteiro
+        """
+        if version != self.version:
+            if self.version is not None:
+                logger.info(f"Versão do modelo mudou ({self.version} -> {version}), cache de predições invalidado")
+            self.clear()
+            self.version = version
+    
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            'version': self.version,
+            'size': size,
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations
+        }
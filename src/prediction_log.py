@@ -0,0 +1,436 @@
+import argparse
+import os
+import glob
+import json
+import time
+import queue
+import atexit
+import threading
+import numpy as np
+import pandas as pd
+import joblib
+from prediction_cache import canonical_features_key
+from derived_features import FeatureEngine
+from data_processing import load_cleaning_stats, apply_cleaning_stats
+import logging
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Colunas fixas do log; as features entram como colunas FEATURE_PREFIX + nome
+LOG_COLUMNS = ['timestamp', 'endpoint', 'model_version', 'input_hash', 'risk_probability', 'risk_category', 'latency_ms']
+FEATURE_PREFIX = 'feature_'
+# Sufixo dos arquivos ainda em escrita (ignorados na leitura)
+PARTIAL_SUFFIX = '.part'
+
+class PredictionLogger:
+    """
+    Log estruturado de predições, escrito por uma thread em segundo plano
+    
+    O caminho da requisição apenas enfileira uma tupla; a thread de escrita
+    acumula até `batch_size` predições (ou `flush_interval` segundos), calcula
+    o hash das entradas e grava o lote em formato colunar: um row group por
+    lote em Parquet (requer pyarrow) ou linhas acrescentadas em CSV. Os
+    arquivos são rotacionados por número de linhas, idade ou mudança das
+    colunas, e só recebem o nome final ao serem fechados.
+    
+    Args:
+        directory (str): Diretório dos arquivos de log
+        file_format (str): 'parquet', 'csv' ou 'auto' (Parquet se o pyarrow estiver instalado)
+        batch_size (int): Predições por escrita
+        flush_interval (float): Tempo máximo (s) que uma predição espera na fila
+        max_file_rows (int): Linhas por arquivo antes da rotação
+        max_file_seconds (float): Idade máxima (s) de um arquivo antes da rotação
+        max_files (int): Arquivos mantidos no diretório (0 = sem limite); os mais antigos são removidos
+        max_queue_size (int): Tamanho da fila; com ela cheia, as predições são descartadas e contadas
+    """
+    
+    def __init__(self, directory, file_format='auto', batch_size=1000, flush_interval=1.0, max_file_rows=100000,
+                 max_file_seconds=3600, max_files=0, max_queue_size=100000):
+        if file_format == 'auto':
+            file_format = 'parquet' if pq is not None else 'csv'
+        if file_format == 'parquet' and pq is None:
+            raise ImportError('O pacote pyarrow é necessário para o log de predições em Parquet')
+        if file_format not in ('parquet', 'csv'):
+            raise ValueError(f"Formato de log não suportado: {file_format}")
+        self.directory = directory
+        self.file_format = file_format
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.max_file_rows = int(max_file_rows)
+        self.max_file_seconds = float(max_file_seconds)
+        self.max_files = int(max_files)
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._sequence = 0
+        self._file = None
+        self.logged = 0
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.files = 0
+        os.makedirs(directory, exist_ok=True)
+    
+    def _ensure_started(self):
+        # A thread é criada sob demanda em cada processo, pois não sobrevive a um fork
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._file = None
+                self._thread = threading.Thread(target=self._run, name='prediction-log', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+                atexit.register(self.close)
+    
+    def log(self, endpoint, model_version, features, risk_probability, risk_category, latency_ms,
+            feature_names=None):
+        """
+        Enfileira uma predição individual (não bloqueia)
+        
+        Args:
+            endpoint (str): Endpoint que atendeu a requisição
+            model_version (str): Versão que pontuou
+            features (dict): Features de entrada do solicitante
+            risk_probability (float): Probabilidade de alto risco
+            risk_category (str): Categoria de risco
+            latency_ms (float): Latência da predição
+            feature_names (list): Features usadas no hash das entradas (padrão: as chaves de `features`)
+        """
+        self._put(('record', time.time(), endpoint, model_version, features, float(risk_probability),
+                   risk_category, latency_ms, feature_names))
+    
+    def log_batch(self, endpoint, model_version, features_df, risk_probabilities, risk_categories, latency_ms,
+                  feature_names=None):
+        """
+        Enfileira um lote já colunar como um único item da fila
+        
+        Args:
+            features_df (pd.DataFrame): Dados de entrada, uma linha por predição; as
+                colunas de `feature_names` são selecionadas na thread de escrita
+            risk_probabilities (np.array): Probabilidades (NaN nas linhas com erro)
+            risk_categories (np.array): Categoria de cada linha
+            latency_ms (float): Latência total do lote
+        """
+        self._put(('batch', time.time(), endpoint, model_version, features_df, np.asarray(risk_probabilities),
+                   risk_categories, latency_ms, feature_names))
+    
+    def _put(self, item):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(item)
+            self.logged += 1
+        except queue.Full:
+            self.dropped += 1
+    
+    def _collect(self):
+        """
+        Coleta até batch_size itens, esperando no máximo flush_interval a partir do primeiro
+        """
+        try:
+            items = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(items) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                items.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+    
+    def _run(self):
+        while True:
+            items = self._collect()
+            stop = any(item is None for item in items)
+            items = [item for item in items if item is not None]
+            try:
+                if items:
+                    self._write(self._to_frame(items))
+                if self._file is not None and (stop or self._file_expired()):
+                    self._close_file()
+            except Exception as e:
+                self.write_errors += 1
+                logger.error(f"Erro ao gravar o log de predições: {str(e)}")
+            if stop:
+                return
+    
+    def _to_frame(self, items):
+        """
+        Converte os itens da fila em um DataFrame colunar
+        """
+        frames, records, rows = [], [], []
+        for kind, timestamp, endpoint, model_version, features, probability, category, latency_ms, names in items:
+            if kind == 'batch':
+                if rows:
+                    frames.append(self._records_frame(rows, records))
+                    rows, records = [], []
+                names = names or list(features.columns)
+                feature_frame = features[names].reset_index(drop=True)
+                category = np.where(np.isnan(probability), None, category)
+                hashes = [canonical_features_key(record, names) for record in feature_frame.to_dict('records')]
+                frame = pd.DataFrame({
+                    'timestamp': timestamp,
+                    'endpoint': endpoint,
+                    'model_version': model_version,
+                    'input_hash': hashes,
+                    'risk_probability': probability,
+                    'risk_category': list(category),
+                    'latency_ms': latency_ms
+                })
+                frames.append(pd.concat([frame, feature_frame.add_prefix(FEATURE_PREFIX)], axis=1))
+            else:
+                hashed = canonical_features_key(features, names or list(features))
+                rows.append((timestamp, endpoint, model_version, hashed, probability, category, latency_ms))
+                records.append(features)
+        if rows:
+            frames.append(self._records_frame(rows, records))
+        frame = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        frame['timestamp'] = pd.to_datetime(frame['timestamp'], unit='s', utc=True)
+        return frame
+    
+    def _records_frame(self, rows, records):
+        frame = pd.DataFrame(rows, columns=LOG_COLUMNS)
+        return pd.concat([frame, pd.DataFrame.from_records(records).add_prefix(FEATURE_PREFIX)], axis=1)
+    
+    def _file_expired(self):
+        return (self._file['rows'] >= self.max_file_rows or
+                time.monotonic() - self._file['opened'] >= self.max_file_seconds)
+    
+    def _open_file(self, columns):
+        self._sequence += 1
+        name = f"predictions-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._sequence:06d}.{self.file_format}"
+        path = os.path.join(self.directory, name)
+        self._file = {'path': path, 'columns': columns, 'rows': 0, 'opened': time.monotonic(), 'writer': None}
+    
+    def _close_file(self):
+        current, self._file = self._file, None
+        if current['writer'] is not None:
+            current['writer'].close()
+        if current['rows']:
+            os.replace(current['path'] + PARTIAL_SUFFIX, current['path'])
+            self.files += 1
+            self._apply_retention()
+    
+    def _write(self, frame):
+        columns = list(frame.columns)
+        if self._file is not None and self._file['columns'] != columns:
+            # Versões com features diferentes vão para arquivos diferentes
+            self._close_file()
+        if self._file is None:
+            self._open_file(columns)
+        partial_path = self._file['path'] + PARTIAL_SUFFIX
+        if self.file_format == 'parquet':
+            table = self._to_table(frame)
+            if self._file['writer'] is not None and not table.schema.equals(self._file['writer'].schema):
+                self._close_file()
+                self._open_file(columns)
+                partial_path = self._file['path'] + PARTIAL_SUFFIX
+            if self._file['writer'] is None:
+                self._file['writer'] = pq.ParquetWriter(partial_path, table.schema)
+            self._file['writer'].write_table(table)
+        else:
+            frame.to_csv(partial_path, mode='a', header=self._file['rows'] == 0, index=False)
+        self._file['rows'] += len(frame)
+        self.written += len(frame)
+        if self._file_expired():
+            self._close_file()
+    
+    def _to_table(self, frame):
+        writer = self._file['writer']
+        try:
+            return pa.Table.from_pandas(frame, schema=writer.schema if writer is not None else None,
+                                        preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Colunas com tipos misturados (ex.: número e texto) são gravadas como texto
+            frame = frame.copy()
+            for column in frame.columns:
+                if frame[column].dtype == object:
+                    frame[column] = frame[column].map(lambda value: None if value is None else str(value))
+            return pa.Table.from_pandas(frame, preserve_index=False)
+    
+    def _apply_retention(self):
+        if self.max_files <= 0:
+            return
+        for path in list_log_files(self.directory)[:-self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    def close(self, timeout=10):
+        """
+        Grava as predições pendentes e fecha o arquivo atual
+        """
+        if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("Fila do log de predições cheia ao encerrar; predições pendentes descartadas")
+            return
+        self._thread.join(timeout)
+    
+    def stats(self):
+        return {
+            'directory': self.directory,
+            'format': self.file_format,
+            'queue_size': self._queue.qsize(),
+            'logged': self.logged,
+            'written': self.written,
+            'dropped': self.dropped,
+            'write_errors': self.write_errors,
+            'files': self.files
+        }
+
+def list_log_files(directory):
+    """
+    Arquivos de log fechados, do mais antigo ao mais recente
+    """
+    paths = glob.glob(os.path.join(directory, 'predictions-*.parquet'))
+    paths += glob.glob(os.path.join(directory, 'predictions-*.csv'))
+    return sorted(paths, key=lambda path: (os.path.getmtime(path), path))
+
+def read_prediction_log(directory, start=None, end=None, model_version=None, columns=None):
+    """
+    Lê o log de predições de um diretório
+    
+    Args:
+        directory (str): Diretório dos arquivos de log
+        start, end (str ou pd.Timestamp): Intervalo de tempo (opcional, UTC)
+        model_version (str): Filtra por versão do modelo (opcional)
+        columns (list): Colunas lidas (opcional; o Parquet lê só essas colunas)
+    
+    Returns:
+        pd.DataFrame: Predições registradas, em ordem de gravação
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(list(columns) + ['timestamp', 'model_version']))
+    frames = []
+    for path in list_log_files(directory):
+        if path.endswith('.parquet'):
+            frame = pd.read_parquet(path, columns=columns)
+        else:
+            frame = pd.read_csv(path, usecols=columns)
+            frame['timestamp'] = pd.to_datetime(frame['timestamp'], utc=True)
+        if start is not None:
+            frame = frame[frame['timestamp'] >= pd.Timestamp(start, tz='UTC')]
+        if end is not None:
+            frame = frame[frame['timestamp'] < pd.Timestamp(end, tz='UTC')]
+        if model_version is not None:
+            frame = frame[frame['model_version'].astype(str) == str(model_version)]
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=LOG_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+def replay_predictions(log, model, preprocessor, feature_engine=None, threshold=0.5, cleaning_stats=None):
+    """
+    Pontua novamente as entradas registradas e compara com as predições originais
+    
+    Args:
+        log (pd.DataFrame): Resultado de read_prediction_log
+        model: Modelo usado na nova pontuação
+        preprocessor: Preprocessador do modelo
+        feature_engine (FeatureEngine): Features derivadas (opcional)
+        threshold (float): Threshold para a categoria da nova pontuação
+        cleaning_stats (dict): Estatísticas de limpeza do treinamento (opcional)
+    
+    Returns:
+        tuple: DataFrame com a probabilidade original e a nova de cada linha e
+            resumo (dict) com as diferenças
+    """
+    log = log[log['risk_probability'].notna()].reset_index(drop=True)
+    features = log[[column for column in log.columns if column.startswith(FEATURE_PREFIX)]]
+    features.columns = [column[len(FEATURE_PREFIX):] for column in features.columns]
+    # Valores ausentes em colunas de texto chegaram como null no JSON (categoria desconhecida),
+    # mas a leitura do arquivo os devolve como NaN (valor imputado)
+    features = features.astype({column: object for column in features.columns
+                                if not pd.api.types.is_numeric_dtype(features[column])})
+    features = features.where(features.notna() | features.apply(pd.api.types.is_numeric_dtype), None)
+    if cleaning_stats is not None:
+        features = apply_cleaning_stats(features, cleaning_stats)
+    if feature_engine is not None:
+        features = feature_engine.transform_frame(features)
+    replayed = model.predict_proba(preprocessor.transform(features))[:, 1]
+    result = pd.DataFrame({
+        'timestamp': log['timestamp'],
+        'model_version': log['model_version'],
+        'input_hash': log['input_hash'],
+        'logged_probability': log['risk_probability'],
+        'replayed_probability': replayed
+    })
+    abs_diff = np.abs(result['replayed_probability'] - result['logged_probability'])
+    logged_high = result['logged_probability'].to_numpy() >= threshold
+    summary = {
+        'rows': int(len(result)),
+        'mean_abs_diff': float(abs_diff.mean()) if len(result) else None,
+        'max_abs_diff': float(abs_diff.max()) if len(result) else None,
+        'category_changes': int(np.sum(logged_high != (replayed >= threshold))),
+        'logged_high_risk_rate': float(logged_high.mean()) if len(result) else None,
+        'replayed_high_risk_rate': float(np.mean(replayed >= threshold)) if len(result) else None
+    }
+    return result, summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Leitura e replay do log de predições')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    summary_parser = subparsers.add_parser('summary', help='Resumo das predições registradas')
+    summary_parser.add_argument('--log-dir', required=True)
+    summary_parser.add_argument('--start')
+    summary_parser.add_argument('--end')
+    
+    replay_parser = subparsers.add_parser('replay', help='Pontua novamente as entradas registradas')
+    replay_parser.add_argument('--log-dir', required=True)
+    replay_parser.add_argument('--start')
+    replay_parser.add_argument('--end')
+    replay_parser.add_argument('--model-version', help='Reexecuta apenas as predições desta versão')
+    replay_parser.add_argument('--model', default='./models/trained_models/best_model.joblib')
+    replay_parser.add_argument('--preprocessor', default='./models/trained_models/preprocessor.joblib')
+    replay_parser.add_argument('--config', default='./models/trained_models/config.json')
+    replay_parser.add_argument('--cleaning-stats', help='Estatísticas de limpeza usadas pela API (opcional)')
+    replay_parser.add_argument('--output', help='CSV com a comparação linha a linha')
+    args = parser.parse_args()
+    
+    if args.command == 'summary':
+        log = read_prediction_log(args.log_dir, args.start, args.end)
+        summary = {
+            'rows': int(len(log)),
+            'files': len(list_log_files(args.log_dir)),
+            'start': str(log['timestamp'].min()) if len(log) else None,
+            'end': str(log['timestamp'].max()) if len(log) else None,
+            'by_model_version': log['model_version'].astype(str).value_counts().to_dict(),
+            'by_risk_category': log['risk_category'].astype(str).value_counts().to_dict(),
+            'latency_ms_p50': float(log['latency_ms'].quantile(0.5)) if len(log) else None,
+            'latency_ms_p99': float(log['latency_ms'].quantile(0.99)) if len(log) else None
+        }
+        print(json.dumps(summary, indent=2))
+        return
+    
+    config = {}
+    if os.path.exists(args.config):
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+    engine = FeatureEngine.from_config(config['derived_features']) if 'derived_features' in config else FeatureEngine()
+    log = read_prediction_log(args.log_dir, args.start, args.end, args.model_version)
+    cleaning_stats = load_cleaning_stats(args.cleaning_stats) if args.cleaning_stats else None
+    result, summary = replay_predictions(log, joblib.load(args.model), joblib.load(args.preprocessor), engine,
+                                         config.get('threshold', 0.5), cleaning_stats)
+    if args.output:
+        result.to_csv(args.output, index=False)
+    print(json.dumps(summary, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import threading
+import logging
+from werkzeug.serving import make_server
+
+import api
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Configurações do servidor pre-fork
+HOST = os.environ.get('HOST', '0.0.0.0')
+PORT = int(os.environ.get('PORT', 5000))
+WORKERS = int(os.environ.get('WORKERS', os.cpu_count() or 1))
+WORKER_THREADED = os.environ.get('WORKER_THREADED', '1') == '1'
+GRACEFUL_TIMEOUT = float(os.environ.get('GRACEFUL_TIMEOUT', 30))
+LISTEN_BACKLOG = int(os.environ.get('LISTEN_BACKLOG', 2048))
+
+def create_listener(host, port, backlog=LISTEN_BACKLOG):
+    """
+    Cria o socket de escuta compartilhado por todos os workers
+    
+    Args:
+        host (str): Endereço de escuta
+        port (int): Porta de escuta
+        backlog (int): Tamanho da fila de conexões pendentes
+    
+    Returns:
+        socket.socket: Socket já em modo de escuta
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def freeze_shared_memory():
+    """
+    Move os objetos já carregados para a geração permanente do coletor de lixo
+    
+    Sem isso, cada ciclo do gc nos workers escreveria nos cabeçalhos dos objetos
+    herdados do processo mestre e forçaria a cópia (copy-on-write) das páginas do
+    modelo. Os buffers NumPy das árvores não são tocados pela contagem de
+    referências e continuam compartilhados entre os workers.
+    """
+    gc.collect()
+    gc.freeze()
+
+def run_worker(sock):
+    """
+    Executa um worker: atende requisições no socket herdado até receber SIGTERM
+    
+    O SIGTERM encerra o worker de forma graciosa: ele para de aceitar novas
+    conexões e termina as requisições em andamento antes de sair.
+    """
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    
+    server = make_server(HOST, PORT, api.app, threaded=WORKER_THREADED, fd=sock.fileno())
+    if WORKER_THREADED:
+        # Aguarda as threads de requisição em andamento no server_close
+        server.daemon_threads = False
+        server.block_on_close = True
+    
+    def handle_sigterm(signum, frame):
+        # shutdown() bloqueia até o fim do serve_forever, por isso roda em outra thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+    
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    logger.info(f"Worker {os.getpid()} atendendo em {HOST}:{PORT}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        logger.info(f"Worker {os.getpid()} encerrado")
+
+class PreforkServer:
+    """
+    Servidor pre-fork: carrega os artefatos uma vez no processo mestre e cria N workers
+    
+    Sinais tratados pelo processo mestre:
+        - SIGHUP: recarrega os artefatos, cria uma nova geração de workers e
+          encerra a geração anterior de forma graciosa (sem derrubar requisições)
+        - SIGTERM/SIGINT: encerra todos os workers de forma graciosa e sai
+    """
+    
+    def __init__(self, workers=WORKERS, host=HOST, port=PORT):
+        self.workers = max(1, int(workers))
+        self.host = host
+        self.port = port
+        self.sock = None
+        self.generation = 0
+        self.children = {}
+        self.reload_requested = False
+        self.stop_requested = False
+    
+    def spawn_worker(self):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                run_worker(self.sock)
+            except Exception as e:
+                logger.error(f"Erro no worker {os.getpid()}: {str(e)}")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        self.children[pid] = self.generation
+        return pid
+    
+    def spawn_generation(self):
+        freeze_shared_memory()
+        for _ in range(self.workers):
+            self.spawn_worker()
+        logger.info(f"Geração {self.generation}: {self.workers} workers iniciados")
+    
+    def stop_workers(self, pids, timeout=GRACEFUL_TIMEOUT):
+        """
+        Envia SIGTERM aos workers e força o encerramento após o timeout
+        """
+        for pid in pids:
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + timeout
+        remaining = set(pids)
+        while remaining and time.monotonic() < deadline:
+            self.reap_workers()
+            remaining &= set(self.children)
+            time.sleep(0.1)
+        for pid in remaining:
+            logger.warning(f"Worker {pid} não encerrou em {timeout}s, enviando SIGKILL")
+            self._signal(pid, signal.SIGKILL)
+    
+    @staticmethod
+    def _signal(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+    
+    def reap_workers(self):
+        """
+        Coleta workers encerrados e retorna os que pertenciam à geração atual
+        """
+        lost = []
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            generation = self.children.pop(pid, None)
+            if generation == self.generation:
+                lost.append((pid, status))
+        return lost
+    
+    def reload(self):
+        """
+        Recarrega os artefatos e troca a geração de workers sem indisponibilidade
+        """
+        logger.info("Recarregando artefatos")
+        if not api.load_artifacts():
+            logger.error("Falha ao recarregar os artefatos, mantendo os workers atuais")
+            return
+        old_pids = list(self.children)
+        self.generation += 1
+        self.spawn_generation()
+        self.stop_workers(old_pids)
+    
+    def run(self):
+        if not hasattr(os, 'fork'):
+            raise RuntimeError('O modo pre-fork requer um sistema POSIX (os.fork)')
+        
+        self.sock = create_listener(self.host, self.port)
+        signal.signal(signal.SIGHUP, lambda signum, frame: setattr(self, 'reload_requested', True))
+        signal.signal(signal.SIGTERM, lambda signum, frame: setattr(self, 'stop_requested', True))
+        signal.signal(signal.SIGINT, lambda signum, frame: setattr(self, 'stop_requested', True))
+        
+        logger.info(f"Servidor pre-fork (pid {os.getpid()}) escutando em {self.host}:{self.port}")
+        self.spawn_generation()
+        
+        while not self.stop_requested:
+            if self.reload_requested:
+                self.reload_requested = False
+                self.reload()
+            for pid, status in self.reap_workers():
+                logger.warning(f"Worker {pid} saiu inesperadamente (status {status}), reiniciando")
+                self.spawn_worker()
+            time.sleep(0.2)
+        
+        logger.info("Encerrando workers")
+        self.stop_workers(list(self.children))
+        self.sock.close()
+
+if __name__ == '__main__':
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else WORKERS
+    PreforkServer(workers=workers).run()
@@ -0,0 +1,300 @@
+import numpy as np
+import pandas as pd
+from collections import Counter
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class QuantileSketch:
+    """
+    Sketch de quantis mesclável, no estilo KLL, com memória limitada
+    
+    Os valores ficam em níveis; um item no nível h representa 2**h valores
+    originais. Quando um nível excede `k` itens, ele é ordenado e metade dos
+    itens (posições pares ou ímpares, escolhidas ao acaso) sobe para o nível
+    seguinte. Enquanto nenhum nível foi compactado os quantis são exatos, com a
+    mesma interpolação linear do pandas.
+    
+    Args:
+        k (int): Capacidade de cada nível (maior = mais preciso)
+        seed (int): Semente usada na escolha das posições compactadas
+    """
+    
+    def __init__(self, k=2048, seed=0):
+        self.k = int(k)
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+    
+    def update(self, values):
+        """
+        Adiciona um bloco de valores (NaN são ignorados)
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+    
+    def merge(self, other):
+        """
+        Incorpora outro sketch (ex.: calculado em outro bloco ou processo)
+        """
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+    
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) > self.k:
+                items = np.sort(items)
+                # Com número ímpar de itens, um deles permanece no nível atual
+                keep = items[:1] if len(items) % 2 else items[:0]
+                paired = items[len(keep):]
+                promoted = paired[self._rng.integers(2)::2]
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            h += 1
+    
+    @property
+    def is_exact(self):
+        return len(self.levels) == 1
+    
+    def quantile(self, q):
+        """
+        Estima o quantil q (0 a 1) dos valores vistos
+        
+        Returns:
+            float: Quantil estimado, ou NaN se nenhum valor foi visto
+        """
+        if self.count == 0:
+            return np.nan
+        if self.is_exact:
+            return float(np.quantile(self.levels[0], q))
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        value = float(items[order][min(position, len(items) - 1)])
+        return min(max(value, self.min), self.max)
+
+class RunningMoments:
+    """
+    Média e variância em uma passada, mescláveis (algoritmo de Chan/Welford)
+    """
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+    
+    def update(self, values):
+        """
+        Adiciona um bloco de valores (NaN são ignorados)
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        other = RunningMoments()
+        other.count = len(values)
+        other.mean = float(values.mean())
+        other.m2 = float(((values - other.mean) ** 2).sum())
+        return self.merge(other)
+    
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / total
+        self.count = total
+        return self
+    
+    def std(self, ddof=1):
+        if self.count - ddof <= 0:
+            return np.nan
+        return float(np.sqrt(self.m2 / (self.count - ddof)))
+
+class FrequentItems:
+    """
+    Contagem aproximada dos valores mais frequentes (Misra-Gries), mesclável
+    
+    Enquanto o número de valores distintos não passa de `capacity` as contagens
+    são exatas; acima disso, valores com frequência maior que n/capacity
+    continuam garantidos no resumo, com contagens subestimadas em até `error`.
+    
+    Args:
+        capacity (int): Número máximo de valores distintos mantidos
+    """
+    
+    def __init__(self, capacity=10000):
+        self.capacity = int(capacity)
+        self.counts = Counter()
+        self.is_exact = True
+        self.error = 0
+    
+    def update(self, values):
+        """
+        Adiciona um bloco de valores (faltantes são ignorados)
+        """
+        counts = pd.Series(values).value_counts(dropna=True)
+        self.counts.update(dict(zip(counts.index.tolist(), counts.tolist())))
+        self._reduce()
+        return self
+    
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.is_exact = self.is_exact and other.is_exact
+        self.error += other.error
+        self._reduce()
+        return self
+    
+    def _reduce(self):
+        if len(self.counts) <= self.capacity:
+            return
+        threshold = sorted(self.counts.values(), reverse=True)[self.capacity]
+        self.counts = Counter({value: count - threshold for value, count in self.counts.items()
+                               if count > threshold})
+        self.is_exact = False
+        self.error += threshold
+    
+    def mode(self):
+        """
+        Valor mais frequente; em caso de empate, o menor (como pd.Series.mode)
+        
+        Com contagens aproximadas, retorna None quando nenhum valor é
+        garantidamente o mais frequente.
+        """
+        if not self.counts:
+            return None
+        ranked = sorted(self.counts.values(), reverse=True)
+        top = ranked[0]
+        if not self.is_exact:
+            runner_up = ranked[1] if len(ranked) > 1 else 0
+            if top <= runner_up + self.error:
+                return None
+        candidates = [value for value, count in self.counts.items() if count == top]
+        try:
+            return sorted(candidates)[0]
+        except TypeError:
+            return candidates[0]
+
+class ColumnStatistics:
+    """
+    Acumula, em uma única passada por blocos, as estatísticas de limpeza de um DataFrame
+    
+    Para colunas numéricas: contagem de faltantes, média, desvio padrão, sketch
+    de quantis e valores mais frequentes. Para as demais: faltantes e valores
+    mais frequentes. Instâncias calculadas em blocos ou processos diferentes
+    podem ser combinadas com `merge`.
+    
+    Args:
+        sketch_size (int): Capacidade de cada nível do sketch de quantis
+        max_distinct (int): Número máximo de valores distintos contados por coluna
+        track_frequent (bool): Se False, não conta os valores mais frequentes (a moda fica None)
+    """
+    
+    def __init__(self, sketch_size=2048, max_distinct=10000, track_frequent=True):
+        self.sketch_size = sketch_size
+        self.max_distinct = max_distinct
+        self.track_frequent = track_frequent
+        self.n_rows = 0
+        self.columns = {}
+    
+    @staticmethod
+    def _is_numeric(series):
+        return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+    
+    def update(self, chunk):
+        """
+        Incorpora um bloco (DataFrame) às estatísticas
+        """
+        self.n_rows += len(chunk)
+        for col in chunk.columns:
+            series = chunk[col]
+            numeric = self._is_numeric(series)
+            if col not in self.columns:
+                self.columns[col] = {
+                    'numeric': numeric,
+                    'missing': 0,
+                    'frequent': FrequentItems(self.max_distinct) if self.track_frequent else None,
+                    'moments': RunningMoments() if numeric else None,
+                    'sketch': QuantileSketch(self.sketch_size) if numeric else None
+                }
+            column = self.columns[col]
+            column['missing'] += int(series.isna().sum())
+            if column['frequent'] is not None:
+                column['frequent'].update(series)
+            if column['numeric']:
+                values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+                column['moments'].update(values)
+                column['sketch'].update(values)
+        return self
+    
+    def merge(self, other):
+        self.n_rows += other.n_rows
+        for col, theirs in other.columns.items():
+            if col not in self.columns:
+                self.columns[col] = theirs
+                continue
+            ours = self.columns[col]
+            ours['missing'] += theirs['missing']
+            if ours['frequent'] is not None and theirs['frequent'] is not None:
+                ours['frequent'].merge(theirs['frequent'])
+            else:
+                ours['frequent'] = None
+            if ours['numeric'] and theirs['numeric']:
+                ours['moments'].merge(theirs['moments'])
+                ours['sketch'].merge(theirs['sketch'])
+        return self
+    
+    def summary(self):
+        """
+        Resume as estatísticas em um dicionário serializável em JSON
+        
+        Returns:
+            dict: {'n_rows': ..., 'columns': {coluna: {...}}}
+        """
+        columns = {}
+        for col, column in self.columns.items():
+            mode = column['frequent'].mode() if column['frequent'] is not None else None
+            if isinstance(mode, np.generic):
+                mode = mode.item()
+            summary = {'numeric': column['numeric'], 'missing': column['missing'], 'mode': mode}
+            if column['numeric']:
+                sketch = column['sketch']
+                summary.update({
+                    'count': sketch.count,
+                    'mean': column['moments'].mean if column['moments'].count else np.nan,
+                    'std': column['moments'].std(ddof=1),
+                    'std_population': column['moments'].std(ddof=0),
+                    'min': sketch.min if sketch.count else np.nan,
+                    'max': sketch.max if sketch.count else np.nan,
+                    'median': sketch.quantile(0.5),
+                    'q1': sketch.quantile(0.25),
+                    'q3': sketch.quantile(0.75),
+                    'exact_quantiles': sketch.is_exact
+                })
+            columns[str(col)] = summary
+        return {'n_rows': self.n_rows, 'columns': columns}
@@ -0,0 +1,221 @@
+import argparse
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+import joblib
+from model_evaluation import predict_scores
+from derived_features import FeatureEngine
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Custos por decisão; alto risco (score >= threshold) significa crédito negado
+DEFAULT_COST_MATRIX = {
+    'false_negative': 5.0,   # aprovar quem se torna inadimplente
+    'false_positive': 1.0,   # negar um bom pagador (receita perdida)
+    'true_positive': 0.0,
+    'true_negative': 0.0
+}
+
+def threshold_curve(y, scores, cost_matrix=None, exposure=None):
+    """
+    Calcula a curva completa de decisão para todos os thresholds candidatos
+    
+    Os candidatos são os valores distintos dos scores. Com os scores em ordem
+    decrescente, os classificados como alto risco (score >= threshold) formam
+    um prefixo, então todas as contagens saem de somas acumuladas sobre uma
+    única ordenação. A última linha corresponde a aprovar todos.
+    
+    Args:
+        y (np.array): Target (1 = inadimplente)
+        scores (np.array): Scores de alto risco (mesma escala usada pela API)
+        cost_matrix (dict): Custos de false_negative, false_positive,
+            true_positive e true_negative (padrão: DEFAULT_COST_MATRIX)
+        exposure (np.array): Valor exposto de cada linha (ex.: valor do
+            empréstimo), que multiplica os custos (opcional)
+    
+    Returns:
+        pd.DataFrame: Uma linha por threshold com as contagens, precision, recall,
+            taxa de aprovação e perda esperada por solicitante
+    """
+    costs = dict(DEFAULT_COST_MATRIX, **(cost_matrix or {}))
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-scores, kind='stable')
+    sorted_scores = scores[order]
+    is_default = np.asarray(y)[order] == 1
+    weights = np.ones(len(scores)) if exposure is None else np.asarray(exposure, dtype=np.float64)[order]
+    n = len(scores)
+    
+    # Último índice de cada valor distinto de score: fronteiras dos prefixos
+    ends = np.append(np.flatnonzero(np.diff(sorted_scores)), n - 1)
+    positives = np.cumsum(is_default)
+    rejected = ends + 1
+    tp = np.append(positives[ends], 0)
+    fp = np.append(rejected - positives[ends], 0)
+    total_positive = int(positives[-1]) if n else 0
+    fn = total_positive - tp
+    tn = (n - total_positive) - fp
+    thresholds = np.append(sorted_scores[ends], np.nextafter(sorted_scores[0], np.inf) if n else 1.0)
+    rejected = np.append(rejected, 0)
+    
+    # Custos ponderados pela exposição, acumulados na mesma ordem
+    exposure_positive = np.cumsum(np.where(is_default, weights, 0.0))
+    exposure_total = np.cumsum(weights)
+    tp_exposure = np.append(exposure_positive[ends], 0.0)
+    fp_exposure = np.append(exposure_total[ends] - exposure_positive[ends], 0.0)
+    fn_exposure = (exposure_positive[-1] if n else 0.0) - tp_exposure
+    tn_exposure = (exposure_total[-1] - exposure_positive[-1] if n else 0.0) - fp_exposure
+    total_cost = (costs['false_negative'] * fn_exposure + costs['false_positive'] * fp_exposure +
+                  costs['true_positive'] * tp_exposure + costs['true_negative'] * tn_exposure)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(rejected > 0, tp / rejected, np.nan)
+        recall = tp / total_positive if total_positive else np.full(len(tp), np.nan)
+        false_positive_rate = fp / (n - total_positive) if n > total_positive else np.full(len(fp), np.nan)
+    
+    curve = pd.DataFrame({
+        'threshold': thresholds,
+        'rejected': rejected,
+        'approval_rate': 1 - rejected / n if n else np.nan,
+        'tp': tp,
+        'fp': fp,
+        'fn': fn,
+        'tn': tn,
+        'precision': precision,
+        'recall': recall,
+        'false_positive_rate': false_positive_rate,
+        'default_rate_approved': np.where(n - rejected > 0, fn / np.maximum(n - rejected, 1), np.nan),
+        'expected_loss': total_cost / n if n else np.nan
+    })
+    # Ordem crescente de threshold: do mais restritivo ao que aprova todos
+    return curve.iloc[::-1].reset_index(drop=True)
+
+def select_threshold(curve, min_approval_rate=None, max_default_rate=None):
+    """
+    Seleciona o threshold de menor perda esperada, respeitando as restrições
+    
+    Args:
+        curve (pd.DataFrame): Resultado de threshold_curve
+        min_approval_rate (float): Taxa mínima de aprovação (opcional)
+        max_default_rate (float): Inadimplência máxima entre os aprovados (opcional)
+    
+    Returns:
+        pd.Series: Linha da curva escolhida
+    """
+    feasible = np.ones(len(curve), dtype=bool)
+    if min_approval_rate is not None:
+        feasible &= curve['approval_rate'].to_numpy() >= min_approval_rate
+    if max_default_rate is not None:
+        feasible &= np.nan_to_num(curve['default_rate_approved'].to_numpy(), nan=0.0) <= max_default_rate
+    if not feasible.any():
+        raise ValueError('Nenhum threshold satisfaz as restrições informadas')
+    losses = np.where(feasible, curve['expected_loss'].to_numpy(), np.inf)
+    return curve.iloc[int(np.argmin(losses))]
+
+def write_threshold_to_config(config_path, best, cost_matrix=None, extra=None):
+    """
+    Grava o threshold escolhido no config.json consumido pela API
+    
+    A escrita é atômica (arquivo temporário + os.replace), para que a API
+    nunca leia um config parcial ao recarregar os artefatos.
+    
+    Args:
+        config_path (str): Caminho do config.json
+        best (pd.Series): Linha da curva escolhida por select_threshold
+        cost_matrix (dict): Custos usados na otimização
+        extra (dict): Informações adicionais para o resumo (opcional)
+    
+    Returns:
+        dict: Config atualizado
+    """
+    config = {}
+    if os.path.exists(config_path):
+        with open(config_path, 'r') as f:
+            config = json.load(f)
+    previous = config.get('threshold', 0.5)
+    config['threshold'] = float(best['threshold'])
+    config['threshold_analysis'] = dict({
+        'cost_matrix': dict(DEFAULT_COST_MATRIX, **(cost_matrix or {})),
+        'previous_threshold': previous,
+        'expected_loss': float(best['expected_loss']),
+        'approval_rate': float(best['approval_rate']),
+        'precision': None if pd.isna(best['precision']) else float(best['precision']),
+        'recall': None if pd.isna(best['recall']) else float(best['recall']),
+        'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }, **(extra or {}))
+    
+    directory = os.path.dirname(os.path.abspath(config_path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{config_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(config, f, indent=2)
+    os.replace(tmp_path, config_path)
+    logger.info(f"Threshold atualizado em {config_path}: {previous} -> {config['threshold']:.6f}")
+    return config
+
+def optimize_threshold(y, scores, cost_matrix=None, exposure=None, min_approval_rate=None,
+                       max_default_rate=None, config_path=None):
+    """
+    Calcula a curva, escolhe o threshold ótimo e, opcionalmente, grava no config
+    
+    Returns:
+        tuple: Linha escolhida (pd.Series) e a curva completa (pd.DataFrame)
+    """
+    start = time.perf_counter()
+    curve = threshold_curve(y, scores, cost_matrix, exposure)
+    best = select_threshold(curve, min_approval_rate, max_default_rate)
+    logger.info(f"Curva com {len(curve)} thresholds calculada em {time.perf_counter() - start:.2f}s; "
+                f"ótimo {best['threshold']:.6f} (perda esperada {best['expected_loss']:.4f}, "
+                f"aprovação {best['approval_rate']:.2%})")
+    if config_path:
+        write_threshold_to_config(config_path, best, cost_matrix, {'n_scores': int(len(scores))})
+    return best, curve
+
+def main():
+    parser = argparse.ArgumentParser(description='Escolha do threshold pela matriz de custos')
+    parser.add_argument('--data', required=True, help='CSV de validação com as features e o target')
+    parser.add_argument('--target', required=True, help='Nome da coluna alvo')
+    parser.add_argument('--model', default='./models/trained_models/best_model.joblib')
+    parser.add_argument('--preprocessor', default='./models/trained_models/preprocessor.joblib')
+    parser.add_argument('--config', default='./models/trained_models/config.json')
+    parser.add_argument('--cost-fn', type=float, default=DEFAULT_COST_MATRIX['false_negative'])
+    parser.add_argument('--cost-fp', type=float, default=DEFAULT_COST_MATRIX['false_positive'])
+    parser.add_argument('--cost-tp', type=float, default=DEFAULT_COST_MATRIX['true_positive'])
+    parser.add_argument('--cost-tn', type=float, default=DEFAULT_COST_MATRIX['true_negative'])
+    parser.add_argument('--exposure-column', help='Coluna com o valor exposto de cada linha')
+    parser.add_argument('--min-approval-rate', type=float)
+    parser.add_argument('--max-default-rate', type=float)
+    parser.add_argument('--curve-output', help='CSV para a curva completa')
+    parser.add_argument('--dry-run', action='store_true', help='Não altera o config.json')
+    args = parser.parse_args()
+    
+    config = {}
+    if os.path.exists(args.config):
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+    engine = FeatureEngine.from_config(config['derived_features']) if 'derived_features' in config else FeatureEngine()
+    
+    df = pd.read_csv(args.data)
+    y = df.pop(args.target).to_numpy()
+    exposure = df[args.exposure_column].to_numpy() if args.exposure_column else None
+    preprocessor = joblib.load(args.preprocessor)
+    X = preprocessor.transform(engine.transform_frame(df, copy=False))
+    scores, _ = predict_scores(joblib.load(args.model), X)
+    
+    cost_matrix = {
+        'false_negative': args.cost_fn,
+        'false_positive': args.cost_fp,
+        'true_positive': args.cost_tp,
+        'true_negative': args.cost_tn
+    }
+    best, curve = optimize_threshold(y, scores, cost_matrix, exposure, args.min_approval_rate,
+                                     args.max_default_rate, None if args.dry_run else args.config)
+    if args.curve_output:
+        curve.to_csv(args.curve_output, index=False)
+    print(best.to_string())
+
+if __name__ == '__main__':
+    main()
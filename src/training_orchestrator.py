@@ -0,0 +1,361 @@
+import argparse
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+import joblib
+from joblib import Parallel, delayed
+from scipy import sparse
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+from sklearn.metrics import roc_auc_score
+from model_training import train_decision_tree, train_logistic_regression, train_random_forest, train_xgboost
+from model_evaluation import save_model
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MODEL_FAMILIES = {
+    'decision_tree': train_decision_tree,
+    'logistic_regression': train_logistic_regression,
+    'random_forest': train_random_forest,
+    'xgboost': train_xgboost
+}
+
+# Espaços de busca padrão por família de modelos
+DEFAULT_SEARCH_SPACES = {
+    'decision_tree': {
+        'max_depth': [3, 5, 8, 12],
+        'min_samples_leaf': [1, 5, 20]
+    },
+    'logistic_regression': {
+        'C': [0.01, 0.1, 1.0, 10.0]
+    },
+    'random_forest': {
+        'n_estimators': [100, 300],
+        'max_depth': [6, 10, None],
+        'min_samples_leaf': [1, 5]
+    },
+    'xgboost': {
+        'n_estimators': [200, 500],
+        'learning_rate': [0.05, 0.1],
+        'max_depth': [3, 5, 7]
+    }
+}
+
+# Parâmetros fixos: um núcleo por trial, pois o paralelismo é entre trials
+FAMILY_FIXED_PARAMS = {
+    'random_forest': {'n_jobs': 1},
+    'xgboost': {'n_jobs': 1, 'early_stopping_rounds': 20}
+}
+
+def generate_candidates(search_spaces=None, strategy='random', n_iter=10, random_state=42):
+    """
+    Gera as combinações (família, parâmetros) a serem avaliadas
+    
+    Args:
+        search_spaces (dict): Família -> {parâmetro: lista de valores}
+        strategy (str): 'grid' (todas as combinações) ou 'random'/'halving'
+            (até n_iter combinações sorteadas por família)
+        n_iter (int): Número de combinações sorteadas por família
+        random_state (int): Semente do sorteio
+    
+    Returns:
+        list: Lista de tuplas (família, parâmetros)
+    """
+    search_spaces = search_spaces or DEFAULT_SEARCH_SPACES
+    candidates = []
+    for family, space in search_spaces.items():
+        if family not in MODEL_FAMILIES:
+            raise ValueError(f"Família de modelo desconhecida: {family}")
+        grid = ParameterGrid(space)
+        if strategy == 'grid' or len(grid) <= n_iter:
+            combinations = list(grid)
+        else:
+            combinations = list(ParameterSampler(space, n_iter=n_iter, random_state=random_state))
+        candidates.extend((family, params) for params in combinations)
+    return candidates
+
+def _run_trial(trial_id, family, params, X_train, y_train, X_val, y_val, n_rows, keep_model):
+    """
+    Treina e avalia um trial (executado nos workers)
+    
+    As matrizes chegam como memory-map somente leitura, compartilhadas entre os
+    workers; o trial treina nas primeiras `n_rows` linhas (uma fatia, sem cópia
+    da matriz densa) e na matriz inteira quando `n_rows` cobre todas as linhas.
+    """
+    start = time.perf_counter()
+    result = {'trial_id': trial_id, 'family': family, 'params': params, 'n_rows': n_rows}
+    try:
+        fit_params = dict(FAMILY_FIXED_PARAMS.get(family, {}), **params)
+        if n_rows >= X_train.shape[0]:
+            X_fit, y_fit = X_train, y_train
+        else:
+            X_fit, y_fit = X_train[:n_rows], y_train[:n_rows]
+        if family == 'xgboost':
+            model = train_xgboost(X_fit, y_fit, eval_set=(X_val, y_val), **fit_params)
+        else:
+            model = MODEL_FAMILIES[family](X_fit, y_fit, **fit_params)
+        result['score'] = float(roc_auc_score(y_val, model.predict_proba(X_val)[:, 1]))
+        result['model'] = model if keep_model else None
+    except Exception as e:
+        result['score'] = np.nan
+        result['error'] = str(e)
+        result['model'] = None
+    result['fit_time'] = time.perf_counter() - start
+    return result
+
+def _rung_fractions(strategy, n_candidates, eta, min_fraction, screening_fraction):
+    """
+    Frações das linhas de treino usadas em cada nível da busca
+    """
+    if strategy == 'halving':
+        n_rungs = max(1, int(np.floor(np.log(n_candidates) / np.log(eta))) + 1)
+        fractions = [max(min_fraction, eta ** -(n_rungs - 1 - i)) for i in range(n_rungs)]
+        fractions[-1] = 1.0
+        return fractions
+    if screening_fraction:
+        return [screening_fraction, 1.0]
+    return [1.0]
+
+def run_search(X_train, y_train, X_val, y_val, search_spaces=None, strategy='halving', n_iter=10, eta=3,
+               min_fraction=0.1, screening_fraction=0.25, n_jobs=-1, random_state=42,
+               output_dir='./models/trained_models'):
+    """
+    Busca de hiperparâmetros em paralelo entre as quatro famílias de modelos
+    
+    Estratégias:
+        - 'grid' / 'random': com `screening_fraction`, todos os trials são
+          avaliados primeiro em uma fração das linhas e os abaixo da mediana
+          são interrompidos antes do treino completo
+        - 'halving': successive halving; a cada nível só 1/eta dos trials
+          seguem, com eta vezes mais linhas de treino
+    
+    O XGBoost também para cedo pelo conjunto de validação (early_stopping_rounds).
+    As matrizes de treino e validação são compartilhadas com os workers via
+    memory-map (joblib), sem cópia por trial; matrizes CSR (preprocessador com
+    saída esparsa) são mantidas esparsas e os seus arrays internos compartilhados
+    da mesma forma.
+    
+    Args:
+        X_train, y_train: Dados de treino já pré-processados (densos ou CSR)
+        X_val, y_val: Dados de validação já pré-processados (ranking por ROC AUC)
+        search_spaces (dict): Família -> {parâmetro: lista de valores}
+        strategy (str): 'grid', 'random' ou 'halving'
+        n_iter (int): Combinações sorteadas por família (random/halving)
+        eta (int): Fator de redução do successive halving
+        min_fraction (float): Menor fração das linhas usada no halving
+        screening_fraction (float): Fração da triagem em grid/random (None desativa)
+        n_jobs (int): Número de processos (-1 = todos os núcleos)
+        random_state (int): Semente do sorteio de parâmetros e das subamostras
+        output_dir (str): Diretório do best_model.joblib e do leaderboard.csv
+    
+    Returns:
+        tuple: Leaderboard (pd.DataFrame) e o melhor modelo treinado
+    """
+    if strategy not in ('grid', 'random', 'halving'):
+        raise ValueError("Estratégia deve ser 'grid', 'random' ou 'halving'")
+    
+    if sparse.issparse(X_train):
+        X_train = sparse.csr_matrix(X_train, dtype=np.float64)
+        X_val = sparse.csr_matrix(X_val, dtype=np.float64)
+    else:
+        X_train = np.ascontiguousarray(X_train, dtype=np.float64)
+        X_val = np.ascontiguousarray(X_val, dtype=np.float64)
+    y_train = np.asarray(y_train)
+    y_val = np.asarray(y_val)
+    
+    candidates = generate_candidates(search_spaces, strategy, n_iter, random_state)
+    fractions = _rung_fractions(strategy, len(candidates), eta, min_fraction, screening_fraction)
+    logger.info(f"Busca '{strategy}': {len(candidates)} trials, níveis com frações {fractions}")
+    
+    # Os níveis parciais usam prefixos de uma cópia embaralhada; o nível completo, as matrizes originais
+    n_train = X_train.shape[0]
+    X_shuffled = y_shuffled = None
+    if min(fractions) < 1.0:
+        order = np.random.default_rng(random_state).permutation(n_train)
+        X_shuffled, y_shuffled = X_train[order], y_train[order]
+    active = list(enumerate(candidates))
+    history = []
+    best_model = None
+    start = time.perf_counter()
+    
+    # Um único pool para todos os níveis; arrays acima de 1 MB viram memory-maps compartilhados
+    with Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r') as parallel:
+        for rung, fraction in enumerate(fractions):
+            n_rows = min(n_train, max(1, int(round(fraction * n_train))))
+            X_rung, y_rung = (X_train, y_train) if n_rows == n_train else (X_shuffled, y_shuffled)
+            last_rung = rung == len(fractions) - 1
+            results = parallel(
+                delayed(_run_trial)(trial_id, family, params, X_rung, y_rung, X_val, y_val, n_rows, last_rung)
+                for trial_id, (family, params) in active
+            )
+            for result in results:
+                result['rung'] = rung
+                history.append(result)
+            logger.info(f"Nível {rung} ({n_rows} linhas): {len(results)} trials avaliados")
+            
+            if last_rung:
+                finished = [result for result in results if not np.isnan(result['score'])]
+                if finished:
+                    best_model = max(finished, key=lambda result: result['score'])['model']
+                break
+            
+            # Interrompe os trials ruins antes do próximo nível
+            scores = np.array([result['score'] for result in results])
+            scores = np.where(np.isnan(scores), -np.inf, scores)
+            ranking = np.argsort(-scores, kind='stable')
+            if strategy == 'halving':
+                n_keep = max(1, int(np.ceil(len(results) / eta)))
+            else:
+                n_keep = max(1, int(np.sum(scores >= np.median(scores))))
+            active = [(results[i]['trial_id'], (results[i]['family'], results[i]['params']))
+                      for i in ranking[:n_keep]]
+    
+    elapsed = time.perf_counter() - start
+    leaderboard = build_leaderboard(history)
+    if best_model is None:
+        raise RuntimeError('Nenhum trial foi concluído com sucesso')
+    
+    os.makedirs(output_dir, exist_ok=True)
+    leaderboard.to_csv(os.path.join(output_dir, 'leaderboard.csv'), index=False)
+    save_model(best_model, 'best', output_dir)
+    winner = leaderboard.iloc[0]
+    logger.info(f"Busca concluída em {elapsed:.1f}s: melhor modelo {winner['family']} "
+                f"(ROC AUC {winner['score']:.4f}) com parâmetros {winner['params']}")
+    return leaderboard, best_model
+
+def build_leaderboard(history):
+    """
+    Monta o leaderboard: o melhor resultado de cada trial, do nível mais alto alcançado
+    
+    Returns:
+        pd.DataFrame: Trials ordenados por nível alcançado e ROC AUC de validação
+    """
+    rows = []
+    for result in history:
+        rows.append({
+            'trial_id': result['trial_id'],
+            'family': result['family'],
+            'params': json.dumps(result['params'], sort_keys=True, default=str),
+            'rung': result['rung'],
+            'n_rows': result['n_rows'],
+            'score': result['score'],
+            'fit_time': result['fit_time'],
+            'error': result.get('error')
+        })
+    leaderboard = pd.DataFrame(rows)
+    leaderboard = leaderboard.sort_values(['rung', 'score'], ascending=[False, False], na_position='last')
+    leaderboard = leaderboard.drop_duplicates('trial_id', keep='first').reset_index(drop=True)
+    leaderboard.insert(0, 'rank', np.arange(1, len(leaderboard) + 1))
+    return leaderboard
+
+def write_training_config(config_path, feature_names, derived_features=None):
+    """
+    Grava o config.json do modelo treinado, ao lado do best_model.joblib
+    
+    Chaves de um config existente que não dependem do modelo (ex.: risk_categories)
+    são mantidas; threshold, análise do threshold e versão do modelo anterior são
+    descartados. A escrita é atômica (arquivo temporário + os.replace), para que a
+    API nunca leia um config parcial ao recarregar os artefatos.
+    
+    Args:
+        config_path (str): Caminho do config.json
+        feature_names (list): Colunas de entrada do preprocessador, na ordem do treino
+        derived_features (list): Definições das features derivadas (lista vazia = nenhuma)
+    
+    Returns:
+        dict: Config gravado
+    """
+    config = {}
+    if os.path.exists(config_path):
+        with open(config_path, 'r') as f:
+            config = json.load(f)
+    for key in ('threshold_analysis', 'model_version'):
+        config.pop(key, None)
+    config.update({
+        'feature_names': [str(feature) for feature in feature_names],
+        'derived_features': list(derived_features or []),
+        'threshold': 0.5
+    })
+    config.setdefault('risk_categories', ['Baixo Risco', 'Alto Risco'])
+    
+    tmp_path = f"{config_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(config, f, indent=4)
+    os.replace(tmp_path, config_path)
+    logger.info(f"Configuração do modelo salva em {config_path} ({len(config['feature_names'])} features)")
+    return config
+
+def main():
+    from data_processing import load_data_from_csv, split_data, optimize_dtypes, load_schema, save_schema
+    from feature_engineering import identify_feature_types, create_preprocessing_pipeline
+    from drift_monitoring import build_drift_reference, save_drift_reference
+    from explainability import save_explainer_background
+    
+    parser = argparse.ArgumentParser(description='Busca de hiperparâmetros entre as famílias de modelos')
+    parser.add_argument('--data', required=True, help='CSV com as features e o target')
+    parser.add_argument('--target', required=True, help='Nome da coluna alvo')
+    parser.add_argument('--strategy', choices=['grid', 'random', 'halving'], default='halving')
+    parser.add_argument('--n-iter', type=int, default=10)
+    parser.add_argument('--search-spaces', help='JSON com os espaços de busca por família')
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--output-dir', default='./models/trained_models')
+    parser.add_argument('--compact-dtypes', action='store_true',
+                        help='Compacta os dtypes (categóricos, inteiros e floats menores) e salva schema.json')
+    parser.add_argument('--schema', help='Schema de dtypes já salvo, aplicado na leitura do CSV')
+    parser.add_argument('--sparse', action='store_true',
+                        help='One-hot esparso: o preprocessador gera matrizes CSR (categóricas de alta cardinalidade)')
+    parser.add_argument('--pipeline-cache', help='Diretório do cache de etapas: leitura, divisão e preprocessador '
+                                                 'são reutilizados entre execuções com os mesmos dados')
+    args = parser.parse_args()
+    if args.pipeline_cache and args.compact_dtypes:
+        parser.error('--compact-dtypes não é suportado com --pipeline-cache; use --schema')
+    
+    search_spaces = None
+    if args.search_spaces:
+        with open(args.search_spaces, 'r') as f:
+            search_spaces = json.load(f)
+    
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.pipeline_cache:
+        from pipeline_cache import PipelineCache, prepare_training_data
+        
+        prepared = prepare_training_data(args.data, args.target, cache=PipelineCache(args.pipeline_cache),
+                                         schema=load_schema(args.schema) if args.schema else None,
+                                         missing_strategy=None, outlier_method=None, derived_features=False,
+                                         sparse_output=args.sparse)
+        preprocessor = prepared['preprocessor']
+        X_train = prepared['split'][0].result()
+        X_train_processed, y_train = prepared['X_train'], prepared['y_train']
+        X_val_processed, y_val = prepared['X_val'], prepared['y_val']
+    else:
+        if args.schema:
+            df = load_data_from_csv(args.data, schema=load_schema(args.schema))
+        elif args.compact_dtypes:
+            df, schema, _ = optimize_dtypes(load_data_from_csv(args.data))
+            save_schema(schema, os.path.join(args.output_dir, 'schema.json'))
+        else:
+            df = load_data_from_csv(args.data)
+        X_train, X_val, X_test, y_train, y_val, y_test = split_data(df, args.target)
+        numeric_cols, categorical_cols = identify_feature_types(X_train)
+        preprocessor = create_preprocessing_pipeline(numeric_cols, categorical_cols, sparse_output=args.sparse)
+        X_train_processed = preprocessor.fit_transform(X_train)
+        X_val_processed = preprocessor.transform(X_val)
+    joblib.dump(preprocessor, os.path.join(args.output_dir, 'preprocessor.joblib'))
+    
+    _, best_model = run_search(X_train_processed, y_train, X_val_processed, y_val, search_spaces=search_spaces,
+                               strategy=args.strategy, n_iter=args.n_iter, n_jobs=args.n_jobs,
+                               output_dir=args.output_dir)
+    # O modelo é treinado nas colunas brutas, sem features derivadas calculadas pela API
+    write_training_config(os.path.join(args.output_dir, 'config.json'), list(X_train.columns), derived_features=[])
+    
+    # Histogramas do treino (dados brutos e probabilidades) para o monitoramento de drift da API
+    reference = build_drift_reference(X_train, risk_probabilities=best_model.predict_proba(X_train_processed)[:, 1])
+    save_drift_reference(reference, os.path.join(args.output_dir, 'drift_reference.json'))
+    # Amostra do treino (dados brutos, pré-processados pelo explicador) usada como referência das explicações
+    save_explainer_background(X_train, os.path.join(args.output_dir, 'explainer_background.csv'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,348 @@
+import os
+import json
+import numpy as np
+from scipy import sparse
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Arrays que compõem um ensemble achatado (salvos como .npy para permitir memory-map)
+FLAT_ARRAYS = ['feature', 'threshold', 'children', 'missing', 'value', 'roots']
+
+class FlatTreeEnsemble:
+    """
+    Ensemble de árvores achatado em arrays NumPy contíguos
+    
+    Todos os nós de todas as árvores ficam concatenados em arrays paralelos
+    (feature, threshold, filhos, direção dos faltantes, valor da folha). As folhas apontam para si
+    mesmas, de modo que a travessia pode ser feita de forma vetorizada para
+    todas as linhas e todas as árvores ao mesmo tempo, por `max_depth` passos.
+    
+    Tipos suportados:
+        - 'average': média das probabilidades das folhas (DecisionTree, RandomForest)
+        - 'logistic': soma das margens das folhas + base_margin, seguida de sigmoide (XGBoost)
+    """
+    
+    def __init__(self, feature, threshold, children, missing, value, roots,
+                 kind, max_depth, n_features, base_margin=0.0, strict=False,
+                 chunk_size=256):
+        self.feature = feature
+        self.threshold = threshold
+        # Filhos no formato (n_nós, 2): coluna 0 = direita, coluna 1 = esquerda, de modo
+        # que o próximo nó é escolhido com um único gather em 2 * nó + vai_para_esquerda
+        self.children = children
+        self._children_flat = children.ravel()
+        self.missing = missing
+        self.value = value
+        self.roots = roots
+        self.kind = kind
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.base_margin = float(base_margin)
+        # XGBoost usa comparação estrita (x < limiar); o sklearn usa x <= limiar
+        self.strict = bool(strict)
+        self.chunk_size = chunk_size
+        self.classes_ = np.array([0, 1])
+    
+    @property
+    def n_trees(self):
+        return len(self.roots)
+    
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+    
+    def _leaves(self, X):
+        """
+        Percorre todas as árvores para um bloco de linhas
+        
+        Returns:
+            np.array: Índices das folhas, formato (n_linhas, n_árvores)
+        """
+        n_rows = X.shape[0]
+        # Indexação linear sobre X achatado é bem mais barata que a indexação 2D
+        X_flat = X.ravel()
+        row_offsets = (np.arange(n_rows) * X.shape[1])[:, None]
+        has_nan = np.isnan(X_flat).any()
+        nodes = np.repeat(self.roots[None, :], n_rows, axis=0)
+        for _ in range(self.max_depth):
+            x = X_flat.take(row_offsets + self.feature.take(nodes))
+            if self.strict:
+                go_left = x < self.threshold.take(nodes)
+            else:
+                go_left = x <= self.threshold.take(nodes)
+            next_nodes = self._children_flat.take(2 * nodes + go_left)
+            # Valores faltantes seguem a direção padrão aprendida no treino
+            if has_nan:
+                nan_mask = np.isnan(x)
+                next_nodes[nan_mask] = self.missing.take(nodes[nan_mask])
+            nodes = next_nodes
+        return nodes
+    
+    def predict_proba(self, X):
+        """
+        Calcula as probabilidades de cada classe
+        
+        Matrizes esparsas seguem a convenção do modelo original: no XGBoost as
+        entradas não armazenadas são faltantes; no sklearn, zeros.
+        
+        Args:
+            X (np.array): Matriz de features já pré-processada (densa ou esparsa)
+        
+        Returns:
+            np.array: Matriz (n_linhas, 2) com as probabilidades
+        """
+        if sparse.issparse(X):
+            X = _sparse_to_dense(X, np.nan if self.kind == 'logistic' else 0.0)
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f'Esperadas {self.n_features} features, recebidas {X.shape[-1]}')
+        
+        proba = np.empty((X.shape[0], 2), dtype=np.float64)
+        for start in range(0, X.shape[0], self.chunk_size):
+            block = X[start:start + self.chunk_size]
+            leaf_values = self.value.take(self._leaves(block))
+            if self.kind == 'average':
+                positive = leaf_values.sum(axis=1) / self.n_trees
+            else:
+                margin = leaf_values.sum(axis=1, dtype=np.float32) + np.float32(self.base_margin)
+                positive = 1.0 / (1.0 + np.exp(-margin.astype(np.float64)))
+            proba[start:start + len(block), 1] = positive
+            proba[start:start + len(block), 0] = 1.0 - positive
+        return proba
+    
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(int)
+
+def _sparse_to_dense(X, fill_value):
+    """
+    Densifica uma matriz esparsa preenchendo as entradas não armazenadas com `fill_value`
+    """
+    X = X.tocsr()
+    dense = np.full(X.shape, fill_value, dtype=np.float32)
+    rows = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+    dense[rows, X.indices] = X.data
+    return dense
+
+def _flatten_sklearn_trees(estimators, n_features):
+    """
+    Achata árvores do sklearn (DecisionTreeClassifier) em arrays contíguos
+    """
+    features, thresholds, children, missings, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        node_ids = np.arange(n_nodes)
+        is_leaf = tree.children_left == -1
+        
+        left = np.where(is_leaf, node_ids, tree.children_left) + offset
+        right = np.where(is_leaf, node_ids, tree.children_right) + offset
+        missing_go_to_left = getattr(tree, 'missing_go_to_left', None)
+        if missing_go_to_left is None:
+            missing = left
+        else:
+            missing = np.where(missing_go_to_left.astype(bool), left, right)
+        
+        # Mesma normalização feita em DecisionTreeClassifier.predict_proba
+        class_values = tree.value[:, 0, :]
+        normalizer = class_values.sum(axis=1)
+        normalizer[normalizer == 0.0] = 1.0
+        
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        children.append(np.stack([right, left], axis=1))
+        missings.append(missing)
+        values.append(class_values[:, 1] / normalizer)
+        roots.append(offset)
+        offset += n_nodes
+        max_depth = max(max_depth, tree.max_depth)
+    
+    return {
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'children': np.ascontiguousarray(np.concatenate(children).astype(np.int32)),
+        'missing': np.concatenate(missings).astype(np.int32),
+        'value': np.concatenate(values).astype(np.float64),
+        'roots': np.array(roots, dtype=np.int32),
+        'max_depth': max_depth,
+        'n_features': n_features
+    }
+
+def _tree_depth(left, right):
+    """
+    Calcula a profundidade de uma árvore a partir dos arrays de filhos (-1 nas folhas)
+    """
+    depth = 0
+    level = [0]
+    while level:
+        children = [child for node in level for child in (left[node], right[node]) if child != -1]
+        if children:
+            depth += 1
+        level = children
+    return depth
+
+def _flatten_xgboost(model):
+    """
+    Achata um XGBClassifier (gbtree, objetivo binary:logistic) em arrays contíguos
+    """
+    booster = model.get_booster()
+    learner = json.loads(booster.save_raw(raw_format='json'))['learner']
+    
+    if learner['objective']['name'] != 'binary:logistic':
+        raise ValueError(f"Objetivo {learner['objective']['name']} não suportado, apenas binary:logistic")
+    if learner['gradient_booster']['name'] != 'gbtree':
+        raise ValueError(f"Booster {learner['gradient_booster']['name']} não suportado, apenas gbtree")
+    
+    model_param = learner['learner_model_param']
+    base_score = float(model_param['base_score'].strip('[]'))
+    base_margin = np.log(base_score / (1.0 - base_score))
+    
+    trees = learner['gradient_booster']['model']['trees']
+    # Respeita o best_iteration quando o treino usou early stopping, como o predict_proba
+    try:
+        n_parallel = int(learner['gradient_booster']['model']['gbtree_model_param']['num_parallel_tree'])
+        trees = trees[:(model.best_iteration + 1) * n_parallel]
+    except AttributeError:
+        pass
+    
+    features, thresholds, children, missings, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for tree in trees:
+        if any(split_type != 0 for split_type in tree['split_type']):
+            raise ValueError('Splits categóricos do XGBoost não são suportados')
+        left_children = np.array(tree['left_children'])
+        right_children = np.array(tree['right_children'])
+        node_ids = np.arange(len(left_children))
+        is_leaf = left_children == -1
+        
+        left = np.where(is_leaf, node_ids, left_children) + offset
+        right = np.where(is_leaf, node_ids, right_children) + offset
+        default_left = np.array(tree['default_left']).astype(bool)
+        split_conditions = np.array(tree['split_conditions'], dtype=np.float32)
+        
+        features.append(np.where(is_leaf, 0, tree['split_indices']))
+        thresholds.append(np.where(is_leaf, np.float32(0.0), split_conditions))
+        children.append(np.stack([right, left], axis=1))
+        missings.append(np.where(default_left, left, right))
+        # Nas folhas, split_conditions guarda o valor da folha
+        values.append(np.where(is_leaf, split_conditions, np.float32(0.0)))
+        roots.append(offset)
+        offset += len(left_children)
+        max_depth = max(max_depth, _tree_depth(left_children, right_children))
+    
+    return {
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float32),
+        'children': np.ascontiguousarray(np.concatenate(children).astype(np.int32)),
+        'missing': np.concatenate(missings).astype(np.int32),
+        'value': np.concatenate(values).astype(np.float32),
+        'roots': np.array(roots, dtype=np.int32),
+        'max_depth': max_depth,
+        'n_features': int(model_param['num_feature']),
+        'base_margin': base_margin
+    }
+
+def compile_tree_model(model):
+    """
+    Converte um modelo de árvores treinado em um FlatTreeEnsemble
+    
+    Suporta os modelos gerados por `train_decision_tree`, `train_random_forest`
+    e `train_xgboost`.
+    
+    Args:
+        model: DecisionTreeClassifier, RandomForestClassifier ou XGBClassifier treinado
+    
+    Returns:
+        FlatTreeEnsemble: Ensemble achatado
+    """
+    model_type = type(model).__name__
+    if model_type == 'DecisionTreeClassifier':
+        arrays = _flatten_sklearn_trees([model], model.n_features_in_)
+        kind, strict = 'average', False
+    elif model_type in ('RandomForestClassifier', 'ExtraTreesClassifier'):
+        arrays = _flatten_sklearn_trees(model.estimators_, model.n_features_in_)
+        kind, strict = 'average', False
+    elif model_type == 'XGBClassifier':
+        arrays = _flatten_xgboost(model)
+        kind, strict = 'logistic', True
+    else:
+        raise ValueError(f'Modelo {model_type} não suportado pelo compilador de árvores')
+    
+    if model_type != 'XGBClassifier' and len(model.classes_) != 2:
+        raise ValueError('Apenas classificação binária é suportada')
+    
+    ensemble = FlatTreeEnsemble(kind=kind, strict=strict, **arrays)
+    logger.info(f"Modelo {model_type} compilado: {ensemble.n_trees} árvores, {ensemble.n_nodes} nós")
+    return ensemble
+
+def save_flat_ensemble(ensemble, path):
+    """
+    Salva um FlatTreeEnsemble em um diretório (um .npy por array + metadata.json)
+    
+    Args:
+        ensemble (FlatTreeEnsemble): Ensemble achatado
+        path (str): Diretório de destino
+    
+    Returns:
+        str: Caminho do diretório
+    """
+    os.makedirs(path, exist_ok=True)
+    for name in FLAT_ARRAYS:
+        np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(getattr(ensemble, name)))
+    
+    metadata = {
+        'kind': ensemble.kind,
+        'strict': ensemble.strict,
+        'max_depth': ensemble.max_depth,
+        'n_features': ensemble.n_features,
+        'base_margin': ensemble.base_margin
+    }
+    with open(os.path.join(path, 'metadata.json'), 'w') as f:
+        json.dump(metadata, f, indent=4)
+    
+    logger.info(f"Ensemble achatado salvo em {path}")
+    return path
+
+def load_flat_ensemble(path, mmap_mode=None):
+    """
+    Carrega um FlatTreeEnsemble salvo com `save_flat_ensemble`
+    
+    Args:
+        path (str): Diretório do ensemble
+        mmap_mode (str): Modo de memory-map dos arrays (None, 'r', ...)
+    
+    Returns:
+        FlatTreeEnsemble: Ensemble achatado
+    """
+    with open(os.path.join(path, 'metadata.json'), 'r') as f:
+        metadata = json.load(f)
+    arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in FLAT_ARRAYS}
+    
+    logger.info(f"Ensemble achatado carregado de {path}")
+    return FlatTreeEnsemble(**arrays, **metadata)
+
+def check_backend_parity(ensemble, model, X, atol=1e-6):
+    """
+    Compara as probabilidades do ensemble achatado com as do modelo original
+    
+    Args:
+        ensemble (FlatTreeEnsemble): Ensemble achatado
+        model: Modelo original
+        X (np.array): Matriz de features pré-processada
+        atol (float): Diferença absoluta máxima tolerada
+    
+    Returns:
+        float: Maior diferença absoluta encontrada (np.inf se acima da tolerância)
+    """
+    expected = model.predict_proba(X)[:, 1]
+    actual = ensemble.predict_proba(X)[:, 1]
+    max_diff = float(np.max(np.abs(expected - actual))) if len(expected) else 0.0
+    if max_diff > atol:
+        logger.warning(f"Ensemble achatado diverge do modelo original: diferença máxima {max_diff:.2e}")
+        return np.inf
+    logger.info(f"Paridade do ensemble achatado verificada: diferença máxima {max_diff:.2e}")
+    return max_diff